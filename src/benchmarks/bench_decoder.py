@@ -0,0 +1,87 @@
+"""
+Compare decoding a time_series payload with response.json() + pandas against
+the streaming orjson BarDecoder: time and peak Python memory per page size.
+
+Usage:
+    python src/benchmarks/bench_decoder.py --bars 5000 100000
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import orjson
+import pandas as pd
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+sys.path.append(str(BASE_DIR / "src" / "benchmarks"))
+
+from bar_decoder import columns_to_frame, decode_bars  # noqa: E402
+from bench_lag_engine import synthetic_bars  # noqa: E402
+
+
+def vendor_payload(n_bars):
+    """Encode synthetic bars the way the vendor does: newest first, prices as strings."""
+    df = synthetic_bars(n_bars).iloc[::-1]
+    values = [
+        {'datetime': str(row.datetime), 'open': f"{row.open:.5f}", 'high': f"{row.high:.5f}",
+         'low': f"{row.low:.5f}", 'close': f"{row.close:.5f}"}
+        for row in df.itertuples(index=False)
+    ]
+    return orjson.dumps({'meta': {'symbol': 'BTC/USD', 'interval': '1h'},
+                         'values': values, 'status': 'ok'})
+
+
+def legacy_decode(body):
+    """The decoding StockData and FeatureProcessor did before BarDecoder."""
+    df = pd.json_normalize(json.loads(body)['values'])
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    for col in ['open', 'high', 'low', 'close']:
+        df[col] = df[col].astype(float)
+    return df.sort_values(by='datetime').reset_index(drop=True)
+
+
+def streaming_decode(body):
+    """The decoding StockData does now."""
+    return columns_to_frame(decode_bars(body)[1])
+
+
+def measure(func, body, repeat):
+    """Return the best time of ``repeat`` runs, the peak traced memory and the result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bars', type=int, nargs='+', default=[5_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'bars':>10} {'payload MiB':>12} {'legacy ms':>10} {'stream ms':>10} "
+          f"{'speedup':>8} {'legacy peak MiB':>16} {'stream peak MiB':>16}")
+    for n_bars in args.bars:
+        body = vendor_payload(n_bars)
+        old_time, old_peak, old_df = measure(legacy_decode, body, args.repeat)
+        new_time, new_peak, new_df = measure(streaming_decode, body, args.repeat)
+        pd.testing.assert_frame_equal(old_df, new_df)
+        print(f"{n_bars:>10,} {len(body) / 2**20:>12.1f} {old_time * 1e3:>10.1f} "
+              f"{new_time * 1e3:>10.1f} {old_time / new_time:>7.1f}x "
+              f"{old_peak / 2**20:>16.1f} {new_peak / 2**20:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Ingestion benchmarks against the local TwelveData mock: throughput and tail
+latency of hourly updates, paged backfills, concurrent multi-symbol runs and
+the WebSocket price stream.
+
+Each scenario starts in-process mock servers, points the API clients at it
+through the ``mock_api`` config switch and writes to bar stores in a temporary
+directory, so nothing under data/ is touched and no API key is needed.
+
+Usage:
+    python src/benchmarks/bench_ingestion.py
+    python src/benchmarks/bench_ingestion.py --scenarios backfill --backfill-days 1825 --page-cap 5000
+    python src/benchmarks/bench_ingestion.py --latency-ms 100 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+sys.path.append(str(BASE_DIR / "src" / "benchmarks"))
+
+import ApiClient  # noqa: E402
+from BackfillEngine import BackfillEngine  # noqa: E402
+from BarStore import BarStore, interval_timedelta  # noqa: E402
+from StockData import StockData  # noqa: E402
+from PriceStream import PriceStream  # noqa: E402
+from bar_batch import bars_from_columns  # noqa: E402
+from mock_price_feed import MockPriceFeed  # noqa: E402
+from mock_twelvedata import MockTwelveData, synthetic_columns  # noqa: E402
+
+INTERVAL = ApiClient.configs['stock_api_params']['time_interval']
+
+
+def api_now():
+    """Current naive time in the API timezone, the clock StockData updates to."""
+    timezone = ApiClient.configs['stock_api_params']['timezone']
+    return pd.Timestamp.now(tz=timezone).tz_localize(None).floor('s')
+
+
+def seeded_stock(symbol, root, history_days, gap_hours, seed):
+    """Return a StockData whose store holds ``history_days`` of bars ending ``gap_hours`` ago."""
+    end = api_now() - pd.Timedelta(hours=gap_hours)
+    columns = synthetic_columns(symbol, end - pd.Timedelta(days=history_days), end, INTERVAL, seed)
+    stock = StockData(symbol)
+    stock.store = BarStore(symbol, root=root)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stock.store.append(bars_from_columns(columns))
+    return stock
+
+
+def latency_row(name, latencies, wall, bars, retries, failures):
+    """Print one result row; latencies are in seconds."""
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3 if latencies else (0, 0, 0)
+    print(f"{name:<24} {len(latencies):>6} {wall:>9.2f} {bars / wall if wall else 0:>12,.0f} "
+          f"{p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {retries:>8} {failures:>8}")
+
+
+def bench_update(args, root):
+    """Sequential hourly updates, each on a fresh store that is ``gap_hours`` behind."""
+    latencies = []
+    bars = 0
+    client = ApiClient.get_client()
+    client.metrics = {'requests': 0, 'retries': 0, 'failures': 0, 'latencies': []}
+    for i in range(args.updates):
+        stock = seeded_stock('BTC/USD', Path(root) / f"update_{i}", 7, args.gap_hours, args.seed)
+        before = len(stock.store.read_range())
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stock.update_data()
+        latencies.append(time.perf_counter() - start)
+        bars += len(stock.store.read_range()) - before
+    metrics = client.metrics_summary()
+    latency_row('update_data', latencies, sum(latencies), bars,
+                metrics['retries'], metrics['failures'])
+
+
+def bench_backfill(args, root):
+    """One paged backfill of ``backfill_days`` into an empty store."""
+    stock = StockData('BTC/USD')
+    stock.store = BarStore('BTC/USD', root=Path(root) / "backfill")
+    end = api_now() - pd.Timedelta(days=1)
+    start = end - pd.Timedelta(days=args.backfill_days)
+    engine = BackfillEngine(stock, page_bars=args.page_cap, concurrency=args.concurrency,
+                            requests_per_minute=0)
+
+    async def run():
+        async with ApiClient.AsyncApiClient.from_config() as client:
+            begin = time.perf_counter()
+            summary = await engine.run_async(start, end, client)
+            return summary, time.perf_counter() - begin, client.metrics
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary, wall, metrics = asyncio.run(run())
+    latency_row(f"backfill {summary['pages']} pages", metrics['latencies'], wall,
+                summary['bars'], metrics['retries'], summary['failed'])
+
+
+def bench_multi_symbol(args, root):
+    """Concurrent update_data_async for ``symbols`` symbols through one client."""
+    stocks = [seeded_stock(f"SYM{i}/USD", Path(root) / "multi", 7, args.gap_hours, args.seed)
+              for i in range(args.symbols)]
+    before = sum(len(stock.store.read_range()) for stock in stocks)
+
+    async def run():
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def update(stock, client):
+            async with semaphore:
+                start = time.perf_counter()
+                await stock.update_data_async(client)
+                latencies.append(time.perf_counter() - start)
+
+        async with ApiClient.AsyncApiClient.from_config() as client:
+            begin = time.perf_counter()
+            await asyncio.gather(*(update(stock, client) for stock in stocks))
+            return latencies, time.perf_counter() - begin, client.metrics
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies, wall, metrics = asyncio.run(run())
+    bars = sum(len(stock.store.read_range()) for stock in stocks) - before
+    latency_row(f"{args.symbols} symbols x{args.concurrency}", latencies, wall, bars,
+                metrics['retries'], metrics['failures'])
+
+
+def bench_stream(args, root):
+    """PriceStream over a replayed tick feed until ``stream_bars`` bars are written."""
+    stocks = [seeded_stock(f"SYM{i}/USD", Path(root) / "stream", 7, 0, args.seed)
+              for i in range(args.symbols)]
+    feed = MockPriceFeed(port=0, speed=args.stream_speed, ticks_per_bar=args.ticks_per_bar,
+                         disconnect_every=args.disconnect_every, seed=args.seed)
+    with feed:
+        stream = PriceStream(stocks, url=feed.url)
+        stream.reconnect_base = 0.1
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = asyncio.run(stream.run(max_bars=args.stream_bars))
+        wall = time.perf_counter() - begin
+    latency_row(f"stream {args.symbols} symbols", stats['bar_latencies'], wall, stats['bars'],
+                stats['reconnects'], 0)
+    print(f"{'':<24} {stats['ticks'] / wall:,.0f} ticks/s, {stats['late_ticks']} late, "
+          f"max tick backlog {stats['max_tick_backlog']}, {stats['catch_ups']} REST catch-ups")
+
+
+SCENARIOS = {
+    'update': bench_update,
+    'backfill': bench_backfill,
+    'multi': bench_multi_symbol,
+    'stream': bench_stream,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--requests-per-minute', type=float, default=0)
+    parser.add_argument('--page-cap', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fixture', default=None, help="Recorded payload to serve instead of synthetic bars")
+    parser.add_argument('--updates', type=int, default=20, help="Sequential update_data calls")
+    parser.add_argument('--gap-hours', type=int, default=3, help="Hours each store is behind")
+    parser.add_argument('--backfill-days', type=int, default=730)
+    parser.add_argument('--symbols', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--stream-bars', type=int, default=48, help="Bars to stream, over all symbols")
+    parser.add_argument('--stream-speed', type=float, default=36000, help="Replay seconds per second")
+    parser.add_argument('--ticks-per-bar', type=int, default=600)
+    parser.add_argument('--disconnect-every', type=int, default=0,
+                        help="Ticks per connection before the feed drops it, 0 never")
+    args = parser.parse_args()
+
+    mock = MockTwelveData(port=0, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, requests_per_minute=args.requests_per_minute,
+                          page_cap=args.page_cap, seed=args.seed, fixture=args.fixture)
+    with mock, tempfile.TemporaryDirectory() as root:
+        # Switch the clients to the mock server through the config
+        ApiClient.configs['mock_api'].update(enabled=True, host=mock.host, port=mock.port)
+        print(f"Mock API at {mock.base_url}: latency {args.latency_ms}+{args.jitter_ms} ms, "
+              f"error rate {args.error_rate}, quota {args.requests_per_minute}/min, "
+              f"page cap {args.page_cap}, interval {INTERVAL} "
+              f"({interval_timedelta(INTERVAL)})")
+        print(f"{'scenario':<24} {'ops':>6} {'wall s':>9} {'bars/s':>12} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'retries':>8} {'failed':>8}")
+        for name in args.scenarios:
+            SCENARIOS[name](args, root)
+        print(f"Mock server stats: {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark the vectorized lag engine against the original per-column shift() loop.
+
+Usage:
+    python src/benchmarks/bench_lag_engine.py
+    python src/benchmarks/bench_lag_engine.py --sizes 1000 100000 --legacy-max 100000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+
+from lag_engine import PRICE_COLUMNS, build_lag_frame  # noqa: E402
+
+
+def synthetic_bars(n_bars, seed=42):
+    """Generate a random-walk hourly OHLC series, oldest first."""
+    rng = np.random.default_rng(seed)
+    close = 60000 + np.cumsum(rng.normal(0, 50, n_bars))
+    open_ = np.roll(close, 1)
+    open_[0] = close[0]
+    spread = np.abs(rng.normal(0, 30, n_bars))
+    return pd.DataFrame({
+        'datetime': pd.date_range('2000-01-01', periods=n_bars, freq='h'),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+    })
+
+
+def legacy_lag_frame(df):
+    """The lag/target construction FeatureProcessor used before the lag engine."""
+    df = df.sort_values(by='datetime', ascending=True).reset_index(drop=True)
+    for lag in range(0, 13):
+        df[f'open_lag_{lag}'] = df['open'].shift(lag)
+        df[f'high_lag_{lag}'] = df['high'].shift(lag)
+        df[f'low_lag_{lag}'] = df['low'].shift(lag)
+        df[f'close_lag_{lag}'] = df['close'].shift(lag)
+    df = df.dropna().reset_index(drop=True)
+    df['target'] = df['close'].shift(-1)
+    df = df.dropna().reset_index(drop=True)
+    df = df.sort_values(by='datetime', ascending=False).reset_index(drop=True)
+    return df.drop(['open', 'high', 'low', 'close'], axis=1)
+
+
+def vectorized_lag_frame(df):
+    """The lag/target construction FeatureProcessor uses now."""
+    df = df.sort_values(by='datetime', ascending=True)
+    return build_lag_frame(df['datetime'].to_numpy(), df[PRICE_COLUMNS].to_numpy(dtype=float))
+
+
+def time_it(func, df, repeat):
+    """Return the best wall-clock time of ``repeat`` runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1_000, 100_000, 10_000_000])
+    parser.add_argument('--legacy-max', type=int, default=10_000_000,
+                        help="Skip the legacy implementation above this many bars")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'bars':>12} {'legacy rows/s':>16} {'vectorized rows/s':>18} {'speedup':>9}")
+    for n_bars in args.sizes:
+        df = synthetic_bars(n_bars)
+        new_time, new_df = time_it(vectorized_lag_frame, df, args.repeat)
+        new_rate = len(new_df) / new_time
+
+        if n_bars <= args.legacy_max:
+            old_time, old_df = time_it(legacy_lag_frame, df, args.repeat)
+            pd.testing.assert_frame_equal(old_df, new_df)
+            old_rate = len(old_df) / old_time
+            print(f"{n_bars:>12,} {old_rate:>16,.0f} {new_rate:>18,.0f} {old_time / new_time:>8.1f}x")
+        else:
+            print(f"{n_bars:>12,} {'skipped':>16} {new_rate:>18,.0f} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
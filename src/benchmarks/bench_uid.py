@@ -0,0 +1,74 @@
+"""
+Compare the legacy string uid with the int64 hash uid: build time, in-memory
+and Parquet size of the key column, and join/lookup speed on it.
+
+Usage:
+    python src/benchmarks/bench_uid.py --bars 100000
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+sys.path.append(str(BASE_DIR / "src" / "benchmarks"))
+
+from bench_lag_engine import synthetic_bars, vectorized_lag_frame  # noqa: E402
+from lag_engine import lag_feature_columns  # noqa: E402
+from uid_hash import hash_uid  # noqa: E402
+
+
+def string_uid(df):
+    """The uid FeatureProcessor built before the hash uid."""
+    return df['open_lag_1'].astype(str) + '_' + df['high_lag_2'].astype(
+        str) + '_' + df['low_lag_3'].astype(str) + '_' + df['close_lag_4'].astype(str)
+
+
+def hashed_uid(df):
+    """The uid FeatureProcessor builds now."""
+    return pd.Series(hash_uid(df['datetime'].to_numpy(), df[lag_feature_columns()].to_numpy()))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def parquet_size(series):
+    buffer = io.BytesIO()
+    series.to_frame('uid').to_parquet(buffer, index=False, compression='zstd')
+    return buffer.tell()
+
+
+def report(name, df, uid_func):
+    build_time, uid = timed(uid_func, df)
+    memory = uid.memory_usage(deep=True)
+    keys = pd.DataFrame({'uid': uid, 'value': range(len(uid))})
+    probe = keys.sample(frac=0.5, random_state=0)[['uid']]
+    join_time, _ = timed(pd.merge, probe, keys, 'inner', 'uid')
+    isin_time, _ = timed(uid.isin, probe['uid'])
+    print(f"{name:>8} {build_time * 1e3:>10.1f} {memory / 2**20:>10.1f} "
+          f"{parquet_size(uid) / 2**20:>12.1f} {join_time * 1e3:>9.1f} {isin_time * 1e3:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bars', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = vectorized_lag_frame(synthetic_bars(args.bars))
+    print(f"{len(df):,} engineered rows")
+    print(f"{'uid':>8} {'build ms':>10} {'mem MiB':>10} {'parquet MiB':>12} {'join ms':>9} {'isin ms':>9}")
+    report('string', df, string_uid)
+    report('hash64', df, hashed_uid)
+
+
+if __name__ == "__main__":
+    main()
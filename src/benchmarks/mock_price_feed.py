@@ -0,0 +1,222 @@
+"""
+Local replay server standing in for the vendor's price WebSocket.
+
+Speaks the subset of the TwelveData ``/v1/quotes/price`` protocol PriceStream
+uses: ``subscribe`` and ``heartbeat`` actions in, ``price`` events out, with
+integer UTC epoch seconds as timestamps. Ticks are replayed from the synthetic
+bars of mock_twelvedata: each bar becomes ``ticks_per_bar`` ticks running
+through its open, high, low and close. The replay clock runs ``speed`` times
+faster than real time and is shared by all connections. A client that
+reconnects resumes at the current market time, as with the real feed. The
+server can drop every connection after ``disconnect_every`` ticks to exercise
+reconnect handling.
+
+Usage:
+    python src/benchmarks/mock_price_feed.py --speed 3600
+    python src/benchmarks/mock_price_feed.py --speed 600 --disconnect-every 500
+
+Then set ``mock_api.enabled: true`` in src/config.yml and run
+``python src/feature_pipeline/feature_pipeline.py --stream``.
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import orjson
+import pandas as pd
+import websockets
+import yaml
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+sys.path.append(str(BASE_DIR / "src" / "benchmarks"))
+
+from BarStore import interval_timedelta  # noqa: E402
+from mock_twelvedata import synthetic_columns  # noqa: E402
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+def bar_ticks(symbol, bar_start, step, ticks_per_bar, seed):
+    """
+    Expands one synthetic bar into ticks whose OHLC equals the bar's.
+
+    Returns:
+        tuple: Tick times in UTC epoch seconds and tick prices.
+    """
+    start = pd.Timestamp(bar_start)
+    # The bar starts are UTC epoch, label them in UTC too
+    bar = synthetic_columns(symbol, start, start, f"{step // 60}min", seed, tz='UTC')
+    open_, high, low, close = (bar[field][0] for field in ['open', 'high', 'low', 'close'])
+    # Visit the extreme nearer the open first
+    path = [open_, high, low, close] if high - open_ < open_ - low else [open_, low, high, close]
+    positions = np.linspace(0, 3, ticks_per_bar)
+    prices = np.interp(positions, np.arange(4), path)
+    # Make sure the extremes are hit exactly, not just interpolated past
+    prices[np.round(positions).astype(int) == 1] = path[1]
+    prices[np.round(positions).astype(int) == 2] = path[2]
+    times = bar_start // 10**9 + (np.arange(ticks_per_bar) * step) // ticks_per_bar
+    return times, prices
+
+
+class MockPriceFeed:
+    def __init__(self, host=None, port=None, speed=3600.0, ticks_per_bar=60, start=None,
+                 disconnect_every=0, seed=None):
+        """
+        Initializes the MockPriceFeed instance.
+
+        Args:
+            host (str): Interface to bind, defaults to ``mock_api.host``.
+            port (int): Port to bind, defaults to ``mock_api.ws_port``; 0 for any free port.
+            speed (float): Replay seconds per real second.
+            ticks_per_bar (int): Ticks generated per bar, at least 4.
+            start: UTC time the replay starts at, defaults to two bars ago.
+            disconnect_every (int): Ticks sent per connection before dropping it, 0 never.
+            seed (int): Seed of the synthetic prices, defaults to ``mock_api.seed``.
+        """
+        mock_configs = configs['mock_api']
+        self.host = host or mock_configs['host']
+        self.port = mock_configs['ws_port'] if port is None else port
+        self.speed = speed
+        self.ticks_per_bar = max(ticks_per_bar, 4)
+        self.step = interval_timedelta(configs['stock_api_params']['time_interval']).value // 10**9
+        start = pd.Timestamp(start) if start is not None else \
+            pd.Timestamp.now().floor('s') - pd.Timedelta(seconds=2 * self.step)
+        self.replay_start = start.value // 10**9 // self.step * self.step
+        self.disconnect_every = disconnect_every
+        self.seed = mock_configs['seed'] if seed is None else seed
+        self.started = None
+        self.stats = {'connections': 0, 'ticks': 0, 'heartbeats': 0}
+        self.loop = None
+        self.server = None
+
+    def clock(self):
+        """Current replay time in UTC epoch seconds."""
+        return self.replay_start + (time.monotonic() - self.started) * self.speed
+
+    async def handle(self, websocket):
+        """Serve one connection: track its subscriptions and replay ticks to it."""
+        self.stats['connections'] += 1
+        symbols = set()
+        subscribed = asyncio.Event()
+
+        async def receive():
+            async for message in websocket:
+                request = orjson.loads(message)
+                if request.get('action') == 'subscribe':
+                    requested = request['params']['symbols'].split(',')
+                    symbols.update(requested)
+                    await websocket.send(orjson.dumps({
+                        'event': 'subscribe-status', 'status': 'ok',
+                        'success': [{'symbol': s} for s in requested], 'fails': None}).decode())
+                    subscribed.set()
+                elif request.get('action') == 'heartbeat':
+                    self.stats['heartbeats'] += 1
+                    await websocket.send(orjson.dumps({'event': 'heartbeat', 'status': 'ok'}).decode())
+
+        receiver = asyncio.create_task(receive())
+        sent = 0
+        try:
+            await subscribed.wait()
+            bar_start = int(self.clock()) // self.step * self.step
+            while True:
+                replay = {symbol: bar_ticks(symbol, bar_start * 10**9, self.step,
+                                            self.ticks_per_bar, self.seed)
+                          for symbol in sorted(symbols)}
+                for i in range(self.ticks_per_bar):
+                    tick_time = next(iter(replay.values()))[0][i]
+                    if tick_time < self.clock() - self.step:
+                        continue  # Resumed mid-bar: skip ticks that are long gone
+                    wait = (tick_time - self.clock()) / self.speed
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    for symbol, (times, prices) in replay.items():
+                        await websocket.send(orjson.dumps({
+                            'event': 'price', 'symbol': symbol, 'type': 'Digital Currency',
+                            'timestamp': int(times[i]), 'price': round(float(prices[i]), 5),
+                        }).decode())
+                        sent += 1
+                        self.stats['ticks'] += 1
+                    if self.disconnect_every and sent >= self.disconnect_every:
+                        await websocket.close(code=1011, reason="replay disconnect")
+                        return
+                bar_start += self.step
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            receiver.cancel()
+
+    async def serve(self, ready=None):
+        """Serve until cancelled; sets ``ready`` once listening."""
+        self.started = time.monotonic()
+        async with websockets.serve(self.handle, self.host, self.port) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            if ready is not None:
+                ready.set()
+            await asyncio.Future()
+
+    def start(self):
+        """Serve from a background thread and return the stream URL."""
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.create_task(self.serve(ready))
+            try:
+                self.loop.run_until_complete(self.server)
+            except asyncio.CancelledError:
+                pass
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.url
+
+    def stop(self):
+        """Stop serving."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.server.cancel)
+            self.loop = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/v1/quotes/price"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic price ticks over WebSocket.")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=3600.0, help="Replay seconds per real second")
+    parser.add_argument('--ticks-per-bar', type=int, default=60)
+    parser.add_argument('--start', default=None, help="UTC replay start, defaults to two bars ago")
+    parser.add_argument('--disconnect-every', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    feed = MockPriceFeed(**vars(args))
+    print(f"Replaying price ticks on {feed.url} at {feed.speed:g}x")
+    try:
+        asyncio.run(feed.serve())
+    except KeyboardInterrupt:
+        print(f"Stats: {feed.stats}")
+
+
+if __name__ == "__main__":
+    main()
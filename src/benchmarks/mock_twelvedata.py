@@ -0,0 +1,313 @@
+"""
+Local stand-in for the TwelveData ``time_series`` endpoint.
+
+Serves deterministic synthetic OHLC bars, or a recorded payload such as
+``data/stockdata_BTC.json``, in the vendor's format: newest first, prices as
+strings, at most ``page_cap`` bars per request and a code 400 error body for
+ranges without data. Latency, jitter, a 503 error rate and a per-minute quota
+answered with 429 + Retry-After are configurable, so StockData, the backfill
+engine and the multi-symbol runner can be exercised and benchmarked without an
+API key or network.
+
+Synthetic prices are a pure function of (seed, symbol, bar time), so pages
+fetched in any order or split agree with each other.
+
+Usage:
+    python src/benchmarks/mock_twelvedata.py
+    python src/benchmarks/mock_twelvedata.py --latency-ms 200 --error-rate 0.05 --requests-per-minute 60
+
+Then set ``mock_api.enabled: true`` in src/config.yml to point the pipeline at it.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import orjson
+import pandas as pd
+import yaml
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+
+from BarStore import follows_utc_clock, interval_timedelta  # noqa: E402
+from bar_batch import NS_PER_SECOND, to_epoch, utc_to_local  # noqa: E402
+from bar_decoder import PRICE_FIELDS, decode_bars  # noqa: E402
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+NO_DATA_MESSAGE = "No data is available on the specified dates. Try setting different start/end dates."
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def unit_noise(ticks, salt):
+    """Map int64 ticks to deterministic uniforms in [0, 1) with a splitmix64 hash."""
+    x = ticks.view(np.uint64) ^ np.uint64(salt)
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def synthetic_columns(symbol, start, end, interval, seed, tz=None):
+    """
+    Generates the bars of ``symbol`` with ``start <= datetime <= end``.
+
+    Hourly and finer bars sit on a UTC grid and are only labelled in local
+    time, like the vendor's: the hour repeated when DST ends is served twice
+    and the skipped one never. Coarser bars follow the local clock.
+
+    Args:
+        symbol (str): Symbol, salts the prices so symbols differ.
+        start, end (pd.Timestamp): Inclusive range of naive local labels.
+        interval (str): Vendor bar interval, e.g. "1h".
+        seed (int): Global seed.
+        tz (str): Timezone of the labels, defaults to the API's.
+
+    Returns:
+        dict: Bar columns as produced by bar_decoder, oldest first.
+    """
+    step = interval_timedelta(interval).value
+    if follows_utc_clock(interval):
+        # An ambiguous start means its first occurrence, an ambiguous end its second
+        lo = to_epoch(start, tz) * NS_PER_SECOND
+        hi = to_epoch(end, tz, latest=True) * NS_PER_SECOND
+        ticks = np.arange(-(-lo // step) * step, hi + 1, step, dtype=np.int64)
+        labels = utc_to_local(ticks, tz)
+    else:
+        first = -(-start.value // step) * step
+        ticks = labels = np.arange(first, end.value + 1, step, dtype=np.int64)
+    salt = (seed * 0x9E3779B97F4A7C15 ^ zlib.crc32(symbol.encode())) & (2**64 - 1)
+
+    def close_at(t):
+        # Slow monthly cycle plus per-bar noise around a per-symbol base price
+        base = 1000.0 + (salt % 90_000)
+        cycle = np.sin(2 * np.pi * t / (30 * 86400 * 1e9))
+        return base * (1 + 0.05 * cycle + 0.01 * (unit_noise(t, salt) - 0.5))
+
+    close = close_at(ticks)
+    open_ = close_at(ticks - step)
+    wick = 0.002 * np.maximum(open_, close)
+    return {
+        'datetime': labels,
+        'open': open_,
+        'high': np.maximum(open_, close) + wick * unit_noise(ticks, salt ^ 1),
+        'low': np.minimum(open_, close) - wick * unit_noise(ticks, salt ^ 2),
+        'close': close,
+    }
+
+
+def encode_payload(symbol, interval, columns, index):
+    """Encode the bars at ``index`` (newest first) as a vendor time_series body."""
+    datetimes = pd.DatetimeIndex(columns['datetime'][index].view('datetime64[ns]'))
+    # Daily and coarser bars carry no time of day, like the vendor's
+    formatted = datetimes.strftime('%Y-%m-%d' if interval.endswith(('day', 'week'))
+                                   else '%Y-%m-%d %H:%M:%S')
+    prices = [np.char.mod('%.5f', columns[field][index]) for field in PRICE_FIELDS]
+    values = [
+        {'datetime': dt, 'open': o, 'high': h, 'low': lo, 'close': c}
+        for dt, o, h, lo, c in zip(formatted, *(p.tolist() for p in prices))
+    ]
+    return orjson.dumps({
+        'meta': {'symbol': symbol, 'interval': interval, 'type': 'Digital Currency'},
+        'values': values,
+        'status': 'ok',
+    })
+
+
+class MockTwelveData:
+    def __init__(self, host=None, port=None, latency_ms=None, jitter_ms=None, error_rate=None,
+                 requests_per_minute=None, page_cap=None, seed=None, fixture=None):
+        """
+        Initializes the MockTwelveData instance. Unset arguments default to the
+        ``mock_api`` section of config.yml.
+
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 for any free port.
+            latency_ms (float): Latency added to every response.
+            jitter_ms (float): Uniform extra latency on top of ``latency_ms``.
+            error_rate (float): Fraction of requests answered with a 503.
+            requests_per_minute (float): Quota before answering 429, 0 disables it.
+            page_cap (int): Most bars returned per request.
+            seed (int): Seed of the synthetic prices and the error draws.
+            fixture (str or Path): Recorded payload to serve instead of synthetic bars.
+        """
+        mock_configs = configs['mock_api']
+
+        def pick(value, key):
+            return mock_configs[key] if value is None else value
+
+        self.host = pick(host, 'host')
+        self.port = pick(port, 'port')
+        self.latency = pick(latency_ms, 'latency_ms') / 1e3
+        self.jitter = pick(jitter_ms, 'jitter_ms') / 1e3
+        self.error_rate = pick(error_rate, 'error_rate')
+        self.rate = pick(requests_per_minute, 'requests_per_minute') / 60.0
+        self.page_cap = pick(page_cap, 'page_cap')
+        self.seed = pick(seed, 'seed')
+        self.random = random.Random(self.seed)
+        self.lock = threading.Lock()
+        self.tokens = self.rate * 60
+        self.updated = time.monotonic()
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'throttled': 0, 'bars': 0}
+
+        fixture = pick(fixture, 'fixture')
+        self.fixture = None
+        if fixture:
+            _, self.fixture = decode_bars((BASE_DIR / fixture).read_bytes())
+
+        self.server = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    def admit(self):
+        """Draw the fate of a request: None to serve it, or an error status."""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate > 0:
+                now = time.monotonic()
+                self.tokens = min(self.rate * 60, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens < 1:
+                    self.stats['throttled'] += 1
+                    return 429
+                self.tokens -= 1
+            if self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 503
+            return None
+
+    def time_series(self, params):
+        """Build the body of a ``time_series`` request."""
+        symbol = params.get('symbol', 'BTC/USD')
+        interval = params.get('interval', '1h')
+        outputsize = min(int(params.get('outputsize', 5000)), self.page_cap)
+        end = pd.Timestamp(params['end_date']) if 'end_date' in params else pd.Timestamp.now().floor('s')
+        start = pd.Timestamp(params['start_date']) if 'start_date' in params \
+            else end - interval_timedelta(interval) * (outputsize - 1)
+
+        if self.fixture is not None:
+            columns = self.fixture
+            lo = np.searchsorted(columns['datetime'], start.value, side='left')
+            hi = np.searchsorted(columns['datetime'], end.value, side='right')
+            selected = np.arange(lo, hi)
+        else:
+            # Only synthesize the newest ``outputsize`` bars of the range
+            step = interval_timedelta(interval)
+            start = max(start, end - step * outputsize)
+            columns = synthetic_columns(symbol, start, end, interval, self.seed,
+                                        params.get('timezone'))
+            selected = np.arange(len(columns['datetime']))
+
+        index = selected[::-1][:outputsize]
+        if len(index) == 0:
+            return orjson.dumps({'code': 400, 'message': NO_DATA_MESSAGE, 'status': 'error'})
+        with self.lock:
+            self.stats['ok'] += 1
+            self.stats['bars'] += len(index)
+        return encode_payload(symbol, interval, columns, index)
+
+    def handler(self):
+        """Build the request handler class bound to this server."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                time.sleep(mock.latency + mock.random.uniform(0, mock.jitter))
+
+                headers = {}
+                if url.path.strip('/') != 'time_series':
+                    status, body = 404, orjson.dumps({'code': 404, 'message': 'Not found', 'status': 'error'})
+                else:
+                    status = mock.admit()
+                    if status == 429:
+                        headers['Retry-After'] = '1'
+                        body = orjson.dumps({'code': 429, 'status': 'error', 'message':
+                                             "You have run out of API credits for the current minute."})
+                    elif status == 503:
+                        body = orjson.dumps({'code': 503, 'message': 'Service unavailable', 'status': 'error'})
+                    else:
+                        status, body = 200, mock.time_series(params)
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread and return the base URL."""
+        self.server = ThreadingHTTPServer((self.host, self.port), self.handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Stop serving."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local TwelveData time_series stand-in.")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--latency-ms', type=float, default=None)
+    parser.add_argument('--jitter-ms', type=float, default=None)
+    parser.add_argument('--error-rate', type=float, default=None)
+    parser.add_argument('--requests-per-minute', type=float, default=None)
+    parser.add_argument('--page-cap', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--fixture', default=None, help="Recorded payload to serve, relative to the repo root")
+    args = parser.parse_args()
+
+    mock = MockTwelveData(**vars(args))
+    mock.server = ThreadingHTTPServer((mock.host, mock.port), mock.handler())
+    print(f"Serving TwelveData mock on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Stats: {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Shared HTTP clients for the stock data API.
+
+ApiClient keeps connections alive across calls with a single
+``requests.Session``; AsyncApiClient does the same with an ``httpx.AsyncClient``
+for the concurrent multi-symbol runner. Requests that fail with a connection
+error, a timeout, 429 or a 5xx status are retried with jittered exponential
+backoff (honouring ``Retry-After``) until the retry budget or the per-call
+deadline runs out. Latency and retry counts are kept in ``metrics`` so each run
+can report them. RateLimiter paces concurrent async callers to the vendor's
+per-minute request quota.
+"""
+
+import asyncio
+import random
+import time
+import warnings
+from pathlib import Path
+
+import httpx
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+warnings.filterwarnings('ignore')
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def api_base_url():
+    """Return the vendor base URL, or the local mock server's when ``mock_api.enabled`` is set."""
+    mock_configs = configs['mock_api']
+    if mock_configs['enabled']:
+        return f"http://{mock_configs['host']}:{mock_configs['port']}/"
+    return configs['stock_api_params']['base_url']
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, burst=1):
+        """
+        Initializes the RateLimiter instance, an asyncio token bucket.
+
+        Args:
+            requests_per_minute (float): Sustained request rate; 0 disables limiting.
+            burst (int): Requests that may be sent back to back before pacing starts.
+        """
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryingClient:
+    def __init__(self, base_url, pool_size=10, max_retries=5, backoff_base=0.5,
+                 backoff_max=30.0, timeout=10.0, deadline=60.0):
+        """
+        Initializes the retry policy and metrics shared by the clients.
+
+        Args:
+            base_url (str): Base URL every endpoint is joined to.
+            pool_size (int): Keep-alive connections kept per host.
+            max_retries (int): Retries after the first attempt.
+            backoff_base (float): Backoff ceiling of the first retry, in seconds.
+            backoff_max (float): Upper bound of any single backoff, in seconds.
+            timeout (float): Timeout of a single attempt, in seconds.
+            deadline (float): Time budget of a whole call including retries, in seconds.
+        """
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.deadline = deadline
+        self.metrics = {'requests': 0, 'retries': 0, 'failures': 0, 'latencies': []}
+
+    @classmethod
+    def from_config(cls, base_url=None):
+        """Create a client from the ``api_client`` section of config.yml."""
+        client_configs = configs['api_client']
+        return cls(
+            base_url or api_base_url(),
+            pool_size=client_configs['pool_size'],
+            max_retries=client_configs['max_retries'],
+            backoff_base=client_configs['backoff_base'],
+            backoff_max=client_configs['backoff_max'],
+            timeout=client_configs['timeout'],
+            deadline=client_configs['deadline'],
+        )
+
+    def backoff(self, attempt, response=None):
+        """Return the sleep before retry ``attempt``: full jitter, or the server's Retry-After."""
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return min(float(response.headers['Retry-After']), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, response, error):
+        """Check whether an attempt failed transiently."""
+        return error is not None or response.status_code in RETRY_STATUSES
+
+    def record(self, start):
+        """Record one attempt that started at ``start`` (a perf_counter value)."""
+        self.metrics['requests'] += 1
+        self.metrics['latencies'].append(time.perf_counter() - start)
+
+    def metrics_summary(self):
+        """Return request count, retries, failures and latency percentiles in milliseconds."""
+        latencies = sorted(self.metrics['latencies'])
+
+        def percentile(q):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1e3
+
+        return {
+            'requests': self.metrics['requests'],
+            'retries': self.metrics['retries'],
+            'failures': self.metrics['failures'],
+            'latency_p50_ms': percentile(0.50),
+            'latency_p95_ms': percentile(0.95),
+            'latency_max_ms': latencies[-1] * 1e3 if latencies else 0.0,
+        }
+
+
+class ApiClient(RetryingClient):
+    def __init__(self, base_url, **kwargs):
+        """
+        Initializes the ApiClient instance.
+
+        Args:
+            base_url (str): Base URL every endpoint is joined to.
+            **kwargs: Retry policy, see RetryingClient.
+        """
+        super().__init__(base_url, **kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, endpoint, params=None, deadline=None):
+        """
+        Sends a GET request, retrying transient failures within the deadline.
+
+        Args:
+            endpoint (str): Path relative to ``base_url``.
+            params (dict): Query parameters.
+            deadline (float): Overrides the configured per-call deadline, in seconds.
+
+        Returns:
+            requests.Response: The last response received.
+
+        Raises:
+            requests.RequestException: If no response was received at all.
+        """
+        url = self.base_url + endpoint
+        call_deadline = time.monotonic() + (deadline or self.deadline)
+        response = None
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = call_deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            start = time.perf_counter()
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=min(self.timeout, remaining))
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+            self.record(start)
+
+            if not self.should_retry(response, error):
+                return response
+
+            sleep = self.backoff(attempt, response)
+            if attempt == self.max_retries or time.monotonic() + sleep >= call_deadline:
+                break
+            self.metrics['retries'] += 1
+            time.sleep(sleep)
+
+        self.metrics['failures'] += 1
+        if response is None:
+            raise error or requests.Timeout(f"Deadline exceeded for {url}")
+        return response
+
+
+class AsyncApiClient(RetryingClient):
+    def __init__(self, base_url, **kwargs):
+        """
+        Initializes the AsyncApiClient instance. Use it as an async context manager.
+
+        Args:
+            base_url (str): Base URL every endpoint is joined to.
+            **kwargs: Retry policy, see RetryingClient.
+        """
+        super().__init__(base_url, **kwargs)
+        self.client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def get(self, endpoint, params=None, deadline=None):
+        """
+        Sends a GET request, retrying transient failures within the deadline.
+
+        Args:
+            endpoint (str): Path relative to ``base_url``.
+            params (dict): Query parameters; None values are dropped.
+            deadline (float): Overrides the configured per-call deadline, in seconds.
+
+        Returns:
+            httpx.Response: The last response received.
+
+        Raises:
+            httpx.TransportError: If no response was received at all.
+        """
+        url = self.base_url + endpoint
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        call_deadline = time.monotonic() + (deadline or self.deadline)
+        response = None
+        error = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = call_deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(
+                    url, params=params, timeout=min(self.timeout, remaining))
+                error = None
+            except httpx.TransportError as e:
+                response, error = None, e
+            self.record(start)
+
+            if not self.should_retry(response, error):
+                return response
+
+            sleep = self.backoff(attempt, response)
+            if attempt == self.max_retries or time.monotonic() + sleep >= call_deadline:
+                break
+            self.metrics['retries'] += 1
+            await asyncio.sleep(sleep)
+
+        self.metrics['failures'] += 1
+        if response is None:
+            raise error or httpx.TimeoutException(f"Deadline exceeded for {url}")
+        return response
+
+
+_client = None
+
+
+def get_client():
+    """Return the process-wide synchronous client configured from config.yml."""
+    global _client
+    if _client is None:
+        _client = ApiClient.from_config()
+    return _client
@@ -0,0 +1,246 @@
+"""
+Paged, resumable historical backfill into the raw bar store.
+
+The vendor caps the number of bars returned per request, so a long range is
+split into pages of at most ``backfill.page_bars`` bars. Interior pages are
+aligned to a fixed grid, so overlapping backfills share them. Pages are fetched
+concurrently through an AsyncApiClient, paced by a RateLimiter, and written
+straight into the BarStore. Every completed page is recorded in a checkpoint
+file next to the bars, so rerunning a failed or interrupted backfill only
+fetches the pages that are still missing.
+
+Usage:
+    python src/feature_pipeline/BackfillEngine.py --start 2022-01-01
+    python src/feature_pipeline/BackfillEngine.py --symbol ETH/USD --start 2023-01-01 --end 2024-01-01
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from pathlib import Path
+
+import httpx
+import pandas as pd
+import yaml
+
+from ApiClient import AsyncApiClient, RateLimiter
+from BarStore import interval_timedelta
+from bar_batch import bars_from_columns
+from bar_decoder import decode_bars
+from storage import write_json
+
+warnings.filterwarnings('ignore')
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+# Grid origin of page boundaries
+PAGE_ANCHOR = pd.Timestamp('1970-01-01')
+
+
+class BackfillEngine:
+    def __init__(self, stock, page_bars=None, concurrency=None, requests_per_minute=None):
+        """
+        Initializes the BackfillEngine instance.
+
+        Args:
+            stock (StockData): Symbol to backfill; its store receives the bars.
+            page_bars (int): Bars per request, at most the vendor's output cap.
+            concurrency (int): Pages in flight at the same time.
+            requests_per_minute (float): Request quota shared by all pages; 0 disables it.
+        """
+        backfill_configs = configs['backfill']
+        self.stock = stock
+        self.store = stock.store
+        self.interval = configs['stock_api_params']['time_interval']
+        self.page_bars = page_bars or backfill_configs['page_bars']
+        self.concurrency = concurrency or backfill_configs['concurrency']
+        if requests_per_minute is None:
+            requests_per_minute = backfill_configs['requests_per_minute']
+        self.requests_per_minute = requests_per_minute
+        self.checkpoint_path = self.store.path / f"backfill_{self.interval}.json"
+
+    def pages(self, start, end):
+        """
+        Splits ``[start, end]`` into grid-aligned pages of at most ``page_bars`` bars.
+
+        Args:
+            start: First datetime of the range.
+            end: Last datetime of the range.
+
+        Returns:
+            list: ``(page_start, page_end)`` Timestamp pairs, oldest first.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        # Both bounds may be inclusive on the vendor side, so a page spans one bar less
+        span = interval_timedelta(self.interval) * (self.page_bars - 1)
+        first = (start - PAGE_ANCHOR) // span
+        last = (end - PAGE_ANCHOR) // span
+
+        pages = []
+        for i in range(first, last + 1):
+            page_start = max(PAGE_ANCHOR + i * span, start)
+            page_end = min(PAGE_ANCHOR + (i + 1) * span, end)
+            if page_start < page_end:
+                pages.append((page_start, page_end))
+        return pages
+
+    @staticmethod
+    def page_id(page):
+        """Return the checkpoint key of a page."""
+        return f"{page[0].isoformat()}/{page[1].isoformat()}"
+
+    def read_checkpoint(self):
+        """Return the keys of the pages completed by earlier runs."""
+        if not self.checkpoint_path.exists():
+            return set()
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            return set(json.load(f)['completed'])
+
+    def write_checkpoint(self, completed):
+        """Record the completed pages, replacing the checkpoint file atomically."""
+        write_json(self.checkpoint_path,
+                   {'interval': self.interval, 'completed': sorted(completed)}, indent=1)
+
+    def page_bars_from_response(self, response):
+        """
+        Extracts the bars of a page response.
+
+        Returns:
+            np.ndarray: The page's bar batch, empty if the vendor has no data for
+            it, or None if the request failed and the page must be retried.
+        """
+        if response.status_code != 200:
+            print(f"Failed to fetch page: {response.status_code}")
+            return None
+        payload, columns = decode_bars(response.content)
+        if payload.get('status') == 'error':
+            # The vendor answers a range without bars (e.g. a market holiday) with code 400
+            if payload.get('code') == 400 and 'no data' in payload.get('message', '').lower():
+                return bars_from_columns(columns)
+            print(f"Failed to fetch page: {payload.get('message')}")
+            return None
+        return bars_from_columns(columns)
+
+    async def fetch_page(self, client, page, limiter, semaphore, write_lock, completed, summary):
+        """Fetch one page, append its bars to the store and checkpoint it unless ``completed`` is None."""
+        async with semaphore:
+            await limiter.acquire()
+            fetched_at = pd.Timestamp.now(tz=configs['stock_api_params']['timezone']).tz_localize(None)
+            try:
+                response = await self.stock.fetch_range_data_from_api_async(
+                    client, page[0], page[1], outputsize=self.page_bars)
+            except httpx.TransportError as e:
+                print(f"Failed to fetch page {self.page_id(page)}: {e}")
+                summary['failed'] += 1
+                return
+
+        bars = self.page_bars_from_response(response)
+        if bars is None:
+            summary['failed'] += 1
+            return
+
+        # A single writer keeps concurrent pages from rewriting the same partition
+        async with write_lock:
+            if len(bars):
+                await asyncio.to_thread(self.store.append, bars)
+            # A page reaching into the current bar is not final, fetch it again next time
+            if completed is not None and page[1] < fetched_at - interval_timedelta(self.interval):
+                completed.add(self.page_id(page))
+                await asyncio.to_thread(self.write_checkpoint, completed)
+        summary['fetched'] += 1
+        summary['bars'] += len(bars)
+
+    async def run_async(self, start, end, client=None):
+        """
+        Backfills ``[start, end]``, skipping the pages completed by earlier runs.
+
+        Args:
+            start: First datetime of the range.
+            end: Last datetime of the range.
+            client (AsyncApiClient): Client to fetch through; a new one is
+                created from config.yml if None.
+
+        Returns:
+            dict: Page and bar counts of the run.
+        """
+        pages = self.pages(start, end)
+        completed = self.read_checkpoint()
+        pending = [page for page in pages if self.page_id(page) not in completed]
+        summary = {'pages': len(pages), 'skipped': len(pages) - len(pending),
+                   'fetched': 0, 'failed': 0, 'bars': 0}
+        print(f"Backfilling {self.stock.symbol} from {start} to {end}: "
+              f"{len(pending)} of {len(pages)} pages to fetch")
+
+        await self.fetch_pages(pending, completed, summary, client)
+        return summary
+
+    async def fetch_pages(self, pages, completed, summary, client=None):
+        """Fetch pages concurrently, paced by the rate limiter; see ``fetch_page``."""
+        limiter = RateLimiter(self.requests_per_minute, burst=self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock()
+
+        async def fetch_all(api_client):
+            await asyncio.gather(*(
+                self.fetch_page(api_client, page, limiter, semaphore,
+                                write_lock, completed, summary)
+                for page in pages))
+
+        if client is None:
+            async with AsyncApiClient.from_config() as client:
+                await fetch_all(client)
+        else:
+            await fetch_all(client)
+
+    async def refetch_async(self, ranges, client=None):
+        """
+        Fetches only the given inclusive ``(first, last)`` ranges, e.g. gaps in the store.
+
+        The ranges are paged like a backfill but bypass the checkpoint: the
+        pages covering a gap may well be recorded as completed.
+
+        Returns:
+            dict: Page and bar counts of the run.
+        """
+        pages = [page for first, last in ranges
+                 for page in self.pages(first, last) or [(pd.Timestamp(first), pd.Timestamp(last))]]
+        summary = {'pages': len(pages), 'skipped': 0, 'fetched': 0, 'failed': 0, 'bars': 0}
+        print(f"Refetching {len(ranges)} ranges of {self.stock.symbol} in {len(pages)} pages")
+        await self.fetch_pages(pages, None, summary, client)
+        return summary
+
+    def refetch(self, ranges):
+        """Synchronous wrapper around refetch_async."""
+        return asyncio.run(self.refetch_async(ranges))
+
+    def run(self, start, end):
+        """Synchronous wrapper around run_async."""
+        start_time = time.perf_counter()
+        summary = asyncio.run(self.run_async(start, end))
+        summary['seconds'] = time.perf_counter() - start_time
+        print(f"Backfill summary: {summary}")
+        if summary['failed']:
+            print("Some pages failed, rerun the backfill to fetch only the missing pages")
+        return summary
+
+
+if __name__ == "__main__":
+    from StockData import StockData
+
+    parser = argparse.ArgumentParser(description="Backfill historical bars into the bar store.")
+    parser.add_argument('--symbol', default=configs['stock_api_params']['symbols'][0])
+    parser.add_argument('--start', required=True, help="First date, e.g. 2022-01-01")
+    parser.add_argument('--end', default=None, help="Last date, defaults to now")
+    args = parser.parse_args()
+
+    end = args.end or pd.Timestamp.now(
+        tz=configs['stock_api_params']['timezone']).tz_localize(None).floor('s')
+    BackfillEngine(StockData(args.symbol)).run(args.start, end)
@@ -0,0 +1,751 @@
+"""
+Append-only, time-partitioned Parquet store for raw OHLC bars.
+
+Bars for a symbol live under ``data/bars/<BASE>/`` as one Parquet file per
+partition (day, month or year of their UTC time), each sorted ascending by
+``time``. Partitions hold bar batches as they are in memory (see
+``bar_batch``): UTC epoch seconds and int64 fixed-point prices. Appending new
+bars only rewrites the partitions they fall into, which for the hourly job is
+the newest one, so write cost no longer grows with the amount of history kept.
+
+The data directory is committed to git every hour, so new bars go to small
+head partitions (``bar_store.head_partition``, a UTC day by default) and the
+hourly commit only changes a few KB. Once a period of ``bar_store.partition``
+(a month by default) is over, ``compact`` merges its head partitions into one
+sealed partition, which is not rewritten again unless the vendor revises a
+bar in it. Keys of either granularity live side by side ("2024-10",
+"2024-11-01", ...); a finer partition inside a coarser one is a leftover of
+an interrupted compaction and is ignored.
+
+The store also maintains a pyramid of coarser resolutions (``bar_store.pyramid``,
+e.g. 4h and 1day on top of 1h bars) under ``data/bars/<BASE>/<resolution>/``.
+Each append re-aggregates only the coarse buckets the new bars fall into, each
+level from the one below it, so every resolution can be read at any time
+without resampling the full history. Coarse buckets follow the local clock of
+the API's timezone, so daily bars start at local midnight like the vendor's.
+
+Writes are crash-safe (see ``storage``): partitions are replaced atomically,
+so readers always see complete files, and every batch of new bars is logged
+to ``bars.wal`` before any partition is touched, then replayed if a run
+crashed before applying it.
+"""
+
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+
+from bar_batch import (BAR_DTYPE, NS_PER_SECOND, PRICE_SCALE, bars_from_columns, bars_from_frame,
+                       empty_bars, local_to_utc, sort_bars, to_epoch, utc_to_local)
+from bar_decoder import PRICE_FIELDS, columns_from_rows, decode_bars, sort_columns
+from bar_merge import merge_bars
+from storage import append_lines, wal_append, wal_clear, wal_read, write_parquet
+
+warnings.filterwarnings('ignore')
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+# Partition granularity -> NumPy datetime unit of the partition keys
+PARTITION_UNITS = {
+    'day': 'D',
+    'month': 'M',
+    'year': 'Y',
+}
+
+# Vendor interval suffix -> pandas Timedelta unit
+INTERVAL_UNITS = {
+    'min': 'min',
+    'h': 'h',
+    'day': 'D',
+    'week': 'W',
+}
+
+# Length of the keys of each partition granularity, e.g. "2024-11" for a month
+KEY_LENGTHS = {
+    'day': 10,
+    'month': 7,
+    'year': 4,
+}
+
+BAR_SCHEMA = pa.schema([(name, pa.int64()) for name in BAR_DTYPE.names],
+                       metadata={'price_scale': str(PRICE_SCALE)})
+
+
+def interval_timedelta(interval):
+    """Return the length of a vendor bar interval such as "1min", "1h" or "1day"."""
+    for suffix, unit in INTERVAL_UNITS.items():
+        count = interval[:-len(suffix)]
+        if interval.endswith(suffix) and count.isdigit():
+            return pd.Timedelta(int(count), unit=unit)
+    raise ValueError(f"Unsupported bar interval: {interval}")
+
+
+def follows_utc_clock(resolution):
+    """Check whether buckets of a resolution keep a fixed length in UTC (up to hourly)."""
+    return interval_timedelta(resolution) <= pd.Timedelta(hours=1)
+
+
+def bucket_floor(times, resolution):
+    """
+    Floor UTC epoch seconds to the start of their ``resolution`` bucket.
+
+    Buckets are aligned to midnight of the local bar clock; weekly buckets
+    start on Monday. Hourly and finer buckets are floored by the local time
+    elapsed in them, which keeps the two hours labelled 01:00 when DST ends apart.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    step = interval_timedelta(resolution).value
+    local = utc_to_local(times * NS_PER_SECOND)
+    # The epoch is a Thursday, shift by three days so weeks start on Monday
+    anchor = pd.Timedelta(days=3).value if resolution.endswith('week') else 0
+    floored = (local + anchor) // step * step - anchor
+    if follows_utc_clock(resolution):
+        return times - (local - floored) // NS_PER_SECOND
+    # Coarse bucket starts are never ambiguous, convert each distinct one once
+    starts, inverse = np.unique(floored, return_inverse=True)
+    return (local_to_utc(starts) // NS_PER_SECOND)[inverse]
+
+
+def bucket_shift(starts, resolution, n=1):
+    """
+    Return the start of the bucket ``n`` buckets after each of ``starts``; ``n=1`` is its end.
+
+    Coarse buckets follow the local clock, so a day spanning a DST change
+    lasts 23 or 25 hours.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    step = interval_timedelta(resolution).value
+    if follows_utc_clock(resolution):
+        return starts + n * step // NS_PER_SECOND
+    local = utc_to_local(starts * NS_PER_SECOND) + n * step
+    return local_to_utc(local) // NS_PER_SECOND
+
+
+def resample_bars(bars, resolution):
+    """
+    Aggregates ascending bars into ``resolution`` OHLC bars in one vectorized pass.
+
+    Args:
+        bars (np.ndarray): Bar batch, oldest first.
+        resolution (str): Target resolution, e.g. "4h" or "1day".
+
+    Returns:
+        np.ndarray: One bar per non-empty bucket, labelled with the bucket start.
+    """
+    if len(bars) == 0:
+        return empty_bars()
+    keys = bucket_floor(bars['time'], resolution)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    resampled = empty_bars(len(starts))
+    resampled['time'] = keys[starts]
+    resampled['open'] = bars['open'][starts]
+    resampled['high'] = np.maximum.reduceat(bars['high'], starts)
+    resampled['low'] = np.minimum.reduceat(bars['low'], starts)
+    resampled['close'] = bars['close'][ends]
+    return resampled
+
+
+def partition_bounds(key):
+    """Return the UTC epoch seconds ``[start, end)`` a partition key ("2024", "2024-11", "2024-11-03") spans."""
+    start = np.datetime64(key)
+    return (int(start.astype('datetime64[s]').astype(np.int64)),
+            int((start + 1).astype('datetime64[s]').astype(np.int64)))
+
+
+def bars_from_values(values):
+    """Convert the API's list of bar dicts into an ascending bar batch."""
+    return bars_from_columns(sort_columns(columns_from_rows(values)))
+
+
+def table_to_bars(table):
+    """Convert a partition table into a bar batch, rescaling prices stored at another scale."""
+    bars = empty_bars(table.num_rows)
+    for name in BAR_DTYPE.names:
+        bars[name] = table.column(name).to_numpy()
+    metadata = table.schema.metadata or {}
+    scale = int(metadata.get(b'price_scale', PRICE_SCALE))
+    if scale != PRICE_SCALE:
+        for field in PRICE_FIELDS:
+            bars[field] = np.rint(bars[field] * (PRICE_SCALE / scale)).astype(np.int64)
+    return bars
+
+
+class BarStore:
+    def __init__(self, symbol, root=None, partition=None, resolution=None):
+        """
+        Initializes the BarStore instance.
+
+        Args:
+            symbol (str): Symbol whose bars are stored, e.g. "BTC/USD".
+            root (str or Path): Store root directory. Defaults to the
+                ``bar_store.root`` entry of config.yml.
+            partition (str): Granularity of the sealed partitions, "day",
+                "month" or "year".
+            resolution (str): Bar resolution to read and write. Defaults to the
+                API's interval; coarser ones must be levels of ``bar_store.pyramid``.
+        """
+        store_configs = configs['bar_store']
+        self.symbol = symbol
+        self.root = Path(root) if root else BASE_DIR / store_configs['root']
+        self.base_resolution = configs['stock_api_params']['time_interval']
+        self.resolution = resolution or self.base_resolution
+        self.path = self.root / symbol.split('/')[0]
+        if self.resolution != self.base_resolution:
+            if self.resolution not in self.pyramid_levels():
+                raise ValueError(f"Resolution {self.resolution} is not a level of bar_store.pyramid")
+            self.path = self.path / self.resolution
+            partition = partition or store_configs['pyramid'][self.resolution]
+        self.partition = partition or store_configs['partition']
+        if self.partition not in PARTITION_UNITS:
+            raise ValueError(f"Unknown partition granularity: {self.partition}")
+        # New bars go to head partitions, never coarser than the sealed ones
+        head_partition = store_configs['head_partition']
+        if head_partition not in PARTITION_UNITS:
+            raise ValueError(f"Unknown partition granularity: {head_partition}")
+        self.head_partition = max(head_partition, self.partition, key=KEY_LENGTHS.get)
+
+    def pyramid_levels(self):
+        """Return the configured resolutions coarser than the base one, finest first."""
+        base = interval_timedelta(self.base_resolution)
+        levels = [r for r in configs['bar_store']['pyramid'] if interval_timedelta(r) > base]
+        return sorted(levels, key=interval_timedelta)
+
+    def level(self, resolution):
+        """Return the store of one resolution of this symbol's pyramid."""
+        if resolution in (None, self.resolution):
+            return self
+        return BarStore(self.symbol, root=self.root, resolution=resolution)
+
+    def partition_keys(self, times, partition=None):
+        """Return the partition keys of UTC epoch seconds, e.g. "2024-11" for monthly partitions."""
+        times = np.asarray(times, dtype=np.int64).view('datetime64[s]')
+        return np.datetime_as_string(times, unit=PARTITION_UNITS[partition or self.partition])
+
+    def write_keys(self, times):
+        """
+        Returns the partition each bar is written to.
+
+        A bar goes to the stored partition covering it, of any granularity.
+        Otherwise it starts a sealed partition if its whole period lies
+        before the latest head partition and no bar of the period is stored
+        yet (e.g. a backfill), or else a head partition.
+
+        Args:
+            times (np.ndarray): Bar times, UTC epoch seconds, oldest first.
+
+        Returns:
+            np.ndarray: Partition key of each bar.
+        """
+        stored = self.stored_keys()
+        keys = self.partition_keys(times, self.head_partition).astype(object)
+        covered = np.zeros(len(times), dtype=bool)
+        # Coarsest first, so the bars of a sealed partition never start a head one
+        for partition in sorted(PARTITION_UNITS, key=KEY_LENGTHS.get):
+            candidates = self.partition_keys(times, partition)
+            found = ~covered & np.isin(candidates, stored)
+            keys[found] = candidates[found]
+            covered |= found
+        if self.head_partition == self.partition or covered.all():
+            return keys
+
+        last = self.last_time()
+        latest = int(times[-1]) if last is None else max(int(times[-1]), last)
+        head_start = partition_bounds(self.partition_keys([latest], self.head_partition)[0])[0]
+        sealed = self.partition_keys(times, self.partition)
+        for key in np.unique(sealed[~covered]):
+            if partition_bounds(key)[1] <= head_start and \
+                    not any(stored_key.startswith(key) for stored_key in stored):
+                in_key = ~covered & (sealed == key)
+                keys[in_key] = key
+        return keys.astype(str)
+
+    def partition_path(self, key):
+        """Return the file path of a partition."""
+        return self.path / f"{key}.parquet"
+
+    def stored_keys(self):
+        """Return the keys of all partition files, including ones a coarser partition supersedes."""
+        if not self.path.exists():
+            return []
+        return sorted(p.stem for p in self.path.glob("*.parquet"))
+
+    def list_partitions(self):
+        """Return the keys of all stored partitions, oldest first."""
+        partitions = []
+        for key in self.stored_keys():
+            # Left over by a compaction that wrote the coarser partition but did not finish
+            if partitions and key.startswith(partitions[-1]):
+                continue
+            partitions.append(key)
+        return partitions
+
+    def is_empty(self):
+        """Check whether the store holds any bars."""
+        return not self.list_partitions()
+
+    def read_partition(self, key, filters=None):
+        """Read a single partition as a bar batch, optionally with row filters pushed down."""
+        return table_to_bars(pq.read_table(self.partition_path(key), filters=filters))
+
+    def write_partition(self, key, bars):
+        """Write a bar batch as a single partition, atomically replacing any previous contents."""
+        table = pa.Table.from_arrays([pa.array(bars[name]) for name in BAR_DTYPE.names],
+                                    schema=BAR_SCHEMA)
+        write_parquet(table, self.partition_path(key))
+
+    def append(self, bars):
+        """
+        Appends bars to the store, touching only the partitions they fall into.
+
+        Bars that share a time with a stored bar replace it, so re-sending
+        the still-forming latest bar is safe. See ``upsert``.
+
+        Args:
+            bars (np.ndarray): Bar batch.
+
+        Returns:
+            int: Number of bars written.
+        """
+        return self.upsert(bars)['bars']
+
+    def upsert(self, bars):
+        """
+        Merges bars into the partitions they fall into and records revised bars.
+
+        Each touched partition is combined with the new bars in one sorted
+        merge (see ``bar_merge.merge_bars``). Stored bars whose prices change
+        are appended to the revision log, where feature engineering picks them
+        up to recompute the rows built from the old prices.
+
+        On the base resolution the bars are logged to the write-ahead log
+        first and the log is cleared once every partition and pyramid level
+        is written. Revisions are recorded before the partitions change, so
+        a replay after a crash cannot miss them.
+
+        Args:
+            bars (np.ndarray): Bar batch.
+
+        Returns:
+            dict: Number of ``bars`` written, of them ``inserted`` new ones, and
+            the ``revised`` times.
+        """
+        if len(bars) == 0 or self.resolution != self.base_resolution:
+            return self.merge_into_partitions(bars)
+        self.replay_wal()
+        bars = sort_bars(bars)
+        wal_append(self.wal_path(), bars.tobytes())
+        report = self.merge_into_partitions(bars)
+        wal_clear(self.wal_path())
+        return report
+
+    def merge_into_partitions(self, bars):
+        """Merge a bar batch into its partitions and, on the base resolution, the pyramid; see ``upsert``."""
+        report = {'bars': len(bars), 'inserted': 0, 'revised': np.empty(0, dtype=np.int64)}
+        if len(bars) == 0:
+            return report
+
+        bars = sort_bars(bars)
+        keys = self.write_keys(bars['time'])
+        merged_parts, revised = [], []
+        part_keys, part_starts = np.unique(keys, return_index=True)
+        for key, part in zip(part_keys, np.split(bars, part_starts[1:])):
+            if self.partition_path(key).exists():
+                part, merged = merge_bars(self.read_partition(key), part)
+                report['inserted'] += merged['inserted']
+                revised.append(merged['revised'])
+            else:
+                report['inserted'] += len(part)
+            merged_parts.append((key, part))
+        if revised:
+            report['revised'] = np.concatenate(revised)
+            self.record_revisions(report['revised'])
+        for key, part in merged_parts:
+            self.write_partition(key, part)
+        print(f"Appended {len(bars)} bars to {self.path} ({report['inserted']} new, "
+              f"{len(report['revised'])} revised)")
+
+        if self.resolution == self.base_resolution:
+            self.update_pyramid(bars)
+        return report
+
+    #### Write-ahead log ####
+
+    def wal_path(self):
+        """Return the path of the write-ahead log of bars not yet merged into the partitions."""
+        return self.path / "bars.wal"
+
+    def replay_wal(self):
+        """
+        Merges the bars of an upsert that crashed before completing.
+
+        Merging is idempotent, so partitions and pyramid buckets the crashed
+        run already wrote are rewritten unchanged.
+
+        Returns:
+            int: Number of bars replayed.
+        """
+        if self.resolution != self.base_resolution:
+            return self.level(self.base_resolution).replay_wal()
+        payloads = wal_read(self.wal_path())
+        if not payloads:
+            return 0
+        print(f"Replaying {len(payloads)} logged batches into {self.path}")
+        replayed = 0
+        for payload in payloads:
+            replayed += self.merge_into_partitions(
+                np.frombuffer(payload, dtype=BAR_DTYPE).copy())['bars']
+        wal_clear(self.wal_path())
+        return replayed
+
+    #### Revision log ####
+
+    def revisions_path(self):
+        """Return the path of the append-only log of revised bar times."""
+        return self.path / "revisions.log"
+
+    def record_revisions(self, times):
+        """Append revised bar times (UTC epoch seconds) to the revision log, one per line."""
+        if len(times) == 0:
+            return
+        append_lines(self.revisions_path(), times)
+
+    def read_revisions(self, offset=0):
+        """
+        Reads the revisions logged since ``offset``.
+
+        Each consumer keeps its own offset, so any number of them can follow
+        the same log.
+
+        Returns:
+            tuple: Revised bar times and the offset to resume from.
+        """
+        path = self.revisions_path()
+        if not path.exists():
+            return np.empty(0, dtype=np.int64), offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Leave a line still being written for the next read
+        data = data[:data.rfind(b'\n') + 1]
+        return np.array(data.split(), dtype=np.int64), offset + len(data)
+
+    def revisions_end(self):
+        """Return the offset past the last logged revision."""
+        path = self.revisions_path()
+        return path.stat().st_size if path.exists() else 0
+
+    def update_pyramid(self, bars):
+        """
+        Re-aggregates the coarse buckets touched by newly appended base bars.
+
+        Each level is rebuilt from the finest level below it whose buckets
+        nest into its own (4h from 1h, 1day from 4h), reading only the buckets
+        that changed. An empty level is built from its full source history.
+
+        Args:
+            bars (np.ndarray): The bar batch just appended to the base store.
+        """
+        sources = [self]
+        first, last = bars['time'].min(), bars['time'].max()
+        for resolution in self.pyramid_levels():
+            level = self.level(resolution)
+            step = interval_timedelta(resolution)
+            source = next(src for src in reversed(sources)
+                          if step % interval_timedelta(src.resolution) == pd.Timedelta(0))
+
+            if level.is_empty():
+                source_bars = source.read_range()
+            else:
+                start = bucket_floor([first], resolution)[0]
+                end = bucket_shift(bucket_floor([last], resolution), resolution)[0] - 1
+                source_bars = source.read_range(start, end)
+
+            resampled = resample_bars(source_bars, resolution)
+            level.append(resampled)
+            sources.append(level)
+            if len(resampled):
+                first, last = resampled['time'].min(), resampled['time'].max()
+
+    def ensure_pyramid(self):
+        """Build any missing pyramid level, e.g. for stores written before the pyramid existed."""
+        self.replay_wal()
+        if self.is_empty() or all(not self.level(r).is_empty() for r in self.pyramid_levels()):
+            return
+        # Empty levels are built from their full source history
+        self.update_pyramid(self.tail(1))
+
+    def rebuild_pyramid(self):
+        """Rebuild every pyramid level from scratch, e.g. after changing ``bar_store.pyramid``."""
+        for resolution in self.pyramid_levels():
+            level = self.level(resolution)
+            for key in level.list_partitions():
+                level.partition_path(key).unlink()
+        self.ensure_pyramid()
+
+    def compact(self):
+        """
+        Merges the head partitions of completed periods into sealed partitions.
+
+        Covers this store and, on the base resolution, its pyramid levels.
+        Head partitions are merged into each granularity between them and the
+        sealed one in turn (days into months, then months into a year), once
+        the period is over, i.e. the latest bar lies in a later head
+        partition. The merged partition is written before the merged ones are
+        removed, so an interrupted compaction only leaves superseded files,
+        which the next one removes.
+
+        Returns:
+            int: Number of partition files merged or removed.
+        """
+        self.replay_wal()
+        stores = [self]
+        if self.resolution == self.base_resolution:
+            stores += [self.level(resolution) for resolution in self.pyramid_levels()]
+        return sum(store.compact_partitions() for store in stores)
+
+    def compact_partitions(self):
+        """Compact the partitions of this resolution only; see ``compact``."""
+        partitions = self.list_partitions()
+        superseded = sorted(set(self.stored_keys()) - set(partitions))
+        for key in superseded:
+            self.partition_path(key).unlink()
+        removed = len(superseded)
+
+        last = self.last_time()
+        if last is None:
+            return removed
+        head_start = partition_bounds(self.partition_keys([last], self.head_partition)[0])[0]
+        # Finest target first, so days become months before months become a year
+        for partition in sorted(PARTITION_UNITS, key=KEY_LENGTHS.get, reverse=True):
+            length = KEY_LENGTHS[partition]
+            if not KEY_LENGTHS[self.partition] <= length < KEY_LENGTHS[self.head_partition]:
+                continue
+            groups = {}
+            for key in self.list_partitions():
+                if len(key) > length:
+                    groups.setdefault(key[:length], []).append(key)
+            for target, keys in groups.items():
+                if partition_bounds(target)[1] > head_start:
+                    continue
+                self.write_partition(target, np.concatenate([self.read_partition(key) for key in keys]))
+                for key in keys:
+                    self.partition_path(key).unlink()
+                removed += len(keys)
+                print(f"Compacted {len(keys)} partitions of {self.path} into {target}")
+        return removed
+
+    def read_range(self, start=None, end=None):
+        """
+        Reads bars with ``start <= time <= end``, oldest first.
+
+        Partitions entirely outside the range are never opened and the time
+        predicate is pushed down into the Parquet reader.
+
+        Args:
+            start: Inclusive lower bound, UTC epoch seconds or a local datetime
+                (see ``bar_batch.to_epoch``), or None for the beginning of history.
+            end: Inclusive upper bound, or None for the latest bar.
+
+        Returns:
+            np.ndarray: Bar batch of the requested range.
+        """
+        chunks = [self.read_partition(key, filters)
+                  for key, filters in self.partitions_in_range(start, end)]
+        return np.concatenate(chunks) if chunks else empty_bars()
+
+    def partitions_in_range(self, start=None, end=None):
+        """Return the keys of the partitions overlapping a range, with its pushdown filters."""
+        start, end = to_epoch(start), to_epoch(end, latest=True)
+        filters = []
+        if start is not None:
+            filters.append(('time', '>=', start))
+        if end is not None:
+            filters.append(('time', '<=', end))
+
+        partitions = []
+        for key in self.list_partitions():
+            first, stop = partition_bounds(key)
+            if start is not None and stop <= start:
+                continue
+            if end is not None and first > end:
+                continue
+            partitions.append((key, filters or None))
+        return partitions
+
+    def read_ticks(self, start=None, end=None):
+        """
+        Reads only the bar times with ``start <= time <= end``, as UTC epoch seconds.
+
+        Partitions are concatenated in key order without re-sorting, so the
+        result shows the bars in the order they are stored.
+        """
+        chunks = []
+        for key, filters in self.partitions_in_range(start, end):
+            table = pq.read_table(self.partition_path(key), columns=['time'], filters=filters)
+            chunks.append(table.column('time').to_numpy())
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def normalize(self):
+        """
+        Rewrites partitions that are unsorted or hold duplicated times.
+
+        Returns:
+            int: Number of partitions rewritten.
+        """
+        rewritten = 0
+        for key in self.list_partitions():
+            part = self.read_partition(key)
+            if np.all(np.diff(part['time']) > 0):
+                continue
+            # Keep the last stored bar of each time, as a merge would
+            part, _ = merge_bars(empty_bars(), part[np.argsort(part['time'], kind='stable')])
+            self.write_partition(key, part)
+            rewritten += 1
+        return rewritten
+
+    def tail(self, n):
+        """Read the latest ``n`` bars, opening partitions newest first."""
+        chunks = []
+        count = 0
+        for key in reversed(self.list_partitions()):
+            part = self.read_partition(key)
+            chunks.append(part)
+            count += len(part)
+            if count >= n:
+                break
+        if not chunks:
+            return empty_bars()
+        return np.concatenate(chunks[::-1])[-n:]
+
+    def read_after(self, after, warmup=0):
+        """
+        Reads the bars newer than ``after`` plus ``warmup`` bars before them.
+
+        Only the newest partitions needed to cover the range are opened, so
+        reading the few bars that arrived since the last run stays cheap no
+        matter how much history is stored.
+
+        Args:
+            after: Exclusive lower bound on the returned new bars (see ``bar_batch.to_epoch``).
+            warmup (int): Number of bars at or before ``after`` to prepend.
+
+        Returns:
+            np.ndarray: Warm-up bars followed by the new bars, oldest first.
+        """
+        after = to_epoch(after, latest=True)
+        chunks = []
+        n_before = 0
+        for key in reversed(self.list_partitions()):
+            part = self.read_partition(key)
+            chunks.append(part)
+            n_before += int((part['time'] <= after).sum())
+            if n_before >= warmup and partition_bounds(key)[0] <= after:
+                break
+        if not chunks:
+            return empty_bars()
+
+        bars = np.concatenate(chunks[::-1])
+        first_new = np.searchsorted(bars['time'], after, side='right')
+        return bars[max(first_new - warmup, 0):]
+
+    def first_time(self):
+        """Return the time (UTC epoch seconds) of the earliest stored bar, or None if empty."""
+        partitions = self.list_partitions()
+        if not partitions:
+            return None
+        table = pq.read_table(self.partition_path(partitions[0]), columns=['time'])
+        return int(table.column('time').to_numpy().min())
+
+    def last_time(self):
+        """Return the time (UTC epoch seconds) of the latest stored bar, or None if empty."""
+        partitions = self.list_partitions()
+        if not partitions:
+            return None
+        table = pq.read_table(self.partition_path(partitions[-1]), columns=['time'])
+        return int(table.column('time').to_numpy().max())
+
+    def migrate_legacy(self):
+        """
+        Brings a store written by an earlier version up to date.
+
+        Bars logged by a crashed upsert are replayed first. An empty store is
+        bootstrapped from ``data/stockdata_<BASE>.json`` if present,
+        partitions of local datetimes and float prices are upgraded.
+
+        Returns:
+            int: Number of bars imported or upgraded.
+        """
+        if self.resolution != self.base_resolution:
+            # The legacy file holds base bars, the pyramid is built from them
+            return self.level(self.base_resolution).migrate_legacy()
+        self.replay_wal()
+        if not self.is_empty() or self.legacy_paths():
+            return self.upgrade_partitions()
+        json_path = BASE_DIR / "data" / f"stockdata_{self.symbol.split('/')[0]}.json"
+        return self.import_json(json_path)
+
+    def upgrade_partitions(self):
+        """
+        Rewrites partitions of naive local ``datetime`` and float prices as bar batches.
+
+        The whole history is converted at once, so both bars labelled 01:00
+        when DST ends are told apart (see ``bar_batch.local_to_utc``). The
+        pyramid is rebuilt from the upgraded bars. The revision log is
+        dropped; its consumers rebuild their features for the new uid scheme.
+        The old partitions are set aside as ``.legacy`` files until the
+        upgraded ones are written, so an interrupted upgrade resumes from them.
+
+        Returns:
+            int: Number of bars upgraded, 0 if the store is up to date.
+        """
+        legacy_paths = self.legacy_paths()
+        if not legacy_paths:
+            partitions = self.list_partitions()
+            if 'datetime' not in pq.read_schema(self.partition_path(partitions[0])).names:
+                return 0
+            legacy_paths = [self.partition_path(key).rename(self.partition_path(key).with_suffix('.legacy'))
+                            for key in partitions]
+        print(f"Upgrading {self.path} to UTC times and fixed-point prices")
+        legacy = pd.concat([pq.read_table(path).to_pandas() for path in legacy_paths],
+                           ignore_index=True)
+        for resolution in self.pyramid_levels():
+            level = self.level(resolution)
+            for key in level.list_partitions():
+                level.partition_path(key).unlink()
+        self.revisions_path().unlink(missing_ok=True)
+        upgraded = self.append(bars_from_frame(legacy))
+        for legacy_path in legacy_paths:
+            legacy_path.unlink()
+        return upgraded
+
+    def legacy_paths(self):
+        """Return the partitions set aside by an unfinished ``upgrade_partitions``, oldest first."""
+        return sorted(self.path.glob("*.legacy")) if self.path.exists() else []
+
+    def import_json(self, json_path):
+        """
+        Migrates a legacy ``stockdata_<BASE>.json`` file into the store.
+
+        Args:
+            json_path (str or Path): Path to the JSON file written by StockData.
+
+        Returns:
+            int: Number of bars imported, 0 if the file does not exist.
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return 0
+        print(f"Migrating {json_path} into {self.path}")
+        _, columns = decode_bars(json_path.read_bytes())
+        return self.append(bars_from_columns(columns))
@@ -1,11 +1,19 @@
 from pathlib import Path
+import json
 import yaml
 from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
-import hopsworks
-from hsfs.feature_group import FeatureGroup
 import warnings
 
+from backends import login
+from bar_batch import local_to_epoch
+from feature_io import read_features
+from bar_merge import sorted_isin
+from lag_engine import lag_feature_columns
+from storage import write_json
+from uid_hash import hash_uid
+
 warnings.filterwarnings('ignore')
 
 load_dotenv()
@@ -20,7 +28,7 @@ with open(CONFIG_FILE, 'r') as file:
 
 
 class HopsworkFeatureStore:
-    def __init__(self, project_name, feature_group_name, api_key, csv_path):
+    def __init__(self, project_name, feature_group_name, api_key, features_path):
         """
         Initializes the HopsworkFeatureStore instance.
 
@@ -28,21 +36,26 @@ class HopsworkFeatureStore:
             project_name (str): Name of the Hopsworks project.
             feature_group_name (str): Name of the feature group.
             api_key (str): Hopsworks API key.
-            csv_path (str or Path): Path to the CSV file.
+            features_path (str or Path): Path to the engineered features
+                (Parquet/Arrow directory or CSV file).
         """
         self.project_name = project_name
         self.feature_group_name = feature_group_name
-        self.csv_path = Path(csv_path)  # Ensure csv_path is a Path object
+        self.features_path = Path(features_path)  # Ensure features_path is a Path object
         self.api_key = api_key
-        self.project = hopsworks.login(api_key_value=self.api_key)
+        self.project = login(api_key=self.api_key, project_name=self.project_name)
         self.fs = self.project.get_feature_store()
         self.feature_group = None
+        self.feature_group_version = configs['hopsworks']['feature_group_version']
+        self.state_path = self.features_path.with_name(
+            f"{self.feature_group_name}_v{self.feature_group_version}_ingest_state.json")
+        # Rows are keyed by their bar time, UTC epoch seconds
+        self.overlap = configs['hopsworks']['ingest_overlap_hours'] * 3600
 
     def load_data(self):
-        """Loads data from the specified CSV file."""
-        # Use Path object for CSV path
-        self.df = pd.read_csv(self.csv_path, parse_dates=['datetime'])
-        print(f"Loaded {len(self.df)} rows from {self.csv_path}")
+        """Loads data from the specified engineered features file."""
+        self.df = read_features(self.features_path)
+        print(f"Loaded {len(self.df)} rows from {self.features_path}")
 
     def get_or_create_feature_group(self, description="Feature group for time-series data ingestion"):
         """
@@ -53,12 +66,12 @@ class HopsworkFeatureStore:
         """
         try:
             self.feature_group = self.fs.get_feature_group(
-                name=self.feature_group_name, version=1)
+                name=self.feature_group_name, version=self.feature_group_version)
             print(f"Using existing feature group: {self.feature_group_name}")
         except:
             self.feature_group = self.fs.create_feature_group(
                 name=self.feature_group_name,
-                version=1,
+                version=self.feature_group_version,
                 description=description,
                 primary_key=["uid"],
                 event_time="datetime",
@@ -66,24 +79,74 @@ class HopsworkFeatureStore:
             )
             print(f"Created new feature group: {self.feature_group_name}")
 
-    def find_new_rows(self):
-        """Finds rows that are not already present in the feature group."""
+    def read_high_water_mark(self):
+        """Return the persisted max ingested bar time (UTC epoch seconds), or None if unknown."""
+        if not self.state_path.exists():
+            return None
+        with open(self.state_path, 'r') as file:
+            state = json.load(file)
+        # States written before bars were keyed by UTC time are re-queried
+        if 'high_water_time' not in state:
+            return None
+        return int(state['high_water_time'])
+
+    def write_high_water_mark(self, high_water_mark):
+        """Persist the max ingested bar time."""
+        write_json(self.state_path, {'high_water_time': int(high_water_mark)})
+
+    def query_high_water_mark(self):
+        """Query the max bar time in the feature group reading only the time column."""
+        existing = self.feature_group.select(['time']).read()
+        if existing.empty:
+            return None
+        return int(existing['time'].max())
+
+    def read_existing_keys(self, start_time):
+        """Read the bar times of feature group rows with time >= start_time."""
+        existing = self.feature_group.select(['time']).filter(
+            self.feature_group.get_feature('time') >= start_time).read()
+        return existing['time'].to_numpy(dtype=np.int64)
+
+    def find_new_rows(self, revised=None):
+        """
+        Finds rows that are not already present in the feature group.
+
+        Rows newer than the high-water mark are new by construction. Only rows
+        inside the overlap window just below the mark are checked against the
+        feature group, by reading that window's bar times (int64 UTC epoch
+        seconds), so the cost no longer grows with the feature group.
+
+        Args:
+            revised (array-like): Bar times of recomputed rows, which are
+                always (re-)inserted.
+        """
         if self.feature_group is None:
             raise ValueError("Feature group is not initialized.")
 
         try:
-            # Read existing data from the feature group
-            existing_data = self.feature_group.read()
-
-            # Convert datetime columns to ensure consistent comparison
-            self.df['datetime'] = pd.to_datetime(
-                self.df['datetime']).dt.tz_localize(None)
-            existing_data['datetime'] = pd.to_datetime(
-                existing_data['datetime']).dt.tz_localize(None)
-
-            # Identify new rows based on `datetime` primary key
-            new_data = self.df[~self.df['datetime'].isin(
-                existing_data['datetime'])]
+            high_water_mark = self.read_high_water_mark()
+            if high_water_mark is None:
+                high_water_mark = self.query_high_water_mark()
+            if high_water_mark is None:
+                print("Feature group is empty. All data will be considered new.")
+                return self.df
+
+            keys = self.df['time'].to_numpy(dtype=np.int64)
+            overlap_start = high_water_mark - self.overlap
+            is_candidate = keys >= overlap_start
+            is_newer = keys > high_water_mark
+
+            # Check only the overlap window for rows that are already ingested
+            in_overlap = is_candidate & ~is_newer
+            if in_overlap.any():
+                existing_keys = self.read_existing_keys(overlap_start)
+                in_overlap &= ~sorted_isin(keys, existing_keys)
+
+            is_revised = np.zeros(len(keys), dtype=bool)
+            if revised is not None and len(revised):
+                is_revised = sorted_isin(keys, revised)
+
+            new_data = self.df[is_newer | in_overlap | is_revised]
             print(f"Identified {len(new_data)} new rows to insert.")
         except Exception as e:
             print(f"Could not read existing data from feature group: {e}")
@@ -107,11 +170,78 @@ class HopsworkFeatureStore:
                                       "wait_for_job": False})
             print(f"Inserted {len(new_data)} new rows into the feature group.")
 
-    def run_pipeline(self):
-        """Runs the complete pipeline for loading, checking, and inserting data."""
+            # Advance the high-water mark past the rows just inserted
+            high_water_mark = int(new_data['time'].max())
+            previous = self.read_high_water_mark()
+            if previous is not None:
+                high_water_mark = max(high_water_mark, previous)
+            self.write_high_water_mark(high_water_mark)
+
+    def delete_stale_rows(self, stale_rows):
+        """
+        Deletes the versions of recomputed rows that were built from revised bars.
+
+        The uid hashes the lag window, so a recomputed row gets a new uid and
+        would otherwise sit next to its stale version.
+
+        Args:
+            stale_rows (pd.DataFrame): ``datetime``, ``time`` and ``uid`` of the stale rows.
+        """
+        if stale_rows is None or stale_rows.empty:
+            return
+        self.feature_group.commit_delete_record(stale_rows[['uid', 'datetime']])
+        print(f"Deleted {len(stale_rows)} stale rows from the feature group.")
+
+    def migrate_feature_group(self, old_version):
+        """
+        Copies rows of an older feature group version into this one.
+
+        Older versions key rows by string uids or by local datetimes only. The
+        old rows get their UTC ``time`` and are re-keyed with the int64 hash
+        uid computed from it and their lag columns; rows already present are
+        skipped.
+
+        Args:
+            old_version (int): Version of the feature group to copy.
+        """
+        if self.feature_group is None:
+            raise ValueError("Feature group is not initialized.")
+
+        old_group = self.fs.get_feature_group(
+            name=self.feature_group_name, version=old_version)
+        df = old_group.read()
+        df['datetime'] = pd.to_datetime(df['datetime']).dt.tz_localize(None)
+        # Sorted, so the second of two repeated DST-end hours reads as standard time
+        df = df.sort_values(by='datetime', kind='stable').reset_index(drop=True)
+        df['time'] = local_to_epoch(df['datetime'].to_numpy().view(np.int64))
+        df['uid'] = hash_uid(df['time'].to_numpy(),
+                             df[lag_feature_columns()].to_numpy())
+        print(f"Re-keyed {len(df)} rows from version {old_version}.")
+
+        self.df = df
+        self.insert_new_data(self.find_new_rows())
+
+    def run_pipeline(self, df=None, stale_rows=None):
+        """
+        Runs the complete pipeline for loading, checking, and inserting data.
+
+        Args:
+            df (pd.DataFrame): Engineered rows handed over in memory. If None,
+                they are loaded from ``features_path``.
+            stale_rows (pd.DataFrame): ``datetime``, ``time`` and ``uid`` of rows that
+                ``df`` recomputes after a bar revision; they are replaced.
+        """
         print("Starting data ingestion pipeline...")
-        self.load_data()
+        if df is None:
+            self.load_data()
+        else:
+            self.df = df
+            print(f"Received {len(self.df)} rows from the feature engineering stage")
         self.get_or_create_feature_group()
-        new_data = self.find_new_rows()
+        revised = None
+        if stale_rows is not None and not stale_rows.empty:
+            self.delete_stale_rows(stale_rows)
+            revised = stale_rows['time'].to_numpy(dtype=np.int64)
+        new_data = self.find_new_rows(revised)
         self.insert_new_data(new_data)
         print("Data ingestion pipeline completed.")
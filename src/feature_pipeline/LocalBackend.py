@@ -0,0 +1,586 @@
+"""
+Local, file-backed stand-in for the Hopsworks project used by the pipelines.
+
+It implements the subset of the ``hopsworks``/``hsfs``/``hsml`` surface that
+HopsworkFeatureStore, Trainer and fetch_plot_data call, so the whole
+ingest -> train -> serve loop can run and be profiled on a single machine:
+
+- offline store: one directory of append-only Parquet parts per feature group,
+  read through ``pyarrow.dataset`` with column and event-time pushdown
+- online store: an embedded SQLite key/value table per online-enabled group
+- feature views: JSON definitions over a feature group query
+- model registry: one directory per model version holding artifacts and metadata
+- model serving: deployments that load the predictor script in-process
+
+Everything lives under the ``backend.local_root`` directory from config.yml.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import sqlite3
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import yaml
+
+import storage
+
+warnings.filterwarnings('ignore')
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+def read_json(path):
+    """Read a JSON metadata file."""
+    with open(path, 'r', encoding='utf-8') as json_file:
+        return json.load(json_file)
+
+
+def write_json(path, data):
+    """Write a JSON metadata file atomically."""
+    storage.write_json(path, data, default=str)
+
+
+#### Feature store ####
+
+class LocalFilter:
+    """A ``feature <op> value`` predicate, convertible to a pyarrow expression."""
+
+    def __init__(self, name, op, value):
+        self.name = name
+        self.op = op
+        self.value = pd.Timestamp(value) if isinstance(value, (str, datetime)) else value
+
+    def __and__(self, other):
+        return LocalFilterGroup([self, other])
+
+    def to_expression(self):
+        field = ds.field(self.name)
+        return {
+            '>=': field >= self.value,
+            '>': field > self.value,
+            '<=': field <= self.value,
+            '<': field < self.value,
+            '==': field == self.value,
+        }[self.op]
+
+
+class LocalFilterGroup:
+    """A conjunction of predicates."""
+
+    def __init__(self, filters):
+        self.filters = filters
+
+    def __and__(self, other):
+        return LocalFilterGroup(self.filters + [other])
+
+    def to_expression(self):
+        expression = self.filters[0].to_expression()
+        for local_filter in self.filters[1:]:
+            expression = expression & local_filter.to_expression()
+        return expression
+
+
+class LocalFeature:
+    """Feature handle supporting the comparison operators used to build filters."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __ge__(self, value):
+        return LocalFilter(self.name, '>=', value)
+
+    def __gt__(self, value):
+        return LocalFilter(self.name, '>', value)
+
+    def __le__(self, value):
+        return LocalFilter(self.name, '<=', value)
+
+    def __lt__(self, value):
+        return LocalFilter(self.name, '<', value)
+
+    def __eq__(self, value):
+        return LocalFilter(self.name, '==', value)
+
+    __hash__ = object.__hash__
+
+
+class LocalQuery:
+    """A projection and filter over a feature group's offline store."""
+
+    def __init__(self, feature_group, features=None, filters=None):
+        self.feature_group = feature_group
+        self.features = features
+        self.filters = filters
+
+    def filter(self, condition):
+        """Return a new query with ``condition`` added to the filters."""
+        filters = condition if self.filters is None else self.filters & condition
+        return LocalQuery(self.feature_group, self.features, filters)
+
+    def read(self):
+        """Read the query result as a DataFrame."""
+        expression = self.filters.to_expression() if self.filters is not None else None
+        return self.feature_group.read_offline(self.features, expression)
+
+
+class LocalFeatureGroup:
+    def __init__(self, feature_store, name, version):
+        """
+        Initializes the LocalFeatureGroup instance.
+
+        Args:
+            feature_store (LocalFeatureStore): Owning feature store.
+            name (str): Name of the feature group.
+            version (int): Version of the feature group.
+        """
+        self.feature_store = feature_store
+        self.name = name
+        self.version = version
+        self.path = feature_store.path / "feature_groups" / f"{name}_{version}"
+        metadata = read_json(self.path / "metadata.json")
+        self.description = metadata['description']
+        self.primary_key = metadata['primary_key']
+        self.event_time = metadata['event_time']
+        self.online_enabled = metadata['online_enabled']
+
+    def get_feature(self, name):
+        """Return a feature handle usable in query filters."""
+        return LocalFeature(name)
+
+    def select_all(self):
+        """Return a query over all features."""
+        return LocalQuery(self)
+
+    def select(self, features):
+        """Return a query over the given features."""
+        return LocalQuery(self, list(features))
+
+    def filter(self, condition):
+        """Return a query over all features restricted by ``condition``."""
+        return LocalQuery(self).filter(condition)
+
+    def read(self):
+        """Read the whole offline feature group."""
+        return self.read_offline()
+
+    def part_files(self):
+        """Return the offline Parquet parts in insertion order."""
+        return sorted(self.path.glob("part-*.parquet"))
+
+    def read_offline(self, features=None, expression=None):
+        """
+        Reads from the offline store with projection and predicate pushdown.
+
+        Parts are append-only, so rows sharing a primary key are resolved to
+        the most recently inserted one, which mirrors the upsert semantics of
+        the Hopsworks offline store.
+
+        Args:
+            features (list): Columns to return, or None for all.
+            expression (pyarrow.dataset.Expression): Row filter, or None.
+
+        Returns:
+            pd.DataFrame: Matching rows.
+        """
+        parts = self.part_files()
+        if not parts:
+            return pd.DataFrame(columns=features or [])
+
+        columns = None
+        if features is not None:
+            columns = list(dict.fromkeys(self.primary_key + list(features)))
+        dataset = ds.dataset([str(p) for p in parts], format='parquet')
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+        df = df.drop_duplicates(subset=self.primary_key, keep='last')
+        if features is not None:
+            df = df[features]
+        return df.reset_index(drop=True)
+
+    def insert(self, df, write_options=None):
+        """Append rows to the offline store and upsert them into the online store."""
+        if df.empty:
+            return
+        df = df.sort_values(by=self.event_time).reset_index(drop=True)
+        part_path = self.path / f"part-{len(self.part_files()):06d}.parquet"
+        storage.write_parquet(pa.Table.from_pandas(df, preserve_index=False), part_path)
+        if self.online_enabled:
+            self.feature_store.online_store.put(self, df)
+
+    def commit_delete_record(self, df):
+        """Delete the rows with ``df``'s primary keys from the offline and online stores."""
+        if df.empty:
+            return
+        keys = df[self.primary_key].astype(str).agg('|'.join, axis=1)
+        for part_path in self.part_files():
+            part = pq.read_table(part_path).to_pandas()
+            stale = part[self.primary_key].astype(str).agg('|'.join, axis=1).isin(keys)
+            if stale.any():
+                storage.write_parquet(pa.Table.from_pandas(part[~stale], preserve_index=False),
+                                      part_path)
+        if self.online_enabled:
+            self.feature_store.online_store.delete(self, keys.tolist())
+
+
+class LocalOnlineStore:
+    """Embedded key/value store holding the latest row per primary key."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def table_name(feature_group):
+        return f"{feature_group.name}_{feature_group.version}"
+
+    @staticmethod
+    def key(feature_group, row):
+        return "|".join(str(row[k]) for k in feature_group.primary_key)
+
+    def put(self, feature_group, df):
+        """Upsert rows keyed by the feature group's primary key."""
+        records = json.loads(df.to_json(orient='records', date_format='iso'))
+        table = self.table_name(feature_group)
+        with self.connect() as connection:
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (key TEXT PRIMARY KEY, value TEXT)')
+            connection.executemany(
+                f'INSERT OR REPLACE INTO "{table}" (key, value) VALUES (?, ?)',
+                [(self.key(feature_group, r), json.dumps(r)) for r in records])
+
+    def delete(self, feature_group, keys):
+        """Delete the rows stored under the given keys."""
+        table = self.table_name(feature_group)
+        with self.connect() as connection:
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" (key TEXT PRIMARY KEY, value TEXT)')
+            connection.executemany(
+                f'DELETE FROM "{table}" WHERE key = ?', [(key,) for key in keys])
+
+    def get(self, feature_group, entry):
+        """Return the row stored for ``entry``'s primary key, or None."""
+        table = self.table_name(feature_group)
+        with self.connect() as connection:
+            row = connection.execute(
+                f'SELECT value FROM "{table}" WHERE key = ?',
+                (self.key(feature_group, entry),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class LocalFeatureView:
+    def __init__(self, feature_store, name, version):
+        """
+        Initializes the LocalFeatureView instance.
+
+        Args:
+            feature_store (LocalFeatureStore): Owning feature store.
+            name (str): Name of the feature view.
+            version (int): Version of the feature view.
+        """
+        self.feature_store = feature_store
+        self.name = name
+        self.version = version
+        self.path = feature_store.path / "feature_views" / f"{name}_{version}.json"
+        metadata = read_json(self.path)
+        self.description = metadata['description']
+        self.features = metadata['features']
+        self.feature_group = feature_store.get_feature_group(
+            metadata['feature_group'], metadata['feature_group_version'])
+
+    def get_batch_data(self, start_time=None, end_time=None):
+        """Read ``start_time <= event_time < end_time`` with the range pushed down to Parquet."""
+        event_time = self.feature_group.get_feature(self.feature_group.event_time)
+        query = LocalQuery(self.feature_group, self.features)
+        if start_time is not None:
+            query = query.filter(event_time >= start_time)
+        if end_time is not None:
+            query = query.filter(event_time < end_time)
+        return query.read()
+
+    def get_feature_vector(self, entry):
+        """Look up the latest feature values for ``entry`` in the online store."""
+        row = self.feature_store.online_store.get(self.feature_group, entry)
+        if row is None:
+            return None
+        features = self.features or list(row)
+        return [row[f] for f in features]
+
+    def delete(self):
+        """Delete the feature view definition."""
+        self.path.unlink(missing_ok=True)
+
+
+class LocalFeatureStore:
+    def __init__(self, path):
+        """
+        Initializes the LocalFeatureStore instance.
+
+        Args:
+            path (Path): Root directory of the feature store.
+        """
+        self.path = path
+        self.online_store = LocalOnlineStore(path / "online.db")
+
+    def get_feature_group(self, name, version=1):
+        """Return an existing feature group, raising if it does not exist."""
+        if not (self.path / "feature_groups" / f"{name}_{version}" / "metadata.json").exists():
+            raise ValueError(f"Feature group {name} version {version} does not exist")
+        return LocalFeatureGroup(self, name, version)
+
+    def create_feature_group(self, name, version=1, description="", primary_key=None,
+                             event_time=None, online_enabled=False):
+        """Create a feature group and return it."""
+        write_json(self.path / "feature_groups" / f"{name}_{version}" / "metadata.json", {
+            'description': description,
+            'primary_key': primary_key or [],
+            'event_time': event_time,
+            'online_enabled': online_enabled,
+        })
+        return LocalFeatureGroup(self, name, version)
+
+    def get_or_create_feature_group(self, name, version=1, **kwargs):
+        """Return the feature group, creating it if needed."""
+        try:
+            return self.get_feature_group(name, version)
+        except ValueError:
+            return self.create_feature_group(name, version, **kwargs)
+
+    def get_or_create_feature_view(self, name, version=1, description="", query=None):
+        """Return the feature view, creating it from ``query`` if needed."""
+        path = self.path / "feature_views" / f"{name}_{version}.json"
+        if not path.exists():
+            write_json(path, {
+                'description': description,
+                'feature_group': query.feature_group.name,
+                'feature_group_version': query.feature_group.version,
+                'features': query.features,
+            })
+        return LocalFeatureView(self, name, version)
+
+
+#### Model registry and serving ####
+
+class LocalModel:
+    def __init__(self, registry, name, version=None, metadata=None):
+        """
+        Initializes the LocalModel instance.
+
+        Args:
+            registry (LocalModelRegistry): Owning model registry.
+            name (str): Name of the model.
+            version (int): Registered version, or None before ``save``.
+            metadata (dict): Metrics, description and input example.
+        """
+        self.registry = registry
+        self.name = name
+        self.version = version
+        self.metadata = metadata or {}
+
+    @property
+    def path(self):
+        return self.registry.path / self.name / str(self.version)
+
+    def save(self, model_path):
+        """Register ``model_path`` (a file, or a directory of artifacts) as the next version of this model."""
+        self.version = self.registry.next_version(self.name)
+        self.path.mkdir(parents=True, exist_ok=True)
+        if Path(model_path).is_dir():
+            shutil.copytree(model_path, self.path, dirs_exist_ok=True)
+        else:
+            shutil.copy(model_path, self.path / Path(model_path).name)
+        write_json(self.path / "metadata.json", self.metadata)
+        print(f"Model {self.name} version {self.version} saved in {self.path}")
+        return self
+
+    def delete(self):
+        """Delete this model version and its artifacts."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def deploy(self, name, script_file):
+        """Create a deployment serving this model version with ``script_file``."""
+        script_file = self.registry.project.resolve_path(script_file)
+        write_json(self.registry.project.path / "deployments" / f"{name}.json", {
+            'model_name': self.name,
+            'model_version': self.version,
+            'script_file': str(script_file),
+        })
+        return LocalDeployment(self.registry.project, name)
+
+
+class LocalSklearnModelApi:
+    """Mirrors ``model_registry.sklearn``."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def create_model(self, name, metrics=None, model_schema=None, input_example=None,
+                     description=""):
+        """Create an unsaved model entry; call ``save`` to register artifacts."""
+        if hasattr(model_schema, 'to_dict'):
+            model_schema = model_schema.to_dict()
+        if hasattr(input_example, 'to_dict'):
+            input_example = input_example.to_dict(orient='records')
+        return LocalModel(self.registry, name, metadata={
+            'metrics': metrics,
+            'model_schema': model_schema,
+            'input_example': input_example,
+            'description': description,
+        })
+
+
+class LocalModelRegistry:
+    def __init__(self, project):
+        """
+        Initializes the LocalModelRegistry instance.
+
+        Args:
+            project (LocalProject): Owning project.
+        """
+        self.project = project
+        self.path = project.path / "models"
+        self.sklearn = LocalSklearnModelApi(self)
+
+    def versions(self, name):
+        """Return the registered versions of a model, oldest first."""
+        model_dir = self.path / name
+        if not model_dir.exists():
+            return []
+        return sorted(int(p.name) for p in model_dir.iterdir() if p.name.isdigit())
+
+    def next_version(self, name):
+        versions = self.versions(name)
+        return versions[-1] + 1 if versions else 1
+
+    def get_model(self, name, version=None):
+        """Return a model version (the latest by default), or None if not registered."""
+        versions = self.versions(name)
+        if not versions:
+            return None
+        version = version if version in versions else versions[-1]
+        model_path = self.path / name / str(version)
+        return LocalModel(self, name, version, read_json(model_path / "metadata.json"))
+
+
+class LocalDeployment:
+    def __init__(self, project, name):
+        """
+        Initializes the LocalDeployment instance.
+
+        Args:
+            project (LocalProject): Owning project.
+            name (str): Deployment name.
+        """
+        self.project = project
+        self.name = name
+        self.path = project.path / "deployments" / f"{name}.json"
+        self.predictor = None
+
+    def start(self):
+        """Load the predictor script against the deployed model's artifacts."""
+        metadata = read_json(self.path)
+        model = self.project.get_model_registry().get_model(
+            metadata['model_name'], metadata['model_version'])
+        os.environ["ARTIFACT_FILES_PATH"] = str(model.path)
+
+        spec = importlib.util.spec_from_file_location(
+            f"predictor_{self.name}", metadata['script_file'])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.predictor = module.Predict()
+        print(f"Deployment {self.name} started.")
+
+    def predict(self, inputs):
+        """Serve a prediction request, returning ``{"predictions": [...]}``."""
+        if self.predictor is None:
+            self.start()
+        return {"predictions": self.predictor.predict(inputs)}
+
+    def delete(self, force=False):
+        """Delete the deployment."""
+        self.path.unlink(missing_ok=True)
+
+
+class LocalModelServing:
+    def __init__(self, project):
+        self.project = project
+
+    def get_deployment(self, name):
+        """Return a deployment by name, raising if it does not exist."""
+        deployment = LocalDeployment(self.project, name)
+        if not deployment.path.exists():
+            raise ValueError(f"Deployment {name} does not exist")
+        return deployment
+
+    def get_deployments(self, model=None):
+        """Return all deployments, or only those serving ``model``."""
+        deployments = []
+        for path in sorted((self.project.path / "deployments").glob("*.json")):
+            metadata = read_json(path)
+            if model is None or metadata['model_name'] == model.name:
+                deployments.append(LocalDeployment(self.project, path.stem))
+        return deployments
+
+
+class LocalDatasetApi:
+    def __init__(self, project):
+        self.project = project
+
+    def upload(self, local_path, upload_path, overwrite=False):
+        """Copy a file into the project datasets, returning its dataset path."""
+        target_dir = self.project.path / "datasets" / upload_path
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / Path(local_path).name
+        if overwrite or not target.exists():
+            shutil.copy(local_path, target)
+        return f"{upload_path}/{Path(local_path).name}"
+
+
+class LocalProject:
+    def __init__(self, name, path=None):
+        """
+        Initializes the LocalProject instance.
+
+        Args:
+            name (str): Project name, used to resolve ``/Projects/<name>/`` paths.
+            path (str or Path): Root directory. Defaults to ``backend.local_root``.
+        """
+        self.name = name
+        self.path = Path(path) if path else BASE_DIR / configs['backend']['local_root']
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def resolve_path(self, path):
+        """Map a ``/Projects/<name>/...`` dataset path onto the local datasets directory."""
+        prefix = f"/Projects/{self.name}/"
+        path = str(path)
+        if path.startswith(prefix):
+            return self.path / "datasets" / path[len(prefix):]
+        return Path(path)
+
+    def get_feature_store(self):
+        return LocalFeatureStore(self.path / "feature_store")
+
+    def get_model_registry(self):
+        return LocalModelRegistry(self)
+
+    def get_model_serving(self):
+        return LocalModelServing(self)
+
+    def get_dataset_api(self):
+        return LocalDatasetApi(self)
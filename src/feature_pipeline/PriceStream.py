@@ -0,0 +1,284 @@
+"""
+Streaming ingestion of vendor price ticks into OHLC bars.
+
+PriceStream subscribes to the vendor's price WebSocket and folds every tick
+into a BarAggregator per symbol. When a bar closes, it is appended to the raw
+bar store and handed to an ``on_bar`` callback, e.g. incremental feature
+engineering and ingestion. New bars then reach the feature store seconds after
+they close instead of at the next hourly cron run.
+
+The stages are decoupled by bounded queues:
+
+    socket reader -> tick queue -> aggregator -> bar queue -> writer
+
+A slow writer fills the bar queue, which stalls the aggregator, which fills the
+tick queue, which stops the reader from reading the socket. The backlog then
+builds up in the TCP window instead of in memory. A dropped connection is
+re-established with jittered exponential backoff. The REST API then fills in
+any bars that closed while the stream was down.
+"""
+
+import asyncio
+import os
+import random
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+import websockets
+import yaml
+from dotenv import load_dotenv
+from zoneinfo import ZoneInfo
+
+from BarStore import interval_timedelta
+from bar_batch import empty_bars, scale_prices
+from bar_decoder import PRICE_FIELDS
+
+warnings.filterwarnings('ignore')
+
+load_dotenv()
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+
+
+def stream_url():
+    """Return the price stream URL, or the local replay server's when ``mock_api.enabled`` is set."""
+    mock_configs = configs['mock_api']
+    if mock_configs['enabled']:
+        return f"ws://{mock_configs['host']}:{mock_configs['ws_port']}/v1/quotes/price"
+    return configs['stream']['url']
+
+
+class BarAggregator:
+    def __init__(self, interval=None, tz=None, close_grace=None):
+        """
+        Initializes the BarAggregator instance.
+
+        Args:
+            interval (str): Bar interval, e.g. "1h". Defaults to the API's.
+            tz (str): Timezone whose clock bars are aligned to, like the REST bars.
+            close_grace (float): Seconds after a bar's end before it is closed
+                without a tick from the next bar.
+        """
+        interval = interval or configs['stock_api_params']['time_interval']
+        self.step = interval_timedelta(interval).value
+        self.tz = ZoneInfo(tz or configs['stock_api_params']['timezone'])
+        self.grace = int((configs['stream']['close_grace'] if close_grace is None
+                          else close_grace) * NS_PER_SECOND)
+        self.offsets = {}
+        self.bucket = None
+        self.bar = None
+        self.last_event = None
+        self.last_wall = None
+        self.late_ticks = 0
+
+    def local_ns(self, utc_ns):
+        """Convert UTC ns to naive local ns; offsets only change on the hour, so cache per UTC hour."""
+        hour = utc_ns // NS_PER_HOUR
+        offset = self.offsets.get(hour)
+        if offset is None:
+            moment = datetime.fromtimestamp(hour * 3600, timezone.utc).astimezone(self.tz)
+            offset = int(moment.utcoffset().total_seconds()) * NS_PER_SECOND
+            self.offsets[hour] = offset
+        return utc_ns + offset
+
+    def bucket_ns(self, utc_ns):
+        """Return the UTC ns start of the bar a tick falls into, aligned to the local clock."""
+        local = self.local_ns(utc_ns)
+        return utc_ns - local % self.step
+
+    def add(self, timestamp, price):
+        """
+        Folds one tick into the open bar.
+
+        Args:
+            timestamp (float): Tick time in UTC epoch seconds.
+            price (float): Traded or quoted price.
+
+        Returns:
+            list: Bars closed by this tick as ``(time, open, high, low, close)``,
+            the time in UTC epoch seconds.
+        """
+        utc_ns = int(timestamp * NS_PER_SECOND)
+        self.last_event = utc_ns if self.last_event is None else max(self.last_event, utc_ns)
+        self.last_wall = time.monotonic()
+        bucket = self.bucket_ns(utc_ns)
+
+        closed = []
+        if self.bucket is not None and bucket < self.bucket:
+            # The tick belongs to a bar that was already emitted
+            self.late_ticks += 1
+            return closed
+        if self.bucket is not None and bucket > self.bucket:
+            closed.append(self.close())
+        if self.bucket is None:
+            self.bucket = bucket
+            self.bar = [price, price, price, price]
+        else:
+            bar = self.bar
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+        return closed
+
+    def close(self):
+        """Close and return the open bar."""
+        bar = (self.bucket // NS_PER_SECOND, *self.bar)
+        self.bucket = None
+        self.bar = None
+        return bar
+
+    def expire(self):
+        """
+        Closes the open bar if the event clock has passed its end plus the grace.
+
+        The event clock is the latest tick time advanced by the wall time since
+        that tick, so a quiet market still closes its bars on time.
+        """
+        if self.bucket is None:
+            return []
+        event_now = self.last_event + int((time.monotonic() - self.last_wall) * NS_PER_SECOND)
+        if event_now >= self.bucket + self.step + self.grace:
+            return [self.close()]
+        return []
+
+
+def bars_to_batch(bars):
+    """Convert closed ``(time, open, high, low, close)`` bars into a bar batch."""
+    batch = empty_bars(len(bars))
+    batch['time'] = [bar[0] for bar in bars]
+    for i, field in enumerate(PRICE_FIELDS, start=1):
+        batch[field] = scale_prices([bar[i] for bar in bars])
+    return batch
+
+
+class PriceStream:
+    def __init__(self, stocks, on_bar=None, url=None):
+        """
+        Initializes the PriceStream instance.
+
+        Args:
+            stocks (list): StockData instances to stream; each one's store receives its bars.
+            on_bar (callable): Called in a worker thread as ``on_bar(symbol, bars)``
+                after closed bars are stored, e.g. to engineer and ingest them.
+            url (str): WebSocket URL, defaults to ``stream_url()``.
+        """
+        stream_configs = configs['stream']
+        self.stocks = {stock.symbol: stock for stock in stocks}
+        self.on_bar = on_bar
+        self.url = url or stream_url()
+        self.aggregators = {symbol: BarAggregator() for symbol in self.stocks}
+        self.tick_queue = asyncio.Queue(maxsize=stream_configs['tick_queue_size'])
+        self.bar_queue = asyncio.Queue(maxsize=stream_configs['bar_queue_size'])
+        self.heartbeat = stream_configs['heartbeat']
+        self.reconnect_base = stream_configs['reconnect_base']
+        self.reconnect_max = stream_configs['reconnect_max']
+        self.stats = {'ticks': 0, 'bars': 0, 'late_ticks': 0, 'reconnects': 0,
+                      'catch_ups': 0, 'max_tick_backlog': 0, 'bar_latencies': []}
+
+    async def send_heartbeats(self, websocket):
+        """Keep the subscription alive, as the vendor requires."""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            await websocket.send(orjson.dumps({'action': 'heartbeat'}).decode())
+
+    async def read_socket(self):
+        """Read ticks into the tick queue, reconnecting with backoff when the connection drops."""
+        attempt = 0
+        url = f"{self.url}?apikey={os.getenv('STOCK_API_KEY')}"
+        while True:
+            try:
+                async with websockets.connect(url, close_timeout=1) as websocket:
+                    await websocket.send(orjson.dumps({
+                        'action': 'subscribe',
+                        'params': {'symbols': ','.join(self.stocks)},
+                    }).decode())
+                    if attempt:
+                        # Bars that closed while disconnected come from the REST API
+                        await self.bar_queue.put(None)
+                    attempt = 0
+                    heartbeat = asyncio.create_task(self.send_heartbeats(websocket))
+                    try:
+                        async for message in websocket:
+                            event = orjson.loads(message)
+                            if event.get('event') != 'price' or event.get('symbol') not in self.stocks:
+                                continue
+                            # Blocks when the aggregator falls behind: backpressure
+                            await self.tick_queue.put(
+                                (event['symbol'], event['timestamp'], float(event['price'])))
+                            self.stats['max_tick_backlog'] = max(
+                                self.stats['max_tick_backlog'], self.tick_queue.qsize())
+                    finally:
+                        heartbeat.cancel()
+            except (websockets.WebSocketException, OSError) as e:
+                print(f"Price stream disconnected: {e!r}")
+            delay = random.uniform(0, min(self.reconnect_max, self.reconnect_base * 2 ** attempt))
+            attempt += 1
+            self.stats['reconnects'] += 1
+            print(f"Reconnecting to the price stream in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def aggregate(self):
+        """Fold ticks into bars and queue the closed ones for the writer."""
+        while True:
+            symbol, timestamp, price = await self.tick_queue.get()
+            self.stats['ticks'] += 1
+            for bar in self.aggregators[symbol].add(timestamp, price):
+                # Blocks when the writer falls behind: backpressure
+                await self.bar_queue.put((symbol, bar, time.perf_counter()))
+
+    async def expire_bars(self):
+        """Close bars whose end has passed while no ticks arrive, e.g. in a quiet market."""
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for symbol, aggregator in self.aggregators.items():
+                for bar in aggregator.expire():
+                    await self.bar_queue.put((symbol, bar, time.perf_counter()))
+
+    async def write_bars(self, max_bars=None):
+        """Append closed bars to the stores and run ``on_bar``; returns after ``max_bars`` bars."""
+        while max_bars is None or self.stats['bars'] < max_bars:
+            item = await self.bar_queue.get()
+            if item is None:
+                for stock in self.stocks.values():
+                    await asyncio.to_thread(stock.update_data)
+                self.stats['catch_ups'] += 1
+                continue
+
+            symbol, bar, closed_at = item
+            bars = bars_to_batch([bar])
+            await asyncio.to_thread(self.stocks[symbol].store.append, bars)
+            if self.on_bar is not None:
+                await asyncio.to_thread(self.on_bar, symbol, bars)
+            self.stats['bars'] += 1
+            self.stats['bar_latencies'].append(time.perf_counter() - closed_at)
+
+    async def run(self, max_bars=None):
+        """
+        Streams until cancelled, or until ``max_bars`` bars have been written.
+
+        Returns:
+            dict: Tick, bar, reconnect and backlog counts and per-bar write latencies.
+        """
+        tasks = [asyncio.create_task(self.read_socket()),
+                 asyncio.create_task(self.aggregate()),
+                 asyncio.create_task(self.expire_bars())]
+        try:
+            await self.write_bars(max_bars)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.stats['late_ticks'] = sum(a.late_ticks for a in self.aggregators.values())
+        return self.stats
@@ -1,16 +1,31 @@
 """
-Module to fetch stock data from the TwelveData Stock API and save it to a JSON file.
+Module to fetch stock data from the TwelveData Stock API and save it to the raw bar store.
+
+The API speaks in local bar labels (``stock_api_params.timezone``); responses
+are converted to bar batches (UTC epoch seconds, fixed-point prices) as soon as
+they are decoded, and stored times are turned back into local labels only to
+build the next request.
 """
 
-import json
+import asyncio
 import os
 import warnings
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import httpx
+import pandas as pd
 import requests
 import yaml
 from dotenv import load_dotenv
+from zoneinfo import ZoneInfo
+
+from ApiClient import get_client
+from BackfillEngine import BackfillEngine
+from BarStore import BarStore
+from bar_batch import bars_from_columns, epoch_to_local
+from bar_decoder import decode_bars
+from bar_index import read_known_gaps, record_known_gaps, scan_store
 
 warnings.filterwarnings('ignore')
 
@@ -28,6 +43,7 @@ with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
 class StockData:
     def __init__(self, symbol):
         self.symbol = symbol
+        self.store = BarStore(symbol)
 
     #### Used for retraining model ####
 
@@ -37,77 +53,194 @@ class StockData:
         start_date = end_date - timedelta(days=before_days)
         return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
+    def query_params(self, start_date, end_date, outputsize=None):
+        """Build the API query parameters for a date range."""
+        return {
+            'apikey': os.getenv('STOCK_API_KEY'),
+            'symbol': self.symbol,
+            'interval': configs['stock_api_params']['time_interval'],
+            'start_date': str(start_date),
+            'end_date': str(end_date),
+            'timezone': configs['stock_api_params']['timezone'],
+            'outputsize': outputsize,
+        }
+
     def fetch_range_data_from_api(self, start_date, end_date):
         """Fetch data from the API within a specified date range."""
-        url = configs["stock_api_params"]["base_url"] + \
-            configs["stock_api_params"]["endpoint"]
-        query_string = (
-            f"?apikey={os.getenv('STOCK_API_KEY')}&symbol={self.symbol}"
-            f"&interval={configs['stock_api_params']['time_interval']}"
-            f"&start_date={start_date}&end_date={end_date}"
-            f"&timezone={configs['stock_api_params']['timezone']}"
-        )
-        print(url + query_string)
-        response = requests.get(url + query_string, timeout=10)
+        print(f"Fetching {self.symbol} from {start_date} to {end_date}")
+        response = get_client().get(
+            configs["stock_api_params"]["endpoint"],
+            params=self.query_params(start_date, end_date))
         return response
 
-    def save_response_to_json(self, response, file_name):
-        """Save the API response to a JSON file."""
-        data_dir = BASE_DIR / "data"
-        data_dir.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
+    async def fetch_range_data_from_api_async(self, client, start_date, end_date, outputsize=None):
+        """Fetch data from the API within a specified date range using an AsyncApiClient."""
+        print(f"Fetching {self.symbol} from {start_date} to {end_date}")
+        response = await client.get(
+            configs["stock_api_params"]["endpoint"],
+            params=self.query_params(start_date, end_date, outputsize))
+        return response
 
-        file_path = data_dir / file_name
-        with open(file_path, 'w', encoding='utf-8') as json_file:
-            json.dump(response.json(), json_file, indent=4)
-            print(f"Data fetched successfully and saved in {file_path}")
+    def save_response_to_store(self, response):
+        """Save the bars of an API response to the raw bar store."""
+        _, columns = decode_bars(response.content)
+        self.store.append(bars_from_columns(columns))
+        print(f"Data fetched successfully and saved in {self.store.path}")
 
     def init_data(self, days_before):
-        """Initialize data by fetching a specified number of days before the current date."""
+        """
+        Initialize data by fetching a specified number of days before the current date.
+
+        The range is fetched page by page through the BackfillEngine, so it is
+        not limited by the vendor's per-request output cap and an interrupted
+        run resumes from the pages it already stored.
+        """
         start_date, end_date = self.calculate_date_range(days_before)
-        response = self.fetch_range_data_from_api(start_date, end_date)
+        return BackfillEngine(self).run(start_date, end_date)
+
+    #### Gap repair ####
+
+    def missing_ranges(self, start=None, end=None, recheck=False):
+        """
+        Scans the stored bars for gaps and returns the ranges worth refetching.
+
+        Partitions with duplicated or out-of-order bars are rewritten on the way.
+        Gaps recorded as having no vendor data are left out unless ``recheck``.
+
+        Returns:
+            list: Inclusive ``(first_missing, last_missing)`` Timestamp pairs.
+        """
+        report = scan_store(self.store, start, end)
+        if report['duplicates'] or report['out_of_order']:
+            rewritten = self.store.normalize()
+            print(f"Rewrote {rewritten} partitions of {self.symbol} with "
+                  f"{len(report['duplicates'])} duplicated and "
+                  f"{len(report['out_of_order'])} out-of-order bars")
+        known = set() if recheck else read_known_gaps(self.store)
+        return [gap for gap in report['gaps'] if gap not in known]
+
+    def record_unfilled_gaps(self, ranges, start, end, summary):
+        """Record the parts of refetched ranges the vendor had no bars for either."""
+        if summary['failed']:
+            # Failed pages say nothing about the vendor's data, retry next time
+            return summary['bars']
+        unfilled = [(first, last) for first, last in scan_store(self.store, start, end)['gaps']
+                    if any(lo <= first and last <= hi for lo, hi in ranges)]
+        if unfilled:
+            print(f"No vendor data for {len(unfilled)} gaps of {self.symbol}, not refetching them again")
+            record_known_gaps(self.store, unfilled)
+        return summary['bars']
+
+    def repair_gaps(self, start=None, end=None, recheck=False):
+        """
+        Refetches only the missing ranges between stored bars.
+
+        Args:
+            start, end: Range of stored bars to check, all of them by default.
+            recheck (bool): Also refetch gaps recorded as having no vendor data.
+
+        Returns:
+            int: Number of bars fetched.
+        """
+        ranges = self.missing_ranges(start, end, recheck)
+        if not ranges:
+            return 0
+        summary = BackfillEngine(self).refetch(ranges)
+        return self.record_unfilled_gaps(ranges, start, end, summary)
 
-        if response.status_code == 200:
-            file_name = f"stockdata_{self.symbol.split('/')[0]}.json"
-            self.save_response_to_json(response, file_name)
-        else:
-            print(f"Failed to fetch data: {response.status_code}")
+    async def repair_gaps_async(self, client, start=None, end=None):
+        """Async variant of repair_gaps fetching through an AsyncApiClient."""
+        ranges = await asyncio.to_thread(self.missing_ranges, start, end)
+        if not ranges:
+            return 0
+        summary = await BackfillEngine(self).refetch_async(ranges, client)
+        return await asyncio.to_thread(self.record_unfilled_gaps, ranges, start, end, summary)
 
     #### Used for hourly updates ####
-    def update_data(self):
-        """Update data by fetching the latest available information and appending it."""
-        file_name = f"stockdata_{self.symbol.split('/')[0]}.json"
-        data_file_path = BASE_DIR / "data" / file_name
-
-        # Load existing data
-        with open(data_file_path, 'r', encoding='utf-8') as data_file:
-            data = json.load(data_file)
-            last_datetime_str = data['values'][0]['datetime']
-            last_datetime = datetime.strptime(
-                last_datetime_str, '%Y-%m-%d %H:%M:%S')
-
-        # Calculate the date range for the update
-        start_date = last_datetime
-        end_date = datetime.now() + timedelta(days=1)
-
-        response = self.fetch_range_data_from_api(start_date, end_date)
-
+    def update_window(self):
+        """
+        Return the (start, end, last stored time) window of the next update.
+
+        The window runs from the last stored bar up to now, both as local
+        datetimes in the API's timezone; the last stored time is in UTC epoch
+        seconds. Returns None if there is no stored data to update.
+        """
+        # Bootstrap the store from the legacy JSON file (or upgrade old partitions) on first run
+        self.store.migrate_legacy()
+
+        last_time = self.store.last_time()
+        if last_time is None:
+            print(f"No stored data for {self.symbol}, run init_data first")
+            return None
+
+        start_date = pd.Timestamp(epoch_to_local([last_time])[0]).to_pydatetime()
+        end_date = datetime.now(ZoneInfo(configs['stock_api_params']['timezone'])).replace(
+            tzinfo=None, microsecond=0)
+        return start_date, end_date, last_time
+
+    def apply_update(self, response, last_time):
+        """
+        Merges the bars of an update response into the store.
+
+        The response starts at the last stored bar, which was usually still
+        forming when it was stored. Its final prices are merged in like any
+        other bar and logged as a revision if they changed.
+        """
         if response.status_code == 200:
-            new_data = response.json()
+            # Bar batch straight from the payload bytes, oldest first
+            _, columns = decode_bars(response.content)
+            bars = bars_from_columns(columns)
+            if len(bars) == 0:
+                print("Data already up to date")
+                return -1
 
-            # Check if the latest data is already up to date
-            if new_data['values'][0]['datetime'] == last_datetime_str:
+            # Sorted merge touching only the newest partition(s)
+            report = self.store.upsert(bars)
+            if bars['time'][-1] <= last_time:
+                # Check if the latest data is already up to date
                 print("Data already up to date")
                 return -1  # Data is already up to date
-            else:
-                # Remove the last item in new_data to avoid duplication
-                new_data['values'] = new_data['values'][:-1]
-                data['values'] = new_data['values'] + data['values']
-
-                # Save the updated data back to the JSON file
-                with open(data_file_path, 'w', encoding='utf-8') as json_file:
-                    json.dump(data, json_file, indent=4)
-                print(f"Data in {file_name} updated successfully")
-                return 1  # Data updated successfully
+            print(f"Data in {self.store.path} updated successfully "
+                  f"({report['inserted']} new bars, {len(report['revised'])} revised)")
+            return 1  # Data updated successfully
         else:
             print(f"Failed to fetch data: {response.status_code}")
             return 0
+
+    def update_data(self):
+        """Update data by fetching the latest available information and appending it."""
+        window = self.update_window()
+        if window is None:
+            return 0
+        start_date, end_date, last_time = window
+
+        try:
+            response = self.fetch_range_data_from_api(start_date, end_date)
+        except requests.RequestException as e:
+            print(f"Failed to fetch data: {e}")
+            return 0
+        flag = self.apply_update(response, last_time)
+        if flag == 1:
+            # The vendor may have skipped bars within the update, fetch just those
+            self.repair_gaps(start=last_time)
+        return flag
+
+    async def update_data_async(self, client):
+        """Async variant of update_data fetching through an AsyncApiClient."""
+        # Store reads and writes run in a worker thread to keep the event loop free
+        window = await asyncio.to_thread(self.update_window)
+        if window is None:
+            return 0
+        start_date, end_date, last_time = window
+
+        try:
+            response = await self.fetch_range_data_from_api_async(
+                client, start_date, end_date)
+        except httpx.TransportError as e:
+            print(f"Failed to fetch data: {e}")
+            return 0
+        flag = await asyncio.to_thread(self.apply_update, response, last_time)
+        if flag == 1:
+            # The vendor may have skipped bars within the update, fetch just those
+            await self.repair_gaps_async(client, start=last_time)
+        return flag
@@ -0,0 +1,38 @@
+"""
+Backend selection for the feature store and model registry.
+
+``login`` returns a project object exposing ``get_feature_store``,
+``get_model_registry``, ``get_model_serving`` and ``get_dataset_api``. The
+``backend.type`` entry of config.yml picks the implementation: "hopsworks"
+talks to the managed service, "local" uses the file-backed LocalProject.
+"""
+
+from pathlib import Path
+
+import yaml
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+def login(api_key=None, project_name=None):
+    """
+    Log into the configured backend and return its project handle.
+
+    Args:
+        api_key (str): Hopsworks API key, unused by the local backend.
+        project_name (str): Project name. Defaults to ``hopsworks.project_name``.
+    """
+    backend = configs['backend']['type']
+    if backend == 'hopsworks':
+        import hopsworks
+        return hopsworks.login(api_key_value=api_key)
+    if backend == 'local':
+        from LocalBackend import LocalProject
+        return LocalProject(project_name or configs['hopsworks']['project_name'])
+    raise ValueError(f"Unknown backend: {backend}")
@@ -0,0 +1,164 @@
+"""
+Canonical in-memory representation of OHLC bars.
+
+Bars used to travel through the pipeline as DataFrames of naive
+America/New_York datetimes and float64 prices. Local times repeat when DST
+ends (two bars labelled 01:00) and skip an hour when it starts, so every
+consumer had to disambiguate them again, and float prices made "did this bar
+change" a fuzzy question. A bar batch is instead one NumPy structured array of
+``BAR_DTYPE``, 40 bytes per bar:
+
+- ``time``: int64 UTC epoch seconds of the bar start, unique per bar
+- ``open``/``high``/``low``/``close``: int64 fixed-point prices, the vendor's
+  decimal price times ``PRICE_SCALE``
+
+Sorting, merging and comparing bars are then plain integer operations.
+Conversion happens at the edges only: decoded API payloads (labelled in the
+API's local time) enter through ``bars_from_columns``, and ``bars_to_frame`` /
+``price_matrix`` hand local datetimes and float prices to pandas, the lag
+engine and the plots.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from bar_decoder import PRICE_FIELDS
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+NS_PER_SECOND = 1_000_000_000
+
+# The vendor quotes prices with this many decimals
+PRICE_SCALE = 10 ** configs['bar_store']['price_decimals']
+
+BAR_DTYPE = np.dtype([
+    ('time', np.int64),
+    ('open', np.int64),
+    ('high', np.int64),
+    ('low', np.int64),
+    ('close', np.int64),
+])
+
+
+def empty_bars(n=0):
+    """Return a zeroed bar batch of ``n`` bars."""
+    return np.zeros(n, dtype=BAR_DTYPE)
+
+
+def local_to_utc(ticks, tz=None, nonexistent='shift_forward'):
+    """
+    Convert naive local int64 ns to UTC ns.
+
+    An ambiguous time (the hour repeated when DST ends) is read as the DST one,
+    unless it directly repeats the previous bar's time: that is the second,
+    standard-time occurrence. Times skipped by the spring change are shifted
+    forward, or come back as ``NaT`` ticks with ``nonexistent='NaT'``.
+    """
+    tz = tz or configs['stock_api_params']['timezone']
+    ticks = np.asarray(ticks, dtype=np.int64)
+    index = pd.DatetimeIndex(ticks.view('datetime64[ns]'))
+    is_dst = np.r_[True, ticks[1:] != ticks[:-1]]
+    utc = index.tz_localize(tz, ambiguous=is_dst, nonexistent=nonexistent)
+    return utc.asi8
+
+
+def utc_to_local(ticks, tz=None):
+    """Convert UTC int64 ns to naive local ns."""
+    tz = tz or configs['stock_api_params']['timezone']
+    index = pd.DatetimeIndex(np.asarray(ticks, dtype=np.int64), tz='UTC')
+    return index.tz_convert(tz).tz_localize(None).asi8
+
+
+def epoch_to_local(times, tz=None):
+    """Return the naive local ``datetime64[ns]`` labels of UTC epoch seconds."""
+    return utc_to_local(np.asarray(times, dtype=np.int64) * NS_PER_SECOND, tz).view('datetime64[ns]')
+
+
+def local_to_epoch(ticks, tz=None):
+    """Return the UTC epoch seconds of naive local int64 ns, see ``local_to_utc``."""
+    return local_to_utc(ticks, tz) // NS_PER_SECOND
+
+
+def to_epoch(value, tz=None, latest=False):
+    """
+    Converts a range bound to UTC epoch seconds.
+
+    Integers are taken as epoch seconds already. Naive datetimes are bar
+    labels in local time; an ambiguous one means its earlier occurrence, or
+    the later one with ``latest``, so an inclusive upper bound covers both.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(tz or configs['stock_api_params']['timezone'],
+                                          ambiguous=not latest, nonexistent='shift_forward')
+    return timestamp.value // NS_PER_SECOND
+
+
+def scale_prices(values):
+    """Convert decimal prices to int64 fixed-point."""
+    return np.rint(np.asarray(values, dtype=np.float64) * PRICE_SCALE).astype(np.int64)
+
+
+def price_matrix(bars):
+    """Return the ``(n_bars, 4)`` float64 open/high/low/close prices of a batch."""
+    return structured_to_unstructured(bars[PRICE_FIELDS], dtype=np.float64) / PRICE_SCALE
+
+
+def sort_bars(bars):
+    """Return the bars ordered oldest first, reversing instead of sorting when possible."""
+    times = bars['time']
+    if len(times) < 2 or np.all(times[1:] >= times[:-1]):
+        return bars
+    if np.all(times[1:] <= times[:-1]):
+        return bars[::-1]
+    return bars[np.argsort(times, kind='stable')]
+
+
+def bars_from_columns(columns, tz=None):
+    """
+    Converts decoded bar columns (see bar_decoder) into a bar batch.
+
+    Args:
+        columns (dict): ``datetime`` as naive local int64 ns and float64
+            prices, oldest first.
+        tz (str): Timezone the bars are labelled in, defaults to the API's.
+
+    Returns:
+        np.ndarray: Bars of ``BAR_DTYPE``, oldest first. Local times skipped
+        by the spring DST change cannot be real bars and are left out.
+    """
+    utc = local_to_utc(columns['datetime'], tz, nonexistent='NaT')
+    exists = utc != np.iinfo(np.int64).min
+    bars = empty_bars(int(exists.sum()))
+    bars['time'] = utc[exists] // NS_PER_SECOND
+    for field in PRICE_FIELDS:
+        bars[field] = scale_prices(columns[field][exists])
+    return bars
+
+
+def bars_from_frame(df, tz=None):
+    """Convert a DataFrame of local ``datetime`` and float prices into a bar batch."""
+    columns = {'datetime': df['datetime'].to_numpy().astype('datetime64[ns]').view(np.int64)}
+    columns.update({field: df[field].to_numpy() for field in PRICE_FIELDS})
+    return bars_from_columns(columns, tz)
+
+
+def bars_to_frame(bars, tz=None):
+    """Return a bar batch as a DataFrame of local ``datetime`` labels and float prices."""
+    frame = {'datetime': epoch_to_local(bars['time'], tz)}
+    frame.update({field: bars[field] / PRICE_SCALE for field in PRICE_FIELDS})
+    return pd.DataFrame(frame)
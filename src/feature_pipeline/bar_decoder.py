@@ -0,0 +1,171 @@
+"""
+Streaming, typed decoding of vendor time series payloads.
+
+A TwelveData ``time_series`` response is a JSON object whose ``values`` array
+holds one dict per bar with every field as a string ("94311.02000"). Building a
+DataFrame from those dicts and then parsing dates and casting each price column
+costs more than the request itself for large pages. BarDecoder instead scans
+the raw bytes, decodes the ``values`` array in bounded batches with orjson and
+converts each batch straight into typed columns:
+
+- ``datetime``: int64 nanosecond ticks of the vendor's (naive) bar time
+- ``open``/``high``/``low``/``close``: float64
+
+Only one batch of Python dicts is alive at a time, so memory stays flat for
+large pages. The columns are ordered oldest first, which is what BarStore and
+the lag engine expect.
+"""
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+
+BAR_FIELDS = ['datetime', 'open', 'high', 'low', 'close']
+PRICE_FIELDS = BAR_FIELDS[1:]
+
+# Bytes decoded per orjson call; bounds the number of live row dicts
+CHUNK_BYTES = 1 << 18
+
+_VALUES_KEY = b'"values"'
+_SEPARATORS = b', \t\r\n'
+
+
+def columns_from_rows(rows):
+    """
+    Converts decoded bar dicts into typed columns in their original order.
+
+    Args:
+        rows (list): Dicts with the keys in ``BAR_FIELDS`` and string values.
+
+    Returns:
+        dict: ``datetime`` as int64 ns ticks and the prices as float64 arrays.
+    """
+    if not rows:
+        return empty_columns()
+    # Arrow parses ISO date(time) strings and decimals in C, without pandas inference
+    columns = {'datetime': pa.array([row['datetime'] for row in rows]).cast(
+        pa.timestamp('ns')).to_numpy().view(np.int64)}
+    for field in PRICE_FIELDS:
+        columns[field] = pa.array([row[field] for row in rows]).cast(pa.float64()).to_numpy()
+    return columns
+
+
+def empty_columns():
+    """Return a set of zero-length bar columns."""
+    columns = {'datetime': np.empty(0, dtype=np.int64)}
+    for field in PRICE_FIELDS:
+        columns[field] = np.empty(0, dtype=np.float64)
+    return columns
+
+
+def sort_columns(columns):
+    """Return the columns ordered oldest first, reversing instead of sorting when possible."""
+    ticks = columns['datetime']
+    if len(ticks) < 2 or np.all(ticks[1:] >= ticks[:-1]):
+        return columns
+    if np.all(ticks[1:] <= ticks[:-1]):
+        order = slice(None, None, -1)
+    else:
+        order = np.argsort(ticks, kind='stable')
+    return {field: values[order] for field, values in columns.items()}
+
+
+def columns_to_frame(columns):
+    """Wrap typed bar columns in a DataFrame without parsing or copying the prices."""
+    frame = {'datetime': columns['datetime'].view('datetime64[ns]')}
+    frame.update({field: columns[field] for field in PRICE_FIELDS})
+    return pd.DataFrame(frame, copy=False)
+
+
+class BarDecoder:
+    def __init__(self):
+        """
+        Initializes the BarDecoder instance. Feed it the payload bytes in any
+        chunking, then call ``finish``.
+        """
+        self.buffer = bytearray()
+        self.head = bytearray()
+        self.in_values = False
+        self.values_done = False
+        self.batches = []
+
+    def feed(self, chunk):
+        """Consume the next chunk of payload bytes."""
+        self.buffer += chunk
+        if not self.in_values and not self.values_done:
+            key = self.buffer.find(_VALUES_KEY)
+            start = self.buffer.find(b'[', key) if key >= 0 else -1
+            if start < 0:
+                return
+            self.head += self.buffer[:key]
+            del self.buffer[:start + 1]
+            self.in_values = True
+        if self.in_values:
+            self._decode_complete_rows()
+
+    def _decode_complete_rows(self):
+        """Decode every complete bar object in the buffer as one batch."""
+        # Bar objects are flat and hold no brackets, so the first ']' closes the
+        # array and the last '}' before it closes the last complete bar
+        end = self.buffer.find(b']')
+        last = self.buffer.rfind(b'}', 0, end if end >= 0 else len(self.buffer))
+        if last >= 0:
+            segment = bytes(self.buffer[:last + 1]).lstrip(_SEPARATORS)
+            self.batches.append(columns_from_rows(orjson.loads(b'[' + segment + b']')))
+            del self.buffer[:last + 1]
+        end = self.buffer.find(b']')
+        if end >= 0 and not self.buffer[:end].strip(_SEPARATORS):
+            # Keep the rest of the object (e.g. "status") for finish()
+            self.head += b'"values":[]' + self.buffer[end + 1:]
+            self.buffer.clear()
+            self.in_values = False
+            self.values_done = True
+
+    def finish(self):
+        """
+        Completes decoding.
+
+        Returns:
+            tuple: The payload without its ``values`` (e.g. ``status``, ``meta``,
+            or an error ``code``/``message``) and the bar columns, oldest first.
+        """
+        if self.values_done:
+            self.head += self.buffer
+            payload = orjson.loads(bytes(self.head))
+        else:
+            # No values array: an error payload, or a truncated body (raises)
+            payload = orjson.loads(bytes(self.head + self.buffer))
+        payload.pop('values', None)
+
+        if not self.batches:
+            return payload, empty_columns()
+        columns = {field: np.concatenate([batch[field] for batch in self.batches])
+                   for field in BAR_FIELDS}
+        return payload, sort_columns(columns)
+
+
+def decode_bars(body, chunk_bytes=CHUNK_BYTES):
+    """
+    Decodes a complete payload into its metadata and typed bar columns.
+
+    Args:
+        body (bytes): Raw response body or file contents.
+        chunk_bytes (int): Bytes fed to the decoder at a time.
+
+    Returns:
+        tuple: ``(payload, columns)``, see BarDecoder.finish.
+    """
+    decoder = BarDecoder()
+    view = memoryview(body)
+    for offset in range(0, len(view), chunk_bytes):
+        decoder.feed(view[offset:offset + chunk_bytes])
+    return decoder.finish()
+
+
+def decode_stream(chunks):
+    """Decodes a payload arriving as an iterable of byte chunks, see decode_bars."""
+    decoder = BarDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.finish()
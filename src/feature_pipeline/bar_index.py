@@ -0,0 +1,159 @@
+"""
+Timestamp index over the raw bar store: gaps, duplicates and out-of-order bars.
+
+Every bar is mapped to an int64 slot, its position on the regular grid of its
+interval, so a single pass of ``np.diff`` over the slots finds everything that
+breaks contiguity: a step of 0 is a duplicate, a negative step an out-of-order
+bar and a step above 1 a gap. Only the ``time`` column of the partitions is
+read. The gaps found are the ranges StockData refetches. Ranges the vendor has
+no bars for either are recorded next to the bars, so they are not requested again.
+
+Up to hourly bars are slotted by their UTC time, so the hour skipped by the
+spring DST change is not taken for a gap. Coarser bars are bucketed on the
+local clock and slotted by it. Reported times are local labels, like the
+vendor's, since gaps are refetched by local date ranges.
+
+Usage:
+    python src/feature_pipeline/bar_index.py
+    python src/feature_pipeline/bar_index.py --symbol BTC/USD --start 2024-01-01 --repair
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from BarStore import BarStore, follows_utc_clock, interval_timedelta
+from bar_batch import NS_PER_SECOND, epoch_to_local, local_to_epoch, utc_to_local
+from storage import write_json
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+def bar_slots(times, interval=None, tz=None):
+    """
+    Maps bar times to their position on the interval's grid.
+
+    Args:
+        times (np.ndarray): Bar times as UTC epoch seconds.
+        interval (str): Bar interval, defaults to the API's.
+        tz (str): Timezone coarse bars are bucketed in, defaults to the API's.
+
+    Returns:
+        np.ndarray: int64 slots; consecutive bars differ by exactly 1.
+    """
+    interval = interval or configs['stock_api_params']['time_interval']
+    step = interval_timedelta(interval).value
+    ticks = np.asarray(times, dtype=np.int64) * NS_PER_SECOND
+    if not follows_utc_clock(interval):
+        ticks = utc_to_local(ticks, tz)
+    return ticks // step
+
+
+def slot_time(slots, interval=None, tz=None):
+    """Inverse of ``bar_slots``: the times of slots, as UTC epoch seconds."""
+    interval = interval or configs['stock_api_params']['time_interval']
+    ticks = np.asarray(slots, dtype=np.int64) * interval_timedelta(interval).value
+    if follows_utc_clock(interval):
+        return ticks // NS_PER_SECOND
+    return local_to_epoch(ticks, tz)
+
+
+def scan_ticks(times, interval=None, tz=None):
+    """
+    Finds duplicated, out-of-order and missing bars in one pass.
+
+    Args:
+        times (np.ndarray): Bar times as UTC epoch seconds, in stored order.
+        interval (str): Bar interval, defaults to the API's.
+        tz (str): Timezone the bars are labelled in, defaults to the API's.
+
+    Returns:
+        dict: ``bars`` count, ``duplicates`` and ``out_of_order`` local datetimes
+        and ``gaps`` as inclusive ``(first_missing, last_missing)`` local
+        Timestamp pairs.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    slots = bar_slots(times, interval, tz)
+    steps = np.diff(slots)
+    report = {
+        'bars': len(slots),
+        'duplicates': pd.to_datetime(epoch_to_local(times[1:][steps == 0], tz)).tolist(),
+        'out_of_order': pd.to_datetime(epoch_to_local(times[1:][steps < 0], tz)).tolist(),
+        'gaps': [],
+    }
+    if report['out_of_order']:
+        # Only sort when needed, in stored order the diff above is the whole scan
+        slots = np.sort(slots)
+        steps = np.diff(slots)
+
+    after = np.flatnonzero(steps > 1)
+    first = epoch_to_local(slot_time(slots[after] + 1, interval, tz), tz)
+    last = epoch_to_local(slot_time(slots[after + 1] - 1, interval, tz), tz)
+    report['gaps'] = list(zip(pd.to_datetime(first), pd.to_datetime(last)))
+    return report
+
+
+def scan_store(store, start=None, end=None):
+    """Scan the stored bars with ``start <= time <= end``; see ``scan_ticks``."""
+    return scan_ticks(store.read_ticks(start, end), store.resolution)
+
+
+def known_gaps_path(store):
+    """Return the file listing the gaps the vendor has no bars for."""
+    return store.path / f"gaps_{store.resolution}.json"
+
+
+def read_known_gaps(store):
+    """Return the recorded vendor gaps as a set of ``(first, last)`` Timestamp pairs."""
+    path = known_gaps_path(store)
+    if not path.exists():
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {(pd.Timestamp(first), pd.Timestamp(last)) for first, last in json.load(f)['gaps']}
+
+
+def record_known_gaps(store, gaps):
+    """Add gaps the vendor has no bars for, replacing the file atomically."""
+    gaps = read_known_gaps(store) | set(gaps)
+    write_json(known_gaps_path(store),
+               {'gaps': [[str(first), str(last)] for first, last in sorted(gaps)]}, indent=1)
+
+
+def print_report(symbol, report, known):
+    """Print a scan report."""
+    print(f"{symbol}: {report['bars']} bars, {len(report['gaps'])} gaps "
+          f"({len(known & set(report['gaps']))} known vendor gaps), "
+          f"{len(report['duplicates'])} duplicates, {len(report['out_of_order'])} out of order")
+    for first, last in report['gaps']:
+        note = " (no vendor data)" if (first, last) in known else ""
+        print(f"  missing {first} .. {last}{note}")
+
+
+if __name__ == "__main__":
+    from StockData import StockData
+
+    parser = argparse.ArgumentParser(description="Find gaps, duplicates and out-of-order bars in the bar store.")
+    parser.add_argument('--symbol', default=configs['stock_api_params']['symbols'][0])
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--repair', action='store_true',
+                        help="Refetch the missing ranges and rewrite unsorted partitions")
+    parser.add_argument('--recheck', action='store_true',
+                        help="Also refetch gaps recorded as having no vendor data")
+    args = parser.parse_args()
+
+    store = BarStore(args.symbol)
+    print_report(args.symbol, scan_store(store, args.start, args.end), read_known_gaps(store))
+    if args.repair:
+        StockData(args.symbol).repair_gaps(args.start, args.end, recheck=args.recheck)
+        print_report(args.symbol, scan_store(store, args.start, args.end), read_known_gaps(store))
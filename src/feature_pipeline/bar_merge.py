@@ -0,0 +1,96 @@
+"""
+Sorted merge of new bars into stored bars, keyed on their UTC epoch seconds.
+
+Stored and incoming bars are both ascending, so merging them is a merge of two
+sorted runs. ``np.argsort(kind='stable')`` runs timsort on int64 keys, which
+finds the two runs and merges them in O(n + m). The same pass pairs every
+incoming bar with the stored bar it replaces. Pairs whose fixed-point prices
+differ are reported as revisions: the vendor corrected a bar we already
+engineered features from, usually the previous bar, which was still forming
+when it was stored.
+
+A revised bar invalidates exactly the engineered rows that read it: its own
+row and the ``n_lags - 1`` rows after it, whose lag windows include it, plus
+the row before it, whose target is its close. ``recompute_slot_ranges`` turns
+revisions into those ranges.
+"""
+
+import numpy as np
+
+from bar_decoder import PRICE_FIELDS
+
+
+def merge_bars(stored, new):
+    """
+    Merges ascending ``new`` bars into ascending ``stored`` bars; new bars win on equal times.
+
+    A UTC time identifies a bar, so every run of equal times collapses to its
+    last bar. Stable sorting puts a run's stored bar before its incoming ones.
+
+    Args:
+        stored (np.ndarray): Bar batch (see ``bar_batch``), oldest first.
+        new (np.ndarray): Incoming bar batch, oldest first.
+
+    Returns:
+        tuple: The merged bar batch and a report with the ``inserted`` count
+        and the ``revised`` times whose prices changed.
+    """
+    combined = np.concatenate([stored, new])
+    order = np.argsort(combined['time'], kind='stable')
+    combined = combined[order]
+    ticks = combined['time']
+
+    boundaries = ticks[1:] != ticks[:-1]
+    run_starts = np.flatnonzero(np.r_[True, boundaries])
+    run_ends = np.flatnonzero(np.r_[boundaries, True])
+    first_is_stored = order[run_starts] < len(stored)
+    last_is_new = order[run_ends] >= len(stored)
+
+    # A stored bar superseded by an incoming one is a revision if its prices changed
+    replaced = first_is_stored & last_is_new
+    old_bars, new_bars = combined[run_starts[replaced]], combined[run_ends[replaced]]
+    changed = np.zeros(len(old_bars), dtype=bool)
+    for field in PRICE_FIELDS:
+        changed |= old_bars[field] != new_bars[field]
+
+    report = {
+        'inserted': int((~first_is_stored).sum()),
+        'revised': old_bars['time'][changed],
+    }
+    return combined[run_ends], report
+
+
+def sorted_isin(keys, existing):
+    """
+    Membership of ``keys`` in ``existing`` by binary search over the sorted keys.
+
+    Replaces ``np.isin``, which re-sorts both sides on every call.
+    """
+    existing = np.sort(np.asarray(existing, dtype=np.int64))
+    keys = np.asarray(keys, dtype=np.int64)
+    positions = np.searchsorted(existing, keys)
+    found = positions < len(existing)
+    found[found] = existing[positions[found]] == keys[found]
+    return found
+
+
+def recompute_slot_ranges(revised_slots, n_lags):
+    """
+    Returns the slots of the engineered rows that read a revised bar.
+
+    Args:
+        revised_slots (np.ndarray): int64 slots of the revised bars.
+        n_lags (int): Number of lags per price, including lag 0.
+
+    Returns:
+        list: Disjoint inclusive ``(first_slot, last_slot)`` ranges, oldest first.
+    """
+    ranges = []
+    for slot in np.unique(np.asarray(revised_slots, dtype=np.int64)):
+        # The row before reads the revised close as its target
+        first, last = int(slot) - 1, int(slot) + n_lags - 1
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], last))
+        else:
+            ranges.append((first, last))
+    return ranges
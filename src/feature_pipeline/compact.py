@@ -0,0 +1,64 @@
+"""
+Compaction of the committed data directory.
+
+The hourly workflow commits ``data/`` after every run. New bars go to small
+head partitions of the bar store and every run appends a small features part,
+so each commit only adds or changes a few KB. This merges what has become
+immutable: the head partitions of completed periods into sealed partitions
+(see ``BarStore.compact``) and the features parts of completed months into
+one part per month (see ``feature_io.compact_features``). It runs on a
+schedule from ``.github/workflows/compact_data.yml``.
+
+Usage:
+    python src/feature_pipeline/compact.py
+    python src/feature_pipeline/compact.py --symbol BTC/USD
+"""
+
+import argparse
+from pathlib import Path
+
+import yaml
+
+from BarStore import BarStore
+from FeatureProcessor import FeatureProcessor
+from feature_io import compact_features
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+def compact_symbol(symbol):
+    """
+    Compacts the bar store and the engineered features of one symbol.
+
+    Args:
+        symbol (str): Symbol to compact, e.g. "BTC/USD".
+
+    Returns:
+        dict: Number of bar partitions and features parts merged.
+    """
+    store = BarStore(symbol)
+    report = {'partitions': store.compact(), 'parts': 0}
+    # Features of the base resolution and of any pyramid level engineered on its own
+    for resolution in [None] + store.pyramid_levels():
+        features_path = FeatureProcessor(symbol, resolution=resolution).features_file_path()
+        if features_path.is_dir():
+            report['parts'] += compact_features(features_path)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the sealed bar partitions and features parts.")
+    parser.add_argument('--symbol', action='append',
+                        help="Symbol to compact, repeatable; defaults to stock_api_params.symbols")
+    args = parser.parse_args()
+
+    for symbol in args.symbol or configs['stock_api_params']['symbols']:
+        report = compact_symbol(symbol)
+        print(f"{symbol}: merged {report['partitions']} bar partitions "
+              f"and {report['parts']} features parts")
@@ -0,0 +1,288 @@
+"""
+Readers and writers for engineered feature files.
+
+The format follows the path suffix:
+
+- ``.parquet``: directory of zstd-compressed Parquet parts
+- ``.arrow``: directory of zstd-compressed Arrow IPC parts
+- ``.csv``: a single CSV file, kept as an opt-in export
+
+Parquet and Arrow keep dtypes (no date re-parsing on read) and support column
+and datetime-range pushdown. Appends add one part instead of rewriting the file,
+so an hourly commit of the directory stays small; ``compact_features`` merges
+the parts of completed months into one part each.
+
+Every write is one atomic commit (see ``storage``): new parts are written
+under fresh names, then ``_parts.json``, the list of live parts, is replaced
+in a single rename. Readers list the parts from it, so they see every write
+completely or not at all, without locks. Parts a commit replaces are deleted
+one commit later, so a reader still holding the previous list can finish.
+The CSV export is replaced as a whole.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from storage import append_csv, write_csv, write_ipc, write_json, write_parquet
+
+# Path suffix -> pyarrow dataset format
+DATASET_FORMATS = {
+    '.parquet': 'parquet',
+    '.arrow': 'ipc',
+}
+
+# List of the live parts of a Parquet/Arrow features directory
+MANIFEST = "_parts.json"
+
+
+def to_table(df, float32_lags=False):
+    """Convert engineered rows to an Arrow table, optionally downcasting lag columns."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if float32_lags:
+        for i, field in enumerate(table.schema):
+            if '_lag_' in field.name and pa.types.is_floating(field.type):
+                table = table.set_column(
+                    i, field.name, table.column(i).cast(pa.float32()))
+    return table
+
+
+def read_manifest(path):
+    """Return the manifest of a features directory, or None for directories written without one."""
+    manifest_path = Path(path) / MANIFEST
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def part_files(path):
+    """Return the live parts of a Parquet/Arrow features directory in write order."""
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return sorted(path.glob("part-*"))
+    return [path / name for name in manifest['parts']]
+
+
+def commit_parts(path, parts):
+    """
+    Makes ``parts`` the live parts of a features directory in one atomic rename.
+
+    Parts replaced by the previous commit, and parts left behind by writers
+    that crashed before committing, are deleted.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    names = [Path(part).name for part in parts]
+    retired = [name for name in (manifest or {}).get('parts', []) if name not in names]
+    write_json(path / MANIFEST, {'parts': names, 'retired': retired}, indent=1)
+
+    keep = set(names) | set(retired)
+    for part_path in path.glob("part-*"):
+        if part_path.name not in keep:
+            part_path.unlink()
+
+
+def write_part(table, path):
+    """Write ``table`` as a new, not yet committed part of a Parquet/Arrow features directory."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    # Number past every part on disk, so uncommitted and retired ones are never overwritten
+    numbers = [int(part.stem.split('-')[1]) for part in path.glob("part-*")]
+    part_path = path / f"part-{max(numbers, default=-1) + 1:06d}{path.suffix}"
+    if path.suffix == '.parquet':
+        write_parquet(table, part_path)
+    else:
+        write_ipc(table, part_path)
+    return part_path
+
+
+def read_part(part_path):
+    """Read one Parquet/Arrow part as a table."""
+    if part_path.suffix == '.parquet':
+        return pq.read_table(part_path)
+    with pa.OSFile(str(part_path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_features(df, path, float32_lags=False):
+    """
+    Writes engineered rows to ``path``, replacing any previous contents.
+
+    Args:
+        df (pd.DataFrame): Engineered rows.
+        path (str or Path): Target path; its suffix selects the format.
+        float32_lags (bool): Store the lag columns as float32.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        write_csv(df, path)
+        return
+    commit_parts(path, [write_part(to_table(df, float32_lags), path)])
+
+
+def append_features(df, path, float32_lags=False):
+    """Appends engineered rows to an existing features file or directory."""
+    path = Path(path)
+    if path.suffix == '.csv':
+        append_csv(df, path)
+        return
+    parts = part_files(path)
+    commit_parts(path, parts + [write_part(to_table(df, float32_lags), path)])
+
+
+def upsert_features(df, path, float32_lags=False):
+    """
+    Writes engineered rows, replacing stored rows of the same bar ``time``.
+
+    Only the parts holding a replaced time are rewritten, as new parts
+    committed together with the rows, so readers never see a time twice or
+    not at all. A CSV export is rewritten as a whole.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        stored = read_features(path)
+        stored = stored[~stored['time'].isin(df['time'])]
+        df = pd.concat([df, stored]).sort_values(by='time', ascending=False)
+        write_csv(df, path)
+        return
+
+    replaced = pa.array(df['time'].to_numpy(), type=pa.int64())
+    parts = []
+    for part_path in part_files(path):
+        table = read_part(part_path)
+        stale = pc.is_in(table.column('time'), value_set=replaced)
+        if not pc.any(stale).as_py():
+            parts.append(part_path)
+            continue
+        table = table.filter(pc.invert(stale))
+        if table.num_rows:
+            parts.append(write_part(table, path))
+    commit_parts(path, parts + [write_part(to_table(df, float32_lags), path)])
+
+
+def compact_features(path):
+    """
+    Merges the parts of a features directory into one part per completed UTC month.
+
+    Every hourly run appends a small part. Parts holding rows of months
+    before the one of the latest row are rewritten as one part per month,
+    newest row first, and committed together with a part for their rows of
+    the current month. A month already held by a single part of its own is
+    left alone, so a sealed month's file is written once.
+
+    Args:
+        path (str or Path): Parquet/Arrow features directory.
+
+    Returns:
+        int: Number of parts replaced.
+    """
+    path = Path(path)
+    parts = part_files(path)
+    if len(parts) < 2:
+        return 0
+    months = []
+    for part_path in parts:
+        times = read_part(part_path).column('time').to_numpy()
+        months.append(set(utc_months(times)) if len(times) else set())
+    current = max(max(part_months) for part_months in months if part_months)
+
+    # A month is settled when one part holds it and nothing else
+    holders = {}
+    for part_months in months:
+        for month in part_months:
+            holders[month] = holders.get(month, 0) + 1
+    rewrite = [bool(part_months) and min(part_months) < current
+               and not (len(part_months) == 1 and holders[min(part_months)] == 1)
+               for part_months in months]
+    if not any(rewrite):
+        return 0
+
+    table = ds.dataset([str(p) for p, r in zip(parts, rewrite) if r],
+                       format=DATASET_FORMATS[path.suffix]).to_table()
+    table = table.sort_by([('time', 'descending')])
+    table_months = utc_months(table.column('time').to_numpy())
+    sealed, head = [], []
+    for month in sorted(set(table_months)):
+        part_path = write_part(table.filter(pa.array(table_months == month)), path)
+        (sealed if month < current else head).append(part_path)
+
+    # Sealed months first; the current month's parts keep their write order
+    kept = [(part_path, part_months) for part_path, part_months, r in zip(parts, months, rewrite)
+            if not r]
+    settled = [part_path for part_path, part_months in kept
+               if part_months and min(part_months) < current]
+    recent = [part_path for part_path, _ in kept if part_path not in settled]
+    commit_parts(path, settled + sealed + recent + head)
+    print(f"Compacted {sum(rewrite)} parts of {path} into {len(sealed) + len(head)}")
+    return sum(rewrite)
+
+
+def utc_months(times):
+    """Return the UTC month keys ("2024-11") of epoch seconds."""
+    return np.datetime_as_string(np.asarray(times, dtype=np.int64).view('datetime64[s]'), unit='M')
+
+
+def last_written_time(path):
+    """
+    Return the latest bar ``time`` of the most recent write, or None for no rows.
+
+    A crash between committing rows and saving the engineering watermark
+    leaves rows newer than the watermark; this finds them without reading
+    the whole file.
+    """
+    path = Path(path)
+    if path.suffix == '.csv':
+        times = pd.read_csv(path, usecols=['time'])['time']
+        return int(times.max()) if len(times) else None
+    parts = part_files(path)
+    if not parts:
+        return None
+    times = read_part(parts[-1]).column('time')
+    return pc.max(times).as_py() if len(times) else None
+
+
+def read_features(path, columns=None, start_time=None, end_time=None, key='datetime'):
+    """
+    Reads engineered rows, pushing the column and time range filters into the reader.
+
+    Args:
+        path (str or Path): Features file or directory.
+        columns (list): Columns to read, or None for all.
+        start_time: Inclusive lower bound, or None.
+        end_time: Inclusive upper bound, or None.
+        key (str): Column the bounds apply to: the local ``datetime`` or the
+            bar ``time`` in UTC epoch seconds.
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    path = Path(path)
+    if key == 'datetime':
+        start_time = pd.Timestamp(start_time) if start_time is not None else None
+        end_time = pd.Timestamp(end_time) if end_time is not None else None
+    if path.suffix == '.csv':
+        df = pd.read_csv(path, parse_dates=['datetime'], usecols=columns)
+        if start_time is not None:
+            df = df[df[key] >= start_time]
+        if end_time is not None:
+            df = df[df[key] <= end_time]
+        return df.reset_index(drop=True)
+
+    expression = None
+    if start_time is not None:
+        expression = ds.field(key) >= start_time
+    if end_time is not None:
+        upper = ds.field(key) <= end_time
+        expression = upper if expression is None else expression & upper
+
+    dataset = ds.dataset([str(p) for p in part_files(path)],
+                         format=DATASET_FORMATS[path.suffix])
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
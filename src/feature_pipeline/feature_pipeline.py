@@ -1,13 +1,19 @@
 from pathlib import Path
+import argparse
 import yaml
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Custom imports
 from FeatureProcessor import FeatureProcessor
 from HopsworkFeatureStore import HopsworkFeatureStore
 from StockData import StockData
+from ApiClient import AsyncApiClient
+from PriceStream import PriceStream
 
 import warnings
 warnings.filterwarnings('ignore')
@@ -24,6 +30,12 @@ with open(CONFIG_FILE, 'r') as file:
 
 global_flag = 1
 
+# Writes engineered features to disk while ingestion runs on the in-memory frame
+persist_executor = ThreadPoolExecutor(
+    max_workers=configs['pipeline']['max_concurrency'])
+# The latest background write of each symbol; its next pass waits for it
+persist_futures = {}
+
 
 def run_stock_profile(symbol, init=False, **kwargs):
     stock = StockData(symbol)
@@ -40,56 +52,169 @@ def run_stock_profile(symbol, init=False, **kwargs):
         global_flag = stock.update_data()
 
 
-def run_feature_engineering_pipeline(symbol):
-    # Process the features for stock
+def run_feature_engineering_pipeline(symbol, executor=persist_executor):
+    # Process the features for stock; with an executor the rows are written in
+    # the background and the returned future resolves once the file and
+    # watermark are on disk, without one they are written before returning
+    previous = persist_futures.pop(symbol, None)
+    if previous is not None:
+        # A pass engineers from the watermark the previous write leaves behind;
+        # a failed write was already reported against the pass that made it
+        wait([previous])
     feature_processor = FeatureProcessor(symbol=symbol)
 
-    # Dynamically create the filename for JSON data
-    file_name = feature_processor.create_filename()
-    json_data = feature_processor.read_json_file(file_name)
-    if json_data:
-        df = feature_processor.save_json_features_to_dataframe(json_data)
-        engineered_df = feature_processor.feature_engineering(df)
-        feature_processor.save_new_features_to_file(engineered_df)
-
-
-def run_feature_store_ingestion(symbol):
+    if configs['feature_engineering']['incremental']:
+        # Engineer only the rows for bars that arrived since the last run
+        engineered_df = feature_processor.run_incremental(executor=executor)
+        persist_future = getattr(feature_processor, 'persist_future', None)
+        if persist_future is not None:
+            persist_futures[symbol] = persist_future
+        # Rows recomputed after bar revisions replace these in the feature store
+        return engineered_df, feature_processor.stale_rows, persist_future
+
+    # Read the raw bars from the partitioned bar store
+    df = feature_processor.read_bars()
+    if df is not None:
+        engineered_df = feature_processor.feature_engineering(
+            df, origin=feature_processor.range_origin())
+        if executor is None:
+            feature_processor.persist_features(engineered_df)
+            return engineered_df, None, None
+        persist_future = executor.submit(
+            feature_processor.persist_features, engineered_df)
+        persist_futures[symbol] = persist_future
+        return engineered_df, None, persist_future
+    return None, None, None
+
+
+def run_feature_store_ingestion(symbol, engineered_df=None, stale_rows=None):
     # Define your configurations
     # Replace with your Hopsworks project name
     PROJECT_NAME = configs['hopsworks']['project_name']
     FEATURE_GROUP_NAME = f"{symbol.split('/')[0].lower()}_features"
     API_KEY = os.getenv("HOPSWORKS_API_KEY")
 
-    # Use BASE_DIR to dynamically build the paths for data directories and files
-    data_eng_dir = BASE_DIR / "data" / "engineered"
-    file_name = f"stockdata_{symbol.split('/')[0]}_engineered.csv"
-    CSV_PATH = data_eng_dir / file_name
+    # Path of the engineered features in the configured output format
+    FEATURES_PATH = FeatureProcessor(symbol=symbol).features_file_path()
 
     # Initialize and run the pipeline
     hopswork_fs = HopsworkFeatureStore(
         PROJECT_NAME,
         FEATURE_GROUP_NAME,
         API_KEY,
-        str(CSV_PATH)  # Convert Path object to string for compatibility
+        str(FEATURES_PATH)  # Convert Path object to string for compatibility
     )
-    hopswork_fs.run_pipeline()
+    # Ingest the frame handed over by the engineering stage, if any,
+    # instead of reading it back from disk
+    hopswork_fs.run_pipeline(engineered_df, stale_rows)
+
+
+def run_feature_group_migration(symbol, old_version=1):
+    # Copy rows keyed by string uids from an older feature group version
+    PROJECT_NAME = configs['hopsworks']['project_name']
+    FEATURE_GROUP_NAME = f"{symbol.split('/')[0].lower()}_features"
+    API_KEY = os.getenv("HOPSWORKS_API_KEY")
+    FEATURES_PATH = FeatureProcessor(symbol=symbol).features_file_path()
+
+    hopswork_fs = HopsworkFeatureStore(
+        PROJECT_NAME, FEATURE_GROUP_NAME, API_KEY, str(FEATURES_PATH))
+    hopswork_fs.get_or_create_feature_group()
+    hopswork_fs.migrate_feature_group(old_version)
+
+
+async def run_symbol_pipeline(symbol, client, semaphore):
+    # Fetch -> engineer -> ingest for one symbol; failures are isolated per symbol
+    async with semaphore:
+        start = time.perf_counter()
+        result = {'symbol': symbol, 'status': 'failed', 'rows': 0, 'error': None}
+        try:
+            flag = await StockData(symbol).update_data_async(client)
+            if flag == 1:
+                engineered_df, stale_rows, persist_future = await asyncio.to_thread(
+                    run_feature_engineering_pipeline, symbol)
+                if engineered_df is not None:
+                    await asyncio.to_thread(
+                        run_feature_store_ingestion, symbol, engineered_df, stale_rows)
+                    result['rows'] = len(engineered_df)
+                # The write overlapped ingestion; the symbol is only updated
+                # once its file and watermark are on disk
+                if persist_future is not None:
+                    await asyncio.wrap_future(persist_future)
+                result['status'] = 'updated'
+            elif flag == -1:
+                result['status'] = 'up to date'
+            else:
+                result['error'] = 'update failed'
+        except Exception as e:
+            result['error'] = repr(e)
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+
+async def run_all_symbols(symbols):
+    # Run every symbol concurrently with at most `max_concurrency` in flight
+    semaphore = asyncio.Semaphore(configs['pipeline']['max_concurrency'])
+    async with AsyncApiClient.from_config() as client:
+        results = await asyncio.gather(
+            *(run_symbol_pipeline(symbol, client, semaphore) for symbol in symbols))
+        return results, client.metrics_summary()
+
+
+def print_summary(results, metrics, wall_seconds):
+    print("Multi-symbol run summary:")
+    print(f"{'symbol':<12} {'status':<12} {'rows':>6} {'seconds':>9}  error")
+    for r in results:
+        print(f"{r['symbol']:<12} {r['status']:<12} {r['rows']:>6} "
+              f"{r['seconds']:>9.2f}  {r['error'] or ''}")
+    slowest = max((r['seconds'] for r in results), default=0.0)
+    print(f"Wall clock {wall_seconds:.2f}s, slowest symbol {slowest:.2f}s, "
+          f"sum {sum(r['seconds'] for r in results):.2f}s")
+    print(f"API client metrics: {metrics}")
+
+
+def process_closed_bars(symbol, bars):
+    # Engineer and ingest the rows completed by bars the price stream just
+    # stored. Bars close back to back, so the rows and watermark are written
+    # inline: the next bar's pass must read this one's watermark
+    engineered_df, stale_rows, _ = run_feature_engineering_pipeline(symbol, executor=None)
+    if engineered_df is not None and not engineered_df.empty:
+        run_feature_store_ingestion(symbol, engineered_df, stale_rows)
+
+
+def run_stream(symbols):
+    # Stream ticks into bars and process each bar as soon as it closes
+    stocks = [StockData(symbol) for symbol in symbols]
+    for stock in stocks:
+        # Bring the stores up to date before the first streamed bar lands
+        stock.update_data()
+    print(f"Streaming {', '.join(symbols)}...")
+    stream = PriceStream(stocks, on_bar=process_closed_bars)
+    try:
+        asyncio.run(stream.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        persist_executor.shutdown()
+        stats = {k: v for k, v in stream.stats.items() if k != 'bar_latencies'}
+        print(f"Price stream stats: {stats}")
 
 
 if __name__ == "__main__":
-    # Fetch data for BTC/USD for the last 20 days - initial data fetch
-    symbol = configs['stock_api_params']['symbol']
-    print(f"Fetching data for {symbol}...")
-    run_stock_profile(symbol, init=False)
-    print(f"Data fetched for {symbol}")
-
-    if global_flag == 1:
-        print("Running feature engineering pipeline...")
-        run_feature_engineering_pipeline(symbol)
-        print("Feature engineering pipeline completed")
-        print("Running feature store ingestion pipeline...")
-        run_feature_store_ingestion(symbol)
-        print("Feature store ingestion pipeline completed")
-    elif global_flag == -1:
-        print("Data already up to date")
+    parser = argparse.ArgumentParser(description="Fetch, engineer and ingest stock features.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Consume the price WebSocket and process bars as they close")
+    args = parser.parse_args()
+
+    symbols = configs['stock_api_params']['symbols']
+    if args.stream:
+        run_stream(symbols)
     else:
-        print("Failed to update data")
+        # Fetch, engineer and ingest every configured symbol concurrently
+        print(f"Running pipeline for {', '.join(symbols)}...")
+        start = time.perf_counter()
+        results, metrics = asyncio.run(run_all_symbols(symbols))
+
+        # Every write was awaited by its symbol, whose error it reported; this
+        # only waits for writes of symbols that failed while theirs ran
+        persist_executor.shutdown()
+        print_summary(results, metrics, time.perf_counter() - start)
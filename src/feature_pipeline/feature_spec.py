@@ -0,0 +1,328 @@
+"""
+Declarative feature spec and the planner that compiles it into one NumPy pass.
+
+The model's inputs are declared once, under ``feature_engineering.features``
+in config.yml: OHLC lags, close-to-close returns, rolling window stats,
+technical indicators and the lags of coarser context resolutions.
+``FeaturePlan`` turns the spec into a fixed column order and the bar depth a
+row needs, and is shared by the feature pipeline (which builds the columns),
+the trainer (which selects them) and, through the ``feature_spec.json`` saved
+next to the model, the serving script (which orders request rows by them).
+
+Building a frame is one pass over one newest-first price grid. The lag
+windows are a strided view over the grid (see ``lag_engine``); returns and
+rolling stats read their prices through views of those same windows, and a
+rolling std reuses the rolling mean of its window. Indicators depend on the
+whole history rather than a window, so they are folded incrementally by
+``indicators.IndicatorSet`` and handed in per bar. Every feature is written
+straight into its slice of a single preallocated ``(n_rows, n_features)``
+float64 block, so the frame holds the features as one float block in the
+spec's order. The training and serving matrices are then a column slice of
+that block instead of a per-column reindex. ``build_row`` runs the same
+arithmetic on the window of a single bar, for the online path in
+``online_features``.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from indicators import IndicatorSet
+from lag_engine import (PRICE_COLUMNS, build_context_matrix, context_feature_columns,
+                        lag_feature_columns, lag_window_view)
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+ROLLING_STATS = ['mean', 'std', 'min', 'max']
+
+# Name of the spec file saved with a trained model
+SPEC_FILE = "feature_spec.json"
+
+
+def read_spec(spec=None):
+    """
+    Returns a complete feature spec, filling unset keys from the defaults.
+
+    Args:
+        spec (dict): Spec in the layout of ``feature_engineering.features``.
+            Defaults to the one in config.yml.
+
+    Returns:
+        dict: ``lags``, ``returns``, ``rolling``, ``indicators``,
+        ``context_resolutions`` and ``context_lags``.
+    """
+    spec = dict(configs['feature_engineering']['features'] if spec is None else spec)
+    rolling = [{'price': window.get('price', 'close'), 'window': int(window['window']),
+                'stats': list(window.get('stats', ['mean']))}
+               for window in spec.get('rolling') or []]
+    return {
+        'lags': int(spec.get('lags', 13)),
+        'returns': [int(n) for n in spec.get('returns') or []],
+        'rolling': rolling,
+        'indicators': [dict(indicator) for indicator in spec.get('indicators') or []],
+        'context_resolutions': list(spec.get('context_resolutions') or []),
+        'context_lags': int(spec.get('context_lags', 3)),
+    }
+
+
+def return_columns(horizons):
+    """Return the return column names, e.g. ``return_3``."""
+    return [f"return_{n}" for n in horizons]
+
+
+def rolling_columns(rolling):
+    """Return the rolling stat column names, e.g. ``close_std_12``, per window stat-minor."""
+    return [f"{window['price']}_{stat}_{window['window']}"
+            for window in rolling for stat in window['stats']]
+
+
+class FeaturePlan:
+    def __init__(self, spec=None, resolution=None):
+        """
+        Initializes the FeaturePlan instance.
+
+        Args:
+            spec (dict): Feature spec (see ``read_spec``), config.yml's by default.
+            resolution (str): Resolution of the bars the rows are built from.
+                Context resolutions not coarser than it are left out.
+        """
+        self.spec = read_spec(spec)
+        self.n_lags = self.spec['lags']
+        self.returns = self.spec['returns']
+        self.rolling = self.spec['rolling']
+        self.indicators = IndicatorSet(self.spec['indicators'])
+        self.context_resolutions = self.spec['context_resolutions']
+        self.context_lags = self.spec['context_lags']
+        if resolution is not None:
+            # Imported here, so the serving side can compile a plan without the bar store
+            from BarStore import interval_timedelta
+            step = interval_timedelta(resolution)
+            self.context_resolutions = [r for r in self.context_resolutions
+                                        if interval_timedelta(r) > step]
+        self.validate()
+
+        self.lag_columns = lag_feature_columns(self.n_lags)
+        self.return_columns = return_columns(self.returns)
+        self.rolling_columns = rolling_columns(self.rolling)
+        self.indicator_columns = self.indicators.columns
+        self.context_columns = context_feature_columns(self.context_resolutions, self.context_lags)
+        # The model's inputs, in the order of the engineered block
+        self.columns = (self.lag_columns + self.return_columns + self.rolling_columns
+                        + self.indicator_columns + self.context_columns)
+
+        # Bars a row reads: itself and the history its lags, returns and windows need
+        self.depth = max([self.n_lags, 1] + [n + 1 for n in self.returns]
+                         + [window['window'] for window in self.rolling])
+
+    def validate(self):
+        """Raises ValueError for a spec the planner cannot compile."""
+        if self.n_lags < 1:
+            raise ValueError(f"Feature spec needs at least one lag, got {self.n_lags}")
+        for n in self.returns:
+            if n < 1:
+                raise ValueError(f"Return horizon must be at least 1 bar, got {n}")
+        for window in self.rolling:
+            if window['price'] not in PRICE_COLUMNS:
+                raise ValueError(f"Unknown rolling window price: {window['price']}")
+            for stat in window['stats']:
+                if stat not in ROLLING_STATS:
+                    raise ValueError(f"Unknown rolling window stat: {stat}")
+            # The std is the sample std, which needs two bars
+            shortest = 2 if 'std' in window['stats'] else 1
+            if window['window'] < shortest:
+                raise ValueError(f"Rolling window too short: {window['window']}")
+
+    def to_dict(self):
+        """Return the spec and the column order, as saved next to a trained model."""
+        return {'spec': self.spec, 'columns': self.columns}
+
+    def slices(self):
+        """Return the column slice of each feature group in the engineered block."""
+        bounds = np.cumsum([0, len(self.lag_columns), len(self.return_columns),
+                            len(self.rolling_columns), len(self.indicator_columns),
+                            len(self.context_columns)])
+        return {group: slice(start, stop) for group, start, stop in zip(
+            ['lags', 'returns', 'rolling', 'indicators', 'context'], bounds[:-1], bounds[1:])}
+
+    def fill(self, block, windows, indicators=None, row_ends=None, context=None):
+        """
+        Writes the features of rows into their slices of a preallocated block.
+
+        This is the arithmetic shared by the batch frame (``build_frame``) and
+        the online row (``build_row``), so both give the same values.
+
+        Args:
+            block (np.ndarray): ``(n_rows, len(columns))`` float64 output.
+            windows (np.ndarray): ``(n_rows, depth * 4)`` lag windows of the
+                rows, newest bar first (see ``lag_engine.lag_window_view``).
+            indicators (np.ndarray): ``(n_rows, len(indicator_columns))``
+                indicator outputs of the rows' bars, NaN if None.
+            row_ends (np.ndarray): int64 end time of each row's bar, needed for context features.
+            context (dict): ``(coarse_ends, coarse_prices)`` per context resolution.
+        """
+        n_prices = len(PRICE_COLUMNS)
+        close = PRICE_COLUMNS.index('close')
+        slices = self.slices()
+
+        block[:, slices['lags']] = windows[:, :self.n_lags * n_prices]
+
+        column = slices['returns'].start
+        for n in self.returns:
+            # close_lag_0 / close_lag_n - 1
+            out = block[:, column]
+            np.divide(windows[:, close], windows[:, n * n_prices + close], out=out)
+            np.subtract(out, 1.0, out=out)
+            column += 1
+
+        column = slices['rolling'].start
+        for window in self.rolling:
+            # The window's prices, newest first, as a view of the lag windows
+            values = windows[:, PRICE_COLUMNS.index(window['price'])::n_prices][:, :window['window']]
+            mean = None
+            for stat in window['stats']:
+                if stat in ('mean', 'std') and mean is None:
+                    mean = values.mean(axis=1)
+                if stat == 'mean':
+                    block[:, column] = mean
+                elif stat == 'std':
+                    deviations = values - mean[:, None]
+                    block[:, column] = np.sqrt(
+                        np.einsum('ij,ij->i', deviations, deviations) / (window['window'] - 1))
+                elif stat == 'min':
+                    block[:, column] = values.min(axis=1)
+                else:
+                    block[:, column] = values.max(axis=1)
+                column += 1
+
+        if self.indicator_columns:
+            block[:, slices['indicators']] = np.nan if indicators is None else indicators
+
+        if self.context_columns and len(block):
+            column = slices['context'].start
+            width = self.context_lags * n_prices
+            for resolution in self.context_resolutions:
+                coarse_ends, coarse_prices = context[resolution]
+                block[:, column:column + width] = build_context_matrix(
+                    row_ends, coarse_ends, coarse_prices, self.context_lags)
+                column += width
+
+    def build_row(self, window, indicators=None, end=None, context=None):
+        """
+        Builds the feature vector of a single bar, for online serving.
+
+        Args:
+            window (np.ndarray): ``(depth, 4)`` open/high/low/close of the bar
+                and the ``depth - 1`` slots before it, newest first; missing
+                bars are NaN rows.
+            indicators (np.ndarray): The bar's indicator outputs (see ``IndicatorSet.update``).
+            end (int): End time of the bar, UTC epoch seconds, needed for context features.
+            context (dict): ``(coarse_ends, coarse_prices)`` per context resolution.
+
+        Returns:
+            np.ndarray: float64 features in plan order, as ``build_frame``
+            would give for the bar's row.
+        """
+        window = np.ascontiguousarray(window, dtype=np.float64)
+        row = np.empty((1, len(self.columns)))
+        self.fill(row, lag_window_view(window, self.depth),
+                  None if indicators is None else np.asarray(indicators).reshape(1, -1),
+                  None if end is None else np.asarray([end], dtype=np.int64), context)
+        return row[0]
+
+    def build_frame(self, times, prices, slots=None, ends=None, context=None, indicators=None,
+                    key='time', origin=None):
+        """
+        Builds the engineered feature/target frame in one pass.
+
+        Args:
+            times (array-like): Bar times (or any per-bar key), oldest first.
+            prices (np.ndarray): ``(n_bars, 4)`` open/high/low/close prices, oldest first.
+            slots (np.ndarray): The bars' strictly increasing int64 grid
+                positions (see ``bar_index.bar_slots``). When given, bars are
+                laid out on their grid, so a missing bar yields NaN features
+                instead of shifting older bars into its place.
+            ends (np.ndarray): int64 end time of each bar, needed for context features.
+            context (dict): ``(coarse_ends, coarse_prices)`` per context
+                resolution, oldest first (see ``lag_engine.build_context_matrix``).
+            indicators (np.ndarray): ``(n_bars, len(indicator_columns))``
+                indicator outputs of each bar, oldest first (see ``IndicatorSet.batch``).
+            key (str): Name of the column holding ``times``.
+            origin (int): Slot the grid starts at, ``slots[0]`` by default.
+                When the bars are a range read of a longer history, the
+                range's first slot: a missing bar there is then a NaN lag of
+                the first rows, as in the whole history, rather than the
+                start of history.
+
+        Returns:
+            pd.DataFrame: ``key``, the feature columns in plan order and
+            ``target`` (the next bar's close), newest first. Bars without a
+            full history or without a following bar are left out; context
+            features are NaN for rows before enough coarse bars completed, and
+            indicators for rows without ``indicators``.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        n_bars = len(prices)
+        close = PRICE_COLUMNS.index('close')
+
+        if slots is not None and n_bars:
+            origin = slots[0] if origin is None else min(origin, slots[0])
+        if slots is not None and n_bars and slots[-1] - origin != n_bars - 1:
+            # Missing slots are NaN rows of the grid
+            positions = np.asarray(slots, dtype=np.int64) - origin
+            n_slots = int(positions[-1]) + 1
+            grid = np.full((n_slots, len(PRICE_COLUMNS)), np.nan)
+            grid[positions] = prices
+            newest_first = np.ascontiguousarray(grid[::-1])
+            # Grid row of every bar, newest first; keep those with history and a next bar
+            rows = n_slots - 1 - positions[::-1]
+            next_close = np.r_[np.nan, newest_first[:-1, close]]
+            picks = (rows <= n_slots - self.depth) & ~np.isnan(next_close[rows])
+            rows = rows[picks]
+            target = next_close[rows]
+        else:
+            newest_first = np.ascontiguousarray(prices[::-1])
+            # Row 0 is the newest bar, which has no next-bar close to predict yet
+            n_rows = max(n_bars - self.depth, 0)
+            rows = picks = slice(1, n_rows + 1)
+            target = newest_first[:n_rows, close]
+
+        windows = lag_window_view(newest_first, self.depth)[rows]
+        block = np.empty((len(target), len(self.columns)))
+        self.fill(block, windows,
+                  None if indicators is None else np.asarray(indicators)[::-1][picks],
+                  np.asarray(ends)[::-1][picks] if self.context_columns else None, context)
+
+        df = pd.DataFrame(block, columns=self.columns, copy=False)
+        df.insert(0, key, np.asarray(times)[::-1][picks])
+        df['target'] = target
+        return df
+
+    def select(self, df):
+        """
+        Returns the model inputs of an engineered frame in plan order.
+
+        When the frame holds the feature columns as one run in plan order, as
+        engineered frames and the feature files do, this is a positional
+        column slice rather than a reindex by name. Under pandas Copy-on-Write
+        the slice is a view of the frame's values, otherwise one block copy.
+
+        Args:
+            df (pd.DataFrame): Engineered rows.
+
+        Returns:
+            pd.DataFrame: The ``columns`` of ``df``.
+        """
+        names = list(df.columns)
+        if self.columns and self.columns[0] in names:
+            start = names.index(self.columns[0])
+            if names[start:start + len(self.columns)] == self.columns:
+                return df.iloc[:, start:start + len(self.columns)]
+        return df[self.columns]
@@ -0,0 +1,354 @@
+"""
+Technical indicators with a vectorized batch kernel and a constant-time streaming update.
+
+Every indicator folds bars into a small JSON-serializable state: the running
+sums and filter delays of its smoothers, the previous close and the values
+still inside its window. ``batch`` folds a chunk of bars in one vectorized
+pass and ``update`` folds a single bar, which costs the same whatever the
+history. Both run the same kernels:
+
+- ``smooth``: exponential smoothing seeded with the mean of the first
+  ``period`` inputs (EMA, Wilder's RSI and ATR, the MACD signal). The seed is
+  a sequential ``cumsum`` and the recursion an IIR filter (``lfilter``) that
+  carries its delay across chunks.
+- ``window_sums``: running sum and sum of squares over the last ``period``
+  inputs (Bollinger bands, rolling volatility), as a sequential ``cumsum`` of
+  each input minus the one leaving the window.
+
+Both compute every output with the same operations in the same order however
+the bars are split into chunks, so folding the history at once, hour by hour
+or bar by bar gives bit-for-bit the same values.
+
+Outputs are NaN until an indicator has seen enough bars (its warm-up).
+Missing bars are skipped, i.e. indicators run over the stored bars in order.
+"""
+
+import numpy as np
+from scipy.signal import lfilter
+
+from lag_engine import PRICE_COLUMNS
+
+OPEN, HIGH, LOW, CLOSE = range(len(PRICE_COLUMNS))
+
+
+def smooth_state():
+    """Return the state of a smoother that has seen no input."""
+    return {'count': 0, 'acc': 0.0, 'z': 0.0}
+
+
+def smooth(values, alpha, period, state):
+    """
+    Exponentially smooths ``values``, continuing from ``state``.
+
+    The first ``period`` inputs are averaged into the seed; from then on each
+    output is ``alpha * x + (1 - alpha) * previous``.
+
+    Args:
+        values (np.ndarray): float64 inputs, oldest first.
+        alpha (float): Smoothing factor, e.g. ``2 / (period + 1)`` or Wilder's ``1 / period``.
+        period (int): Number of inputs averaged into the seed.
+        state (dict): State from ``smooth_state`` or a previous call.
+
+    Returns:
+        tuple: Smoothed values (NaN before the seed) and the new state.
+    """
+    out = np.full(len(values), np.nan)
+    count, acc, z = state['count'], state['acc'], state['z']
+
+    seeding = min(max(period - count, 0), len(values))
+    if seeding:
+        acc = float(np.cumsum(np.r_[acc, values[:seeding]])[-1])
+        count += seeding
+        if count == period:
+            seed = acc / period
+            out[seeding - 1] = seed
+            z = (1.0 - alpha) * seed
+
+    rest = values[seeding:]
+    if len(rest) == 1:
+        # A single bar, the streaming case: the filter's recursion in scalar
+        # arithmetic, the same operations lfilter runs, without its call overhead
+        x = float(rest[0])
+        y = z + alpha * x
+        out[seeding] = y
+        z = 0.0 * x - (alpha - 1.0) * y
+        count += 1
+    elif len(rest):
+        out[seeding:], zf = lfilter([alpha], [1.0, alpha - 1.0], rest, zi=[z])
+        z = float(zf[0])
+        count += len(rest)
+    return out, {'count': count, 'acc': acc, 'z': z}
+
+
+def window_state():
+    """Return the state of running window sums that have seen no input."""
+    return {'tail': [], 'sums': [0.0, 0.0]}
+
+
+def window_sums(values, period, state):
+    """
+    Running sum and sum of squares of the last ``period`` inputs, continuing from ``state``.
+
+    Args:
+        values (np.ndarray): float64 inputs, oldest first.
+        period (int): Window length.
+        state (dict): State from ``window_state`` or a previous call.
+
+    Returns:
+        tuple: Sums, sums of squares and the number of inputs in each window,
+        and the new state.
+    """
+    if len(values) == 1:
+        # A single bar, the streaming case: one step of the cumsums below
+        tail, x = state['tail'], float(values[0])
+        leaving = tail[0] if len(tail) == period else 0.0
+        s1, s2 = state['sums']
+        s1 += x - leaving
+        s2 += x * x - leaving * leaving
+        state = {'tail': (tail + [x])[-period:], 'sums': [s1, s2]}
+        return np.array([s1]), np.array([s2]), np.array([min(len(tail) + 1, period)]), state
+
+    tail = np.asarray(state['tail'], dtype=np.float64)
+    history = np.r_[tail, values]
+    # The input leaving the window as each new one enters it, 0 while it fills
+    positions = np.arange(len(values)) + len(tail) - period
+    leaving = np.zeros(len(values))
+    inside = positions >= 0
+    leaving[inside] = history[positions[inside]]
+
+    s1, s2 = state['sums']
+    sums = np.cumsum(np.r_[s1, values - leaving])[1:]
+    squares = np.cumsum(np.r_[s2, values * values - leaving * leaving])[1:]
+    counts = np.minimum(np.arange(len(tail) + 1, len(history) + 1), period)
+
+    if len(values):
+        state = {'tail': history[-period:].tolist(),
+                 'sums': [float(sums[-1]), float(squares[-1])]}
+    return sums, squares, counts, state
+
+
+def previous_closes(close, state):
+    """Return each bar's previous close, NaN for the first bar ever, and the new last close."""
+    previous = np.r_[np.nan if state['prev'] is None else state['prev'], close[:-1]]
+    last = float(close[-1]) if len(close) else state['prev']
+    return previous, last
+
+
+class Indicator:
+    """Base class: ``batch`` folds a chunk of bars, ``update`` a single bar."""
+
+    columns = []
+
+    def initial_state(self):
+        """Return the state before the first bar."""
+        raise NotImplementedError
+
+    def batch(self, prices, state):
+        """
+        Folds a chunk of bars into the state.
+
+        Args:
+            prices (np.ndarray): ``(n_bars, 4)`` open/high/low/close, oldest first.
+            state (dict): State from ``initial_state`` or a previous call.
+
+        Returns:
+            tuple: ``(n_bars, len(columns))`` outputs and the new state.
+        """
+        raise NotImplementedError
+
+    def update(self, bar, state):
+        """Folds one bar (open/high/low/close) into the state, returning its outputs and the new state."""
+        values, state = self.batch(np.asarray(bar, dtype=np.float64).reshape(1, -1), state)
+        return values[0], state
+
+
+class EMA(Indicator):
+    def __init__(self, period=12, price='close'):
+        self.period = int(period)
+        self.price = PRICE_COLUMNS.index(price)
+        self.alpha = 2.0 / (self.period + 1)
+        self.columns = [f"ema_{self.period}" if price == 'close' else f"{price}_ema_{self.period}"]
+
+    def initial_state(self):
+        return {'ema': smooth_state()}
+
+    def batch(self, prices, state):
+        ema, ema_state = smooth(prices[:, self.price], self.alpha, self.period, state['ema'])
+        return ema[:, None], {'ema': ema_state}
+
+
+class RSI(Indicator):
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.columns = [f"rsi_{self.period}"]
+
+    def initial_state(self):
+        return {'prev': None, 'gain': smooth_state(), 'loss': smooth_state()}
+
+    def batch(self, prices, state):
+        close = prices[:, CLOSE]
+        previous, last = previous_closes(close, state)
+        out = np.full((len(close), 1), np.nan)
+        # The first bar ever has no change
+        start = int(state['prev'] is None and len(close) > 0)
+        change = close[start:] - previous[start:]
+
+        # Wilder's smoothing of the gains and losses
+        alpha = 1.0 / self.period
+        gain, gain_state = smooth(np.maximum(change, 0.0), alpha, self.period, state['gain'])
+        loss, loss_state = smooth(np.maximum(-change, 0.0), alpha, self.period, state['loss'])
+        total = gain + loss
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rsi = np.where(total > 0, 100.0 * gain / total, 50.0)
+        out[start:, 0] = np.where(np.isnan(total), np.nan, rsi)
+        return out, {'prev': last, 'gain': gain_state, 'loss': loss_state}
+
+
+class MACD(Indicator):
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = int(fast), int(slow), int(signal)
+        name = f"{self.fast}_{self.slow}"
+        self.columns = [f"macd_{name}", f"macd_signal_{name}_{self.signal}",
+                        f"macd_hist_{name}_{self.signal}"]
+
+    def initial_state(self):
+        return {'fast': smooth_state(), 'slow': smooth_state(), 'signal': smooth_state()}
+
+    def batch(self, prices, state):
+        close = prices[:, CLOSE]
+        fast, fast_state = smooth(close, 2.0 / (self.fast + 1), self.fast, state['fast'])
+        slow, slow_state = smooth(close, 2.0 / (self.slow + 1), self.slow, state['slow'])
+        macd = fast - slow
+
+        # The signal line smooths the MACD from its first value on
+        out = np.full((len(close), 3), np.nan)
+        valid = ~np.isnan(macd)
+        signal, signal_state = smooth(macd[valid], 2.0 / (self.signal + 1), self.signal,
+                                      state['signal'])
+        out[:, 0] = macd
+        out[valid, 1] = signal
+        out[:, 2] = out[:, 0] - out[:, 1]
+        return out, {'fast': fast_state, 'slow': slow_state, 'signal': signal_state}
+
+
+class ATR(Indicator):
+    def __init__(self, period=14):
+        self.period = int(period)
+        self.columns = [f"atr_{self.period}"]
+
+    def initial_state(self):
+        return {'prev': None, 'tr': smooth_state()}
+
+    def batch(self, prices, state):
+        high, low = prices[:, HIGH], prices[:, LOW]
+        previous, last = previous_closes(prices[:, CLOSE], state)
+        # True range; the first bar ever has only its high-low range
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+        atr, tr_state = smooth(true_range, 1.0 / self.period, self.period, state['tr'])
+        return atr[:, None], {'prev': last, 'tr': tr_state}
+
+
+class Bollinger(Indicator):
+    def __init__(self, period=20, k=2.0):
+        self.period = int(period)
+        self.k = float(k)
+        width = f"{self.k:g}".replace('.', '_')
+        self.columns = [f"bb_mid_{self.period}", f"bb_upper_{self.period}_{width}",
+                        f"bb_lower_{self.period}_{width}"]
+
+    def initial_state(self):
+        return {'shift': None, 'window': window_state()}
+
+    def batch(self, prices, state):
+        close = prices[:, CLOSE]
+        # Sums of closes less the first close ever, which keeps the variance from cancelling
+        shift = state['shift']
+        if shift is None and len(close):
+            shift = float(close[0])
+        sums, squares, counts, window = window_sums(close - shift, self.period, state['window'])
+
+        mean = sums / self.period
+        std = np.sqrt(np.maximum(squares / self.period - mean * mean, 0.0))
+        out = np.full((len(close), 3), np.nan)
+        full = counts == self.period
+        out[full, 0] = mean[full] + shift
+        out[full, 1] = out[full, 0] + self.k * std[full]
+        out[full, 2] = out[full, 0] - self.k * std[full]
+        return out, {'shift': shift, 'window': window}
+
+
+class Volatility(Indicator):
+    def __init__(self, period=24):
+        self.period = int(period)
+        self.columns = [f"volatility_{self.period}"]
+
+    def initial_state(self):
+        return {'prev': None, 'window': window_state()}
+
+    def batch(self, prices, state):
+        close = prices[:, CLOSE]
+        previous, last = previous_closes(close, state)
+        out = np.full((len(close), 1), np.nan)
+        # The first bar ever has no return
+        start = int(state['prev'] is None and len(close) > 0)
+        returns = close[start:] / previous[start:] - 1.0
+        sums, squares, counts, window = window_sums(returns, self.period, state['window'])
+
+        # Sample std of the returns in the window
+        full = counts == self.period
+        variance = (squares - sums * sums / self.period) / (self.period - 1)
+        out[start:, 0] = np.where(full, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        return out, {'prev': last, 'window': window}
+
+
+INDICATORS = {
+    'ema': EMA,
+    'rsi': RSI,
+    'macd': MACD,
+    'atr': ATR,
+    'bollinger': Bollinger,
+    'volatility': Volatility,
+}
+
+
+class IndicatorSet:
+    def __init__(self, specs):
+        """
+        Initializes the IndicatorSet instance.
+
+        Args:
+            specs (list): One dict per indicator: ``name`` (a key of
+                ``INDICATORS``) and its parameters, e.g.
+                ``{"name": "macd", "fast": 12, "slow": 26, "signal": 9}``.
+        """
+        self.indicators = []
+        for spec in specs:
+            params = dict(spec)
+            name = params.pop('name')
+            if name not in INDICATORS:
+                raise ValueError(f"Unknown indicator: {name}")
+            self.indicators.append(INDICATORS[name](**params))
+        self.columns = [column for indicator in self.indicators for column in indicator.columns]
+
+    def initial_state(self):
+        """Return the states of all indicators before the first bar."""
+        return [indicator.initial_state() for indicator in self.indicators]
+
+    def batch(self, prices, states):
+        """Folds a chunk of bars into every indicator; see ``Indicator.batch``."""
+        prices = np.asarray(prices, dtype=np.float64)
+        out = np.empty((len(prices), len(self.columns)))
+        if not len(prices):
+            return out, states
+        new_states, column = [], 0
+        for indicator, state in zip(self.indicators, states):
+            values, state = indicator.batch(prices, state)
+            out[:, column:column + len(indicator.columns)] = values
+            column += len(indicator.columns)
+            new_states.append(state)
+        return out, new_states
+
+    def update(self, bar, states):
+        """Folds one bar into every indicator, returning its outputs and the new states."""
+        values, states = self.batch(np.asarray(bar, dtype=np.float64).reshape(1, -1), states)
+        return values[0], states
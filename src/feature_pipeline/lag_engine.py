@@ -0,0 +1,158 @@
+"""
+Vectorized lag-matrix builder for the OHLC lag features.
+
+Instead of inserting one ``shift()`` column per price and lag, the bars are laid
+out once as a contiguous newest-first ``(n_bars, 4)`` float array. Because the
+row for bar ``t`` is simply the 13 consecutive bars starting at ``t`` in that
+array, the whole ``(n_rows, 13 * 4)`` lag matrix is a strided view over the same
+memory and can be handed to pandas without copying.
+
+Context features from coarser pyramid levels (e.g. the last 4h and daily bars)
+are gathered from the same kind of view over the coarse bars, indexed by the
+latest coarse bar that had completed when each row's bar closed.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# Lags 0..12: the current bar plus the 12 bars before it
+N_LAGS = 13
+
+
+def lag_feature_columns(n_lags=N_LAGS):
+    """Return the lag column names in output order (lag-major, price-minor)."""
+    return [f"{prefix}_lag_{lag}" for lag in range(n_lags) for prefix in PRICE_COLUMNS]
+
+
+def context_feature_columns(resolutions, n_lags):
+    """Return the context column names, e.g. ``close_4h_lag_0``, per resolution lag-major."""
+    return [f"{prefix}_{resolution}_lag_{lag}" for resolution in resolutions
+            for lag in range(n_lags) for prefix in PRICE_COLUMNS]
+
+
+def lag_window_view(newest_first, n_lags=N_LAGS):
+    """
+    Builds the lag matrix as a read-only strided view.
+
+    Args:
+        newest_first (np.ndarray): C-contiguous ``(n_bars, n_prices)`` array
+            with the newest bar in row 0.
+        n_lags (int): Number of lags per price, including lag 0.
+
+    Returns:
+        np.ndarray: ``(n_bars - n_lags + 1, n_lags * n_prices)`` view where row
+        ``j`` holds bars ``j .. j + n_lags - 1`` flattened lag-major.
+    """
+    n_bars, n_prices = newest_first.shape
+    n_rows = max(n_bars - n_lags + 1, 0)
+    row_stride, item_stride = newest_first.strides
+    return as_strided(newest_first, shape=(n_rows, n_lags * n_prices),
+                      strides=(row_stride, item_stride), writeable=False)
+
+
+def build_lag_frame(datetimes, prices, n_lags=N_LAGS, slots=None, key='datetime'):
+    """
+    Builds the engineered lag/target frame in one pass.
+
+    Args:
+        datetimes (array-like): Bar datetimes (or any per-bar key), oldest first.
+        prices (np.ndarray): ``(n_bars, 4)`` open/high/low/close prices,
+            oldest first.
+        n_lags (int): Number of lags per price, including lag 0.
+        slots (np.ndarray): The bars' strictly increasing int64 grid positions
+            (see ``bar_index.bar_slots``). When given, lags are taken by time rather
+            than by position, so a missing bar yields NaN lags instead of
+            shifting every older bar into the wrong lag.
+        key (str): Name of the column holding ``datetimes``.
+
+    Returns:
+        pd.DataFrame: ``key``, the lag columns and ``target`` (the next
+        bar's close), newest first. Bars without a full lag window or without
+        a following bar are left out.
+    """
+    if slots is not None and len(slots) and slots[-1] - slots[0] != len(slots) - 1:
+        return build_gapped_lag_frame(datetimes, prices, slots, n_lags, key)
+
+    newest_first = np.ascontiguousarray(
+        np.asarray(prices, dtype=np.float64)[::-1])
+    datetimes = np.asarray(datetimes)[::-1]
+    n_rows = max(len(newest_first) - n_lags, 0)
+
+    # Row 0 is the newest bar, which has no next-bar close to predict yet
+    lags = lag_window_view(newest_first, n_lags)[1:n_rows + 1]
+    df = pd.DataFrame(lags, columns=lag_feature_columns(n_lags), copy=False)
+    df.insert(0, key, datetimes[1:n_rows + 1])
+    df['target'] = newest_first[:n_rows, PRICE_COLUMNS.index('close')]
+    return df
+
+
+def build_gapped_lag_frame(datetimes, prices, slots, n_lags=N_LAGS, key='datetime'):
+    """
+    Builds the lag/target frame of bars with gaps by laying them out on their grid.
+
+    Missing slots are NaN rows of the grid, so the strided lag view picks up
+    NaN for a lag whose bar is missing. Rows are only emitted for stored bars
+    with a stored next bar (the target) and at least ``n_lags - 1`` slots of
+    history before them.
+
+    Args:
+        datetimes (array-like): Bar datetimes, oldest first.
+        prices (np.ndarray): ``(n_bars, 4)`` prices, oldest first.
+        slots (np.ndarray): Strictly increasing int64 grid positions of the bars.
+        n_lags (int): Number of lags per price, including lag 0.
+        key (str): Name of the column holding ``datetimes``.
+
+    Returns:
+        pd.DataFrame: Same layout as ``build_lag_frame``, newest first.
+    """
+    positions = np.asarray(slots, dtype=np.int64) - slots[0]
+    n_slots = int(positions[-1]) + 1
+    grid = np.full((n_slots, len(PRICE_COLUMNS)), np.nan)
+    grid[positions] = np.asarray(prices, dtype=np.float64)
+
+    # Newest first, like the gap-free layout
+    newest_first = np.ascontiguousarray(grid[::-1])
+    windows = lag_window_view(newest_first, n_lags)
+    rows = n_slots - 1 - positions[::-1]
+    next_close = np.r_[np.nan, newest_first[:-1, PRICE_COLUMNS.index('close')]]
+
+    keep = (rows < len(windows)) & ~np.isnan(next_close[rows])
+    rows = rows[keep]
+    df = pd.DataFrame(windows[rows], columns=lag_feature_columns(n_lags))
+    df.insert(0, key, np.asarray(datetimes)[::-1][keep])
+    df['target'] = next_close[rows]
+    return df
+
+
+def build_context_matrix(bar_ends, coarse_ends, coarse_prices, n_lags):
+    """
+    Gathers the lags of the latest completed coarse bar for every row.
+
+    A coarse bar is only used once it has completed by the end of the row's
+    bar, so the still-forming 4h or daily bar never leaks into a feature.
+
+    Args:
+        bar_ends (np.ndarray): int64 end time (close) of each row's bar.
+        coarse_ends (np.ndarray): int64 end times of the coarse bars, oldest
+            first, in the same unit. A daily bar spanning a DST change is
+            23 or 25 hours long, so ends are passed rather than a fixed step.
+        coarse_prices (np.ndarray): ``(n_coarse, 4)`` open/high/low/close, oldest first.
+        n_lags (int): Number of completed coarse bars per row, newest first.
+
+    Returns:
+        np.ndarray: ``(len(bar_ends), n_lags * 4)`` matrix, NaN for rows with
+        fewer than ``n_lags`` completed coarse bars before them.
+    """
+    newest_first = np.ascontiguousarray(
+        np.asarray(coarse_prices, dtype=np.float64)[::-1])
+    windows = lag_window_view(newest_first, n_lags)
+    # Index (oldest first) of the last coarse bar ending at or before each bar's end
+    latest = np.searchsorted(coarse_ends, bar_ends, side='right') - 1
+    valid = latest >= n_lags - 1
+
+    matrix = np.full((len(bar_ends), n_lags * len(PRICE_COLUMNS)), np.nan)
+    matrix[valid] = windows[len(newest_first) - 1 - latest[valid]]
+    return matrix
@@ -0,0 +1,248 @@
+"""
+Online feature vector of the latest bar, built from the raw bars in memory.
+
+The batch pipeline engineers a row only once the next bar arrived (its target)
+and the hourly job ingested it, so the newest bar never has a stored row to
+predict from. ``OnlineFeatures`` keeps the last ``plan.depth`` bars (13 by
+default) newest first in a small buffer, folds each bar into the indicator
+state with the constant-time ``IndicatorSet.update`` and builds the feature
+vector with ``FeaturePlan.build_row``, the arithmetic ``build_frame`` runs
+for the batch rows. Both paths compile the same feature spec, so a bar's
+online vector equals its batch row.
+
+Usage:
+    python src/feature_pipeline/online_features.py
+    python src/feature_pipeline/online_features.py --symbol BTC/USD --check
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from BarStore import bucket_shift
+from bar_batch import epoch_to_local, price_matrix
+from bar_index import bar_slots
+from feature_spec import FeaturePlan
+from lag_engine import PRICE_COLUMNS
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+
+class OnlineFeatures:
+    def __init__(self, spec=None, resolution=None):
+        """
+        Initializes the OnlineFeatures instance.
+
+        Args:
+            spec (dict): Feature spec (see ``feature_spec.read_spec``), config.yml's by default.
+            resolution (str): Resolution of the bars, the API's interval by default.
+        """
+        self.resolution = resolution or configs['stock_api_params']['time_interval']
+        self.plan = FeaturePlan(spec, resolution=self.resolution)
+
+        # The latest bar and the depth - 1 slots before it, newest first; missing bars are NaN
+        self.window = np.full((self.plan.depth, len(PRICE_COLUMNS)), np.nan)
+        self.time = None
+        self.slot = None
+
+        # Indicators folded through the latest bar and their outputs for it
+        self.indicator_state = self.plan.indicators.initial_state()
+        self.indicator_values = np.full(len(self.plan.indicator_columns), np.nan)
+
+        # (coarse_ends, coarse_prices) per context resolution (see set_context)
+        self.context = None
+
+    def set_context(self, context):
+        """Sets the coarse bars the context features read, ``(coarse_ends, coarse_prices)`` per resolution."""
+        self.context = context
+
+    def push(self, bar_time, bar):
+        """
+        Adds the next completed bar.
+
+        Args:
+            bar_time (int): Bar time, UTC epoch seconds, later than the latest bar's.
+            bar (array-like): Its open/high/low/close prices.
+
+        Returns:
+            np.ndarray: The bar's feature vector (see ``features``).
+        """
+        bar = np.asarray(bar, dtype=np.float64)
+        slot = int(bar_slots([bar_time], self.resolution)[0])
+        if self.slot is not None and slot <= self.slot:
+            # Indicators cannot unfold a bar, a revised bar needs a rebuild (see warm_up)
+            raise ValueError(f"Bar at {bar_time} is not after the latest bar at {self.time}")
+
+        # Move the window by the slots since the latest bar, leaving skipped slots NaN
+        shift = self.plan.depth if self.slot is None else min(slot - self.slot, self.plan.depth)
+        self.window[shift:] = self.window[:-shift].copy()
+        self.window[1:shift] = np.nan
+        self.window[0] = bar
+        self.time, self.slot = int(bar_time), slot
+
+        if self.plan.indicator_columns:
+            self.indicator_values, self.indicator_state = self.plan.indicators.update(
+                bar, self.indicator_state)
+        return self.features()
+
+    def warm_up(self, bars, indicator_state=None):
+        """
+        Loads the latest bars of a history, replacing the window.
+
+        Args:
+            bars (np.ndarray): Sorted bar batch (see ``bar_batch``). With
+                indicators configured, every bar since ``indicator_state``
+                (or since the first bar ever) is needed; otherwise the last
+                ``depth`` slots suffice.
+            indicator_state (dict): ``{'time', 'state'}`` checkpoint of the
+                indicators folded through ``time`` (see
+                ``FeatureProcessor.indicator_state``). Only bars after it are folded.
+
+        Returns:
+            np.ndarray: The latest bar's feature vector, or None without bars.
+        """
+        self.window[:] = np.nan
+        self.time = self.slot = None
+        if not len(bars):
+            return None
+        times = bars['time']
+        prices = price_matrix(bars)
+        slots = bar_slots(times, self.resolution)
+
+        # Lay the bars in the latest depth slots on the window, newest first
+        self.time, self.slot = int(times[-1]), int(slots[-1])
+        recent = self.slot - slots < self.plan.depth
+        self.window[self.slot - slots[recent]] = prices[recent]
+
+        if self.plan.indicator_columns:
+            state = indicator_state or {'time': None, 'state': self.plan.indicators.initial_state()}
+            fold = times > state['time'] if state['time'] is not None else slice(None)
+            values, self.indicator_state = self.plan.indicators.batch(prices[fold], state['state'])
+            if not len(values):
+                raise ValueError("The indicator state is not older than the latest bar")
+            self.indicator_values = values[-1]
+        return self.features()
+
+    def features(self):
+        """Return the latest bar's float64 feature vector in plan order, the model's input row."""
+        if self.time is None:
+            raise ValueError("No bars pushed yet")
+        end = None
+        if self.plan.context_columns:
+            if self.context is None:
+                raise ValueError("The feature spec has context features, set their bars first")
+            end = int(bucket_shift([self.time], self.resolution)[0])
+        return self.plan.build_row(self.window, indicators=self.indicator_values, end=end,
+                                   context=self.context)
+
+    def feature_dict(self):
+        """Return the latest bar's features keyed by column name, as a serving request row."""
+        return dict(zip(self.plan.columns, self.features().tolist()))
+
+    @classmethod
+    def from_store(cls, symbol, resolution=None):
+        """
+        Warms up the configured spec's online features from the bar store.
+
+        Reads only the newest bars: the last ``depth`` slots and, with
+        indicators, the bars since the state checkpointed with the engineering
+        watermark. Without a usable checkpoint the indicators are folded over
+        the whole history once.
+
+        Args:
+            symbol (str): Symbol, e.g. "BTC/USD".
+            resolution (str): Pyramid level, the API's interval by default.
+
+        Returns:
+            OnlineFeatures: Warmed up through the newest stored bar.
+        """
+        # Imported here, the serving side only needs it to warm up
+        from FeatureProcessor import FeatureProcessor
+
+        processor = FeatureProcessor(symbol, resolution=resolution)
+        online = cls(resolution=processor.resolution)
+        store = processor.store
+
+        indicator_state = None
+        if online.plan.indicator_columns and processor.read_watermark() is not None:
+            indicator_state = processor.indicator_state
+        if indicator_state is not None:
+            bars = store.read_after(indicator_state['time'], warmup=online.plan.depth - 1)
+        elif online.plan.indicator_columns:
+            bars = store.read_range()
+        else:
+            bars = store.tail(online.plan.depth)
+
+        if online.plan.context_columns and len(bars):
+            online.set_context(processor.read_context_bars(bars['time'][-1:]))
+        online.warm_up(bars, indicator_state)
+        return online
+
+
+def check_parity(symbol, resolution=None):
+    """
+    Replays the stored history bar by bar and compares each online vector with its batch row.
+
+    Args:
+        symbol (str): Symbol, e.g. "BTC/USD".
+        resolution (str): Pyramid level, the API's interval by default.
+
+    Returns:
+        dict: Number of ``rows`` compared, the ``mismatched`` row times and the
+        median ``push_us`` per bar in microseconds.
+    """
+    from FeatureProcessor import FeatureProcessor
+
+    processor = FeatureProcessor(symbol, resolution=resolution)
+    bars = processor.read_bars()
+    if bars is None:
+        return {'rows': 0, 'mismatched': [], 'push_us': None}
+    batch = processor.feature_engineering(bars)
+    expected = dict(zip(batch['time'].tolist(), processor.plan.select(batch).to_numpy()))
+
+    online = OnlineFeatures(resolution=processor.resolution)
+    if online.plan.context_columns:
+        online.set_context(processor.read_context_bars(bars['time']))
+    prices = price_matrix(bars)
+    mismatched, timings = [], []
+    for bar_time, bar in zip(bars['time'].tolist(), prices):
+        start = time.perf_counter()
+        row = online.push(bar_time, bar)
+        timings.append(time.perf_counter() - start)
+        if bar_time in expected and not np.array_equal(row, expected[bar_time], equal_nan=True):
+            mismatched.append(bar_time)
+    compared = sum(bar_time in expected for bar_time in bars['time'].tolist())
+    return {'rows': compared, 'mismatched': mismatched,
+            'push_us': float(np.median(timings)) * 1e6}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the latest bar's online feature vector.")
+    parser.add_argument('--symbol', default=configs['stock_api_params']['symbols'][0])
+    parser.add_argument('--resolution', default=None, help="Pyramid level, e.g. 4h")
+    parser.add_argument('--check', action='store_true',
+                        help="Compare the online vector of every stored bar with the batch rows")
+    args = parser.parse_args()
+
+    if args.check:
+        report = check_parity(args.symbol, args.resolution)
+        print(f"{args.symbol}: compared {report['rows']} rows, "
+              f"{len(report['mismatched'])} differ, median push {report['push_us']:.1f} us")
+        for bar_time in epoch_to_local(report['mismatched'][:10]):
+            print(f"  differs at {bar_time}")
+        if report['mismatched']:
+            raise SystemExit(1)
+    else:
+        online = OnlineFeatures.from_store(args.symbol, args.resolution)
+        print(f"{args.symbol} features of the bar at {epoch_to_local([online.time])[0]}:")
+        for column, value in online.feature_dict().items():
+            print(f"  {column}: {value}")
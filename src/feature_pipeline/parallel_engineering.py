@@ -0,0 +1,214 @@
+"""
+Feature engineering of a long bar series in time partitions on a process pool.
+
+A row only reads its own bar, the ``depth - 1`` slots before it (its lag
+windows) and the bar after it (its target), so a full rebuild splits into
+independent time partitions. Each partition is engineered from its own bars
+plus a halo of those ``depth - 1`` slots before it and one slot after it, and
+keeps only the rows of its own bars, so the stitched rows are disjoint and
+equal to the rows of a single pass. Indicators carry the whole history rather
+than a window, so their halo is the whole prefix: the parent folds them in one
+vectorized pass (see ``IndicatorSet.batch``) and the partitions read their
+slice of the outputs.
+
+The bar arrays go to the workers through shared memory instead of being
+pickled per task, and the workers write their rows straight into a shared
+output block. Only the partition bounds and row counts cross the pipe.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from uid_hash import hash_uid
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+# Arrays and plan of the partitioned run, set in each worker by _attach
+_worker = {}
+
+
+def engineer_rows(plan, times, prices, slots=None, ends=None, context=None, indicators=None,
+                  origin=None):
+    """
+    Engineers the rows of a bar series in one pass: ``plan.build_frame`` plus each row's uid.
+
+    Args:
+        plan (feature_spec.FeaturePlan): Compiled feature spec.
+        times (np.ndarray): Bar times, UTC epoch seconds, oldest first.
+        prices, slots, ends, context, indicators, origin: See ``FeaturePlan.build_frame``.
+
+    Returns:
+        pd.DataFrame: ``time``, the feature columns, ``target`` and ``uid``, newest first.
+    """
+    df = plan.build_frame(times, prices, slots=slots, ends=ends, context=context,
+                          indicators=indicators, key='time', origin=origin)
+    # int64 uid for the feature store, hashing the bar time and its lag window
+    df['uid'] = hash_uid(df['time'].to_numpy(), df[plan.lag_columns].to_numpy())
+    return df
+
+
+def time_partitions(slots, depth, partition_bars, origin=None):
+    """
+    Splits a bar series into time partitions with their halos.
+
+    Args:
+        slots (np.ndarray): The bars' strictly increasing grid positions.
+        depth (int): Bars a row reads, itself included (``FeaturePlan.depth``).
+        partition_bars (int): Bars per partition.
+        origin (int): Slot the series' grid starts at, ``slots[0]`` by default.
+
+    Returns:
+        list: ``(lo, hi, start, stop, origin)`` per partition, oldest first:
+        the partition's own bars ``lo:hi``, the bars ``start:stop`` it reads
+        (the halo of ``depth - 1`` slots before and one slot after included)
+        and the slot its grid starts at.
+    """
+    origin = slots[0] if origin is None else min(origin, slots[0])
+    bounds = []
+    for lo in range(0, len(slots), partition_bars):
+        hi = min(lo + partition_bars, len(slots))
+        # Never before the series' own grid, whose start has no history
+        first = max(slots[lo] - (depth - 1), origin)
+        start = int(np.searchsorted(slots, first))
+        stop = int(np.searchsorted(slots, slots[hi - 1] + 1, side='right'))
+        bounds.append((lo, hi, start, stop, int(first)))
+    return bounds
+
+
+def _allocate(shape, dtype, blocks):
+    """Create a shared memory block for an array, returning its (name, shape, dtype) handle."""
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape)) * dtype.itemsize
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    blocks.append(block)
+    return block.name, tuple(shape), dtype.str
+
+
+def _view(handle, blocks):
+    """Return the array of a handle made by ``_allocate``, on its block among ``blocks``."""
+    name, shape, dtype = handle
+    block = next(block for block in blocks if block.name == name)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _share(array, blocks):
+    """Copy an array into a new shared memory block, returning its handle."""
+    array = np.ascontiguousarray(array)
+    handle = _allocate(array.shape, array.dtype, blocks)
+    _view(handle, blocks)[...] = array
+    return handle
+
+
+def _attach(plan, context, handles):
+    """Pool initializer: maps the shared arrays of the run into this worker."""
+    _worker.clear()
+    _worker['plan'], _worker['context'], _worker['blocks'] = plan, context, []
+    for name, (block_name, shape, dtype) in handles.items():
+        if block_name is None:
+            _worker[name] = None
+            continue
+        _worker['blocks'].append(shared_memory.SharedMemory(name=block_name))
+        _worker[name] = _view((block_name, shape, dtype), _worker['blocks'])
+
+
+def _engineer_partition(lo, hi, start, stop, origin, offset):
+    """
+    Engineers one partition from its halo and writes its rows into the shared output.
+
+    Rows are written newest first from row ``offset`` of the output, the
+    first row of the slot range reserved for the partition.
+
+    Returns:
+        int: Number of rows written.
+    """
+    w = _worker
+    times = w['times']
+    df = engineer_rows(
+        w['plan'], times[start:stop], w['prices'][start:stop], slots=w['slots'][start:stop],
+        ends=None if w['ends'] is None else w['ends'][start:stop], context=w['context'],
+        indicators=None if w['indicators'] is None else w['indicators'][start:stop],
+        origin=origin)
+    # Keep the rows of the partition's own bars, the halo rows belong to its neighbours
+    row_times = df['time'].to_numpy()
+    own = (row_times >= times[lo]) & (row_times <= times[hi - 1])
+    n_rows = int(own.sum())
+    rows = slice(offset, offset + n_rows)
+    w['keys'][rows, 0] = row_times[own]
+    w['keys'][rows, 1] = df['uid'].to_numpy()[own]
+    w['values'][rows, :-1] = w['plan'].select(df).to_numpy()[own]
+    w['values'][rows, -1] = df['target'].to_numpy()[own]
+    return n_rows
+
+
+def engineer_partitions(plan, times, prices, slots=None, ends=None, context=None,
+                        indicators=None, origin=None, workers=None, partition_bars=None):
+    """
+    Engineers the rows of a bar series in time partitions on a process pool.
+
+    Gives the same rows as ``engineer_rows``, in the same order.
+
+    Args:
+        plan, times, prices, slots, ends, context, indicators, origin: See ``engineer_rows``.
+        workers (int): Processes, ``feature_engineering.workers`` by default.
+        partition_bars (int): Bars per partition, ``feature_engineering.partition_bars``
+            by default.
+
+    Returns:
+        pd.DataFrame: ``time``, the feature columns, ``target`` and ``uid``, newest first.
+    """
+    workers = workers or configs['feature_engineering']['workers']
+    partition_bars = partition_bars or configs['feature_engineering']['partition_bars']
+    times = np.asarray(times, dtype=np.int64)
+    slots = np.arange(len(times)) if slots is None else slots
+    slots = np.asarray(slots, dtype=np.int64)
+    bounds = time_partitions(slots, plan.depth, partition_bars, origin) if len(times) else []
+    if len(bounds) < 2 or workers < 2:
+        return engineer_rows(plan, times, prices, slots=slots, ends=ends, context=context,
+                             indicators=indicators, origin=origin)
+
+    blocks = []
+    try:
+        handles = {
+            'times': _share(times, blocks),
+            'prices': _share(np.asarray(prices, dtype=np.float64), blocks),
+            'slots': _share(slots, blocks),
+            'ends': (None, None, None) if ends is None
+            else _share(np.asarray(ends, dtype=np.int64), blocks),
+            'indicators': (None, None, None) if indicators is None
+            else _share(np.asarray(indicators, dtype=np.float64), blocks),
+            # Every bar has at most one row: (time, uid) and the features plus target
+            'keys': _allocate((len(times), 2), np.int64, blocks),
+            'values': _allocate((len(times), len(plan.columns) + 1), np.float64, blocks),
+        }
+        # Newest first, a partition's rows go to the output rows of its bars
+        offsets = [len(times) - hi for _, hi, _, _, _ in bounds]
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds)),
+                                 initializer=_attach, initargs=(plan, context, handles)) as pool:
+            counts = list(pool.map(_engineer_partition, *zip(*bounds), offsets))
+
+        keys, values = _view(handles['keys'], blocks), _view(handles['values'], blocks)
+        # Stitch the partitions newest first; their rows are disjoint, so nothing is dropped
+        picks = np.concatenate([np.arange(offset, offset + count)
+                                for offset, count in zip(offsets[::-1], counts[::-1])])
+        keys, values = keys[picks], values[picks]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    df = pd.DataFrame(values[:, :-1], columns=plan.columns, copy=False)
+    df.insert(0, 'time', keys[:, 0])
+    df['target'] = values[:, -1]
+    df['uid'] = keys[:, 1]
+    return df
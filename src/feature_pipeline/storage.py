@@ -0,0 +1,211 @@
+"""
+Crash-safe file writes shared by the bar store, feature files and state files.
+
+Every file is written to a temporary file next to its target and moved over
+the target with ``os.replace``, which is atomic. A crash leaves either the
+old or the new file, never a half-written one, and a reader opening the path
+at any moment sees one complete version, without locks.
+
+Bars accepted by the bar store are first appended to a write-ahead log: one
+checksummed record per batch, flushed to disk before any partition is
+touched. A crash while the partitions are rewritten is repaired by replaying
+the log on the next run; a record torn by the crash fails its checksum and is
+ignored, since the batch it held was never applied either.
+
+With ``storage.fsync`` in config.yml, files and logs are also fsynced before
+they are committed, so a commit survives a power loss, not just a crash of
+the process.
+"""
+
+import json
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+
+# Define the base directory as the project root
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+FSYNC = configs['storage']['fsync']
+
+# Write-ahead log record header: magic, payload length, CRC32 of the payload
+WAL_MAGIC = b'BWAL'
+WAL_HEADER = struct.Struct('<4sII')
+
+# Mode open() gives a new file under the process umask, which can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+NEW_FILE_MODE = 0o666 & ~UMASK
+
+
+def fsync_file(path):
+    """Flush a file's contents to disk."""
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path):
+    """Flush a directory's entries (renames, new and removed files) to disk, where supported."""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yields a temporary path to write the new contents of ``path`` to, then commits it.
+
+    The temporary file is hidden in the target's directory, so it matches no
+    reader's glob and the final rename stays on one filesystem. It is removed
+    if writing fails, leaving the target untouched. ``mkstemp`` creates it
+    owner-only, so it takes the target's permissions (or those of a new file
+    under the umask) before the rename, as an in-place write would keep them.
+
+    Args:
+        path (str or Path): File to replace.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        yield tmp_path
+        if FSYNC:
+            fsync_file(tmp_path)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if FSYNC:
+        fsync_dir(path.parent)
+
+
+def write_json(path, data, indent=4, **kwargs):
+    """Replace a JSON file atomically."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, **kwargs)
+
+
+def write_parquet(table, path, compression='zstd'):
+    """Replace a Parquet file atomically."""
+    with atomic_path(path) as tmp_path:
+        pq.write_table(table, tmp_path, compression=compression)
+
+
+def write_ipc(table, path, compression='zstd'):
+    """Replace an Arrow IPC file atomically."""
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with atomic_path(path) as tmp_path:
+        with pa.ipc.new_file(str(tmp_path), table.schema, options=options) as writer:
+            writer.write_table(table)
+
+
+def write_csv(df, path):
+    """Replace a CSV file atomically."""
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, index=False)
+
+
+def append_csv(df, path):
+    """Append rows to a CSV file by committing an extended copy, so a crash cannot tear the last row."""
+    with atomic_path(path) as tmp_path:
+        shutil.copyfile(path, tmp_path)
+        df.to_csv(tmp_path, mode='a', header=False, index=False)
+
+
+def append_lines(path, lines):
+    """
+    Appends lines to a line-oriented log, cutting a last line torn by a crash first.
+
+    Readers only consume complete lines, so the torn bytes were never read.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b'\n':
+                f.seek(0)
+                f.truncate(f.read().rfind(b'\n') + 1)
+        f.write(''.join(f"{line}\n" for line in lines).encode())
+        f.flush()
+        if FSYNC:
+            os.fsync(f.fileno())
+
+
+#### Write-ahead log ####
+
+def wal_append(path, payload):
+    """Append one checksummed record to a write-ahead log and flush it before returning."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    created = not path.exists()
+    with open(path, 'ab') as f:
+        f.write(WAL_HEADER.pack(WAL_MAGIC, len(payload), zlib.crc32(payload)))
+        f.write(payload)
+        f.flush()
+        if FSYNC:
+            os.fsync(f.fileno())
+    if created and FSYNC:
+        fsync_dir(path.parent)
+
+
+def wal_read(path):
+    """
+    Returns the payloads of the complete records of a write-ahead log, oldest first.
+
+    Reading stops at the first record that is cut short or fails its
+    checksum, i.e. the one being written when the writer crashed.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    data = path.read_bytes()
+    payloads, offset = [], 0
+    while offset + WAL_HEADER.size <= len(data):
+        magic, size, crc = WAL_HEADER.unpack_from(data, offset)
+        start = offset + WAL_HEADER.size
+        payload = data[start:start + size]
+        if magic != WAL_MAGIC or len(payload) != size or zlib.crc32(payload) != crc:
+            break
+        payloads.append(payload)
+        offset = start + size
+    return payloads
+
+
+def wal_clear(path):
+    """Drop a write-ahead log once all its records are applied."""
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+        if FSYNC:
+            fsync_dir(path.parent)
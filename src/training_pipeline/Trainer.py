@@ -1,6 +1,6 @@
-import hopsworks
 import pandas as pd
 import os
+import sys
 from datetime import datetime, timedelta
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
@@ -8,18 +8,38 @@ import joblib
 from pathlib import Path
 import hsfs
 import hsml
+import yaml
 
 # Define the base directory as the project root
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# Load the configuration file using BASE_DIR
+CONFIG_FILE = BASE_DIR / "src" / "config.yml"
+with open(CONFIG_FILE, 'r', encoding='utf-8') as file:
+    configs = yaml.safe_load(file)
+
+# Make the feature pipeline modules (backend selection) importable
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+from backends import login  # noqa: E402
+from feature_io import read_features  # noqa: E402
+from feature_spec import SPEC_FILE, FeaturePlan  # noqa: E402
+from storage import atomic_path, write_json  # noqa: E402
+
 
 class Trainer:
-    def __init__(self, project_name, feature_group_name, model_registry_name, api_key):
+    def __init__(self, project_name, feature_group_name, model_registry_name, api_key,
+                 feature_group_version=None, feature_spec=None):
         self.project_name = project_name
         self.feature_group_name = feature_group_name
+        # The group the feature pipeline writes to unless a version is asked for
+        self.feature_group_version = (feature_group_version
+                                      or configs['hopsworks']['feature_group_version'])
         self.model_registry_name = model_registry_name
         self.api_key = api_key
-        self.project = hopsworks.login(api_key_value=self.api_key)
+        # The model's inputs, in the order the feature pipeline engineers them
+        self.plan = FeaturePlan(feature_spec)
+        self.feature_columns = self.plan.columns
+        self.project = login(api_key=self.api_key, project_name=self.project_name)
         self.fs = self.project.get_feature_store()
         self.model_registry = self.project.get_model_registry()
         self.feature_view = None
@@ -29,7 +49,7 @@ class Trainer:
         """Select features from the feature group and create a feature view."""
         selected_features = self.fs.get_or_create_feature_group(
             name=self.feature_group_name,
-            version=1
+            version=self.feature_group_version
         ).select_all()
 
         print("Feature group selected successfully......... --->>")
@@ -38,7 +58,7 @@ class Trainer:
         try:
             self.feature_view = self.fs.get_or_create_feature_view(
                 name=f"{self.feature_group_name}_view",
-                version=1,
+                version=self.feature_group_version,
                 description="Feature view with last 30 days of data for model training",
                 query=selected_features,
             )
@@ -82,15 +102,19 @@ class Trainer:
         print("Data pulled from feature view for plotting successfully.")
         return df
 
+    def get_data_from_engineered_file(self, features_path, start_time=None, end_time=None):
+        """Read engineered features straight from a local Parquet/Arrow/CSV output."""
+        df = read_features(features_path, start_time=start_time, end_time=end_time)
+
+        # sort by datetime
+        df = df.sort_values(by='datetime', ascending=False)
+        print(f"Data read from {features_path} successfully.")
+        return df
+
     def train_test_split(self, df, test_size=0.2):
         """Split data into training and test sets."""
-        # Define feature columns based on lagged features
-        feature_columns = [
-            f"{prefix}_lag_{i}" for i in range(0, 13) for prefix in ["open", "high", "low", "close"]
-        ]
-
         # Separate features and target
-        X = df[feature_columns]
+        X = self.plan.select(df)
         y = df['target']
 
         # Split into train and test sets
@@ -101,13 +125,8 @@ class Trainer:
 
     def get_features_labels(self, df):
         """Split data into features and labels."""
-        # Define feature columns based on lagged features
-        feature_columns = [
-            f"{prefix}_lag_{i}" for i in range(0, 13) for prefix in ["open", "high", "low", "close"]
-        ]
-
         # Separate features and target
-        X = df[feature_columns]
+        X = self.plan.select(df)
         y = df['target']
         return X, y
 
@@ -133,13 +152,17 @@ class Trainer:
     def save_model_to_registry(self, model, metrics, model_schema, X_train):
         """Save the trained model to Hopsworks Model Registry."""
         # Use BASE_DIR to define the model directory and path
-        model_dir = BASE_DIR / "models"
+        model_dir = BASE_DIR / "models" / self.model_registry_name
         # Ensure the directory exists
         if not model_dir.exists():
             model_dir.mkdir(parents=True, exist_ok=True)
 
         model_path = model_dir / f"{self.model_registry_name}.pkl"
-        joblib.dump(model, model_path)
+        # Written aside and renamed, so the serving app never loads a partial model
+        with atomic_path(model_path) as tmp_path:
+            joblib.dump(model, tmp_path)
+        # The feature spec the model was trained on, so the predictor orders its inputs by it
+        write_json(model_dir / SPEC_FILE, self.plan.to_dict())
 
         new_model = self.model_registry.sklearn.create_model(
             name=self.model_registry_name,
@@ -149,8 +172,8 @@ class Trainer:
             description="Trained model with 30-day feature view data",
         )
 
-        # Register the model and serve as endpoint
-        new_model.save(str(model_path))
+        # Register the model and its feature spec and serve as endpoint
+        new_model.save(str(model_dir))
         # new_model.deploy()
         print("Model saved to registry successfully.")
 
@@ -2,6 +2,7 @@ import pprint
 from dotenv import load_dotenv
 import yaml
 from pathlib import Path
+import sys
 from Trainer import Trainer  # Assuming Trainer.py is in the same directory
 import requests
 import os
@@ -25,15 +26,23 @@ CONFIG_FILE = BASE_DIR / "src" / "config.yml"
 with open(CONFIG_FILE, 'r') as file:
     configs = yaml.safe_load(file)
 
+# Make the bar store importable for the raw price bars
+sys.path.append(str(BASE_DIR / "src" / "feature_pipeline"))
+from BarStore import BarStore  # noqa: E402
+from bar_batch import bars_to_frame, epoch_to_local  # noqa: E402
+from online_features import OnlineFeatures  # noqa: E402
+
 
 # Initialize Trainer instance with Hopsworks project configurations
-symbol = configs['stock_api_params']['symbol']
+symbol = configs['stock_api_params']['symbols'][0]
 # Initialize Trainer with relevant project details
 trainer = Trainer(
     project_name=configs['hopsworks']['project_name'],
     feature_group_name=f"{symbol.split('/')[0].lower()}_features",
     model_registry_name=f"{symbol.split('/')[0].lower()}_regressor_model",
-    api_key=os.getenv("HOPSWORKS_API_KEY")
+    api_key=os.getenv("HOPSWORKS_API_KEY"),
+    feature_group_version=configs['hopsworks']['feature_group_version'],
+    feature_spec=configs['feature_engineering']['features']
 )
 
 
@@ -58,6 +67,27 @@ def return_plot_data_prediction(input_features):
     return prediction
 
 
+def return_price_bars(hours, resolution=None):
+    # Read the raw OHLC bars of the last `hours` at any pyramid resolution,
+    # e.g. "4h" or "1day", straight from the maintained level (no resampling)
+    store = BarStore(symbol, resolution=resolution)
+    last_time = store.last_time()
+    if last_time is None:
+        return bars_to_frame(store.read_range())
+    return bars_to_frame(store.read_range(start=last_time - hours * 3600))
+
+
+def return_next_bar_prediction():
+    # Predict the close after the newest stored bar from its online feature
+    # vector, built from the raw bars without waiting for the hourly job to
+    # engineer and ingest its row (it has none until the next bar arrives)
+    online = OnlineFeatures.from_store(symbol)
+    input_features = pd.DataFrame([online.features()], columns=online.plan.columns)
+    prediction = trainer.predict_with_hopsworks_api(input_features)
+    return {"features": input_features, "datetime": epoch_to_local([online.time])[0],
+            "prediction": None if prediction is None else prediction['predictions']}
+
+
 def get_plot_data(hours):
     # Get the plot data
     input_features, input_labels, datetime_column = return_plot_data(
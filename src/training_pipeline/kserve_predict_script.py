@@ -1,14 +1,41 @@
 import os
+import json
 import joblib
+import numpy as np
 
 
 class Predict(object):
 
     def __init__(self):
         # NOTE: env var ARTIFACT_FILES_PATH has the local path to the model artifact files
-        self.model = joblib.load(
-            os.environ["ARTIFACT_FILES_PATH"] + "/btc_regressor_model.pkl")
+        artifact_path = os.environ["ARTIFACT_FILES_PATH"]
+        self.model = joblib.load(artifact_path + "/btc_regressor_model.pkl")
+
+        # The feature spec the model was trained on (see feature_spec.FeaturePlan),
+        # saved next to it by the Trainer. Models saved without one take rows as sent
+        self.feature_columns = None
+        spec_path = os.path.join(artifact_path, "feature_spec.json")
+        if os.path.exists(spec_path):
+            with open(spec_path, 'r') as file:
+                self.feature_columns = json.load(file)['columns']
+
+    def feature_matrix(self, inputs):
+        """
+        Lays out request rows as the float64 input matrix of the model.
+
+        Rows are either lists of values in the spec's column order, taken as
+        they are, or dicts keyed by column name, which are ordered by the spec.
+        """
+        if len(inputs) and isinstance(inputs[0], dict):
+            if self.feature_columns is None:
+                raise ValueError("Rows keyed by column name need the model's feature spec")
+            inputs = [[row[column] for column in self.feature_columns] for row in inputs]
+        X = np.asarray(inputs, dtype=np.float64)
+        if self.feature_columns is not None and X.shape[-1] != len(self.feature_columns):
+            raise ValueError(f"Expected {len(self.feature_columns)} features per row, "
+                             f"got {X.shape[-1]}")
+        return X
 
     def predict(self, inputs):
         """ Serves a prediction request from a trained model"""
-        return self.model.predict(inputs).tolist()
+        return self.model.predict(self.feature_matrix(inputs)).tolist()
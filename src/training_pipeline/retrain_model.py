@@ -24,13 +24,15 @@ with open(CONFIG_FILE, 'r') as file:
 
 
 def main():
-    symbol = configs['stock_api_params']['symbol']
+    symbol = configs['stock_api_params']['symbols'][0]
     # Initialize Trainer with relevant project details
     trainer = Trainer(
         project_name=configs['hopsworks']['project_name'],
         feature_group_name=f"{symbol.split('/')[0].lower()}_features",
         model_registry_name=f"{symbol.split('/')[0].lower()}_regressor_model",
-        api_key=os.getenv("HOPSWORKS_API_KEY")
+        api_key=os.getenv("HOPSWORKS_API_KEY"),
+        feature_group_version=configs['hopsworks']['feature_group_version'],
+        feature_spec=configs['feature_engineering']['features']
     )
 
     # Step 0: Stop old deployment and Delete old deployed model